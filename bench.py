@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import ctypes
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Offscreen rendering runs at a fixed step, independent of real time
+BENCH_DT = 1 / 60
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay a camera path offscreen and report frame times as JSON."
+    )
+    parser.add_argument("--seed", type=int, default=1, help="dungeon seed")
+    parser.add_argument(
+        "--path", help="camera path recorded with F5 in main.py (default: a seeded walk)"
+    )
+    parser.add_argument("--path-seed", type=int, default=0, help="seed of the generated walk")
+    parser.add_argument(
+        "--frames", type=int, help="frames to render (default: 600, or the whole recording)"
+    )
+    parser.add_argument("--warmup", type=int, default=30, help="untimed frames first")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument(
+        "--backend",
+        choices=("egl", "hidden"),
+        default="egl",
+        help="EGL pbuffer context (no display or GPU needed) or a hidden pygame window",
+    )
+    parser.add_argument(
+        "--gpu-timers", action="store_true", help="also record GL_TIME_ELAPSED per scope"
+    )
+    parser.add_argument("--baked-dungeon", action="store_true")
+    parser.add_argument("--no-portals", action="store_true")
+    parser.add_argument("--no-lightmap", action="store_true")
+    parser.add_argument("--no-torches", action="store_true")
+    parser.add_argument("--no-lod", action="store_true", help="draw props at full detail")
+    parser.add_argument(
+        "--texture-format",
+        choices=("rgba8", "bc1", "bc3"),
+        default="rgba8",
+        help="storage of the tile texture array (bc1/bc3 are S3TC compressed)",
+    )
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def create_egl_context(size):
+    """Make an EGL pbuffer context current; returns a function that ends a frame."""
+    # Must be set before anything imports OpenGL
+    os.environ["PYOPENGL_PLATFORM"] = "egl"
+    os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+    from OpenGL import EGL
+    from OpenGL.GL import glFinish
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("eglInitialize failed")
+    attributes = (EGL.EGLint * 13)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8,
+        EGL.EGL_GREEN_SIZE, 8,
+        EGL.EGL_BLUE_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE,
+    )  # fmt: skip
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count))
+    if count.value == 0:
+        raise RuntimeError("No EGL config with an OpenGL pbuffer")
+    surface = EGL.eglCreatePbufferSurface(
+        display,
+        config,
+        (EGL.EGLint * 5)(EGL.EGL_WIDTH, size[0], EGL.EGL_HEIGHT, size[1], EGL.EGL_NONE),
+    )
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(
+        display,
+        config,
+        EGL.EGL_NO_CONTEXT,
+        (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+            EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        ),  # fmt: skip
+    )
+    if not context or not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("Could not create an OpenGL 3.3 core EGL context")
+    # A pbuffer has nothing to present; wait for the GPU so it is timed too
+    return glFinish
+
+
+def create_hidden_window(size):
+    """Open a hidden pygame window; returns a function that ends a frame."""
+    import pygame
+    from OpenGL.GL import glFinish
+
+    from main import init_pygame_opengl
+
+    init_pygame_opengl(size, pygame.HIDDEN)
+
+    def present():
+        pygame.display.flip()
+        pygame.event.pump()
+        glFinish()
+
+    return present
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {
+        "mean": round(float(values.mean()), 4),
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "max": round(float(values.max()), 4),
+    }
+
+
+def run(args):
+    """Render the path offscreen and return the results as a dict."""
+    size = (args.width, args.height)
+    present = (create_egl_context if args.backend == "egl" else create_hidden_window)(size)
+
+    # Only import GL users once the context (and PyOpenGL platform) exists
+    from OpenGL.GL import GL_RENDERER, glGetString
+    from pyglm import glm
+
+    from camera_path import load_camera_path, walk_camera_path
+    from objloader import default_registry
+    from profiler import FRAME_COUNTERS, default_profiler
+    from scene import Scene
+
+    profiler = default_profiler
+    profiler.gpu = args.gpu_timers
+    scene = Scene(args.seed, size, profiler, args.texture_format)
+    scene.use_portals = not args.no_portals
+    scene.use_lightmap = not args.no_lightmap
+    scene.use_lod = not args.no_lod
+    if args.no_torches:
+        scene.set_torches(False)
+    scene.set_baked_dungeon(args.baked_dungeon)
+
+    if args.path:
+        path = load_camera_path(args.path)[: args.frames]
+    else:
+        spawn = scene.current.level.spawn
+        path = walk_camera_path(
+            scene.grid, args.frames or 600, args.path_seed, start=(spawn[1], spawn[0])
+        )
+
+    def render(sample):
+        x, y, z, yaw, pitch = sample
+        scene.camera_pos = glm.vec3(x, y, z)
+        scene.yaw, scene.pitch = yaw, pitch
+        scene.update(BENCH_DT)
+        scene.render()
+        with profiler.scope("swap"):
+            present()
+
+    # Shader compiles, lightmap bakes and first uploads stay out of the numbers
+    for _ in range(args.warmup):
+        render(path[0])
+
+    profiler.reset(len(path) + 1)
+    profiler.set_enabled(True)
+    frame_ms = []
+    start = time.perf_counter()
+    for sample in path:
+        frame_start = time.perf_counter_ns()
+        profiler.begin_frame()
+        render(sample)
+        profiler.end_frame()
+        frame_ms.append((time.perf_counter_ns() - frame_start) / 1e6)
+    elapsed = time.perf_counter() - start
+    # An empty frame reads the last frame's queries
+    profiler.begin_frame()
+    profiler.end_frame()
+    profiler.frames.pop()
+    profiler.set_enabled(False)
+
+    frames = list(profiler.frames)
+    counters = {
+        name: percentiles([frame["counters"][name] for frame in frames]) for name in FRAME_COUNTERS
+    }
+    summary = profiler.summary(len(path))
+    results = {
+        "revision": git_revision(),
+        "renderer": glGetString(GL_RENDERER).decode(),
+        "backend": args.backend,
+        "size": list(size),
+        "seed": scene.current.level.seed,
+        "path": args.path or f"walk:{args.path_seed}",
+        "frames": len(path),
+        "warmup": args.warmup,
+        "options": {
+            "baked_dungeon": scene.use_baked_dungeon,
+            "portals": scene.use_portals,
+            "lightmap": scene.use_lightmap,
+            "torches": scene.use_torches,
+            "lod": scene.use_lod,
+            "texture_format": default_registry.texture_array.key[3],
+        },
+        "fps": round(len(path) / elapsed, 2),
+        "frame_ms": percentiles(frame_ms),
+        **counters,
+        "scopes": {
+            name: {
+                key: round(value, 4)
+                for key, value in times.items()
+                if key == "cpu_ms" or args.gpu_timers
+            }
+            for name, times in summary["scopes"].items()
+        },
+    }
+    profiler.release()
+    scene.release()
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Keep stdout clean for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
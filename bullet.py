@@ -1,20 +1,52 @@
-from game import Entity
+import glm
 from objloader import Object
-from OpenGL.GL import *
 
-class Bullet(Entity):
+
+def create_bullet_object():
+    """Shared mesh used to draw every projectile in one instanced call."""
+    return Object("./assets/coin.obj", "./assets/texture.png", flip_texture=False)
+
+
+class Bullet:
+    """Handle to one projectile stored in ``game.projectiles``.
+
+    Movement and expiry happen in ``ProjectileStore.update``; the handle
+    only reads back the projectile's current state.
+    """
+
     def __init__(self, game, pos, direction, speed=10.0, max_distance=20.0):
-        self.object = Object("./assets/coin.obj", "./assets/texture.png", flip_texture=False)
-        super().__init__(game, "bullet", self.object)
+        self.game = game
         self.speed = speed
         self.direction = direction
         self.forward_offset = 1.0
-        self.position = pos + direction * self.forward_offset
-        self.distance_traveled = 0.0
         self.max_distance = max_distance
+        start = pos + direction * self.forward_offset
+        self.id = int(
+            game.projectiles.spawn(
+                (start.x, start.y, start.z),
+                (direction.x, direction.y, direction.z),
+                speed,
+                max_distance,
+            )[0]
+        )
+
+    @property
+    def alive(self):
+        return self.game.projectiles.slot_of(self.id) is not None
+
+    @property
+    def position(self):
+        slot = self.game.projectiles.slot_of(self.id)
+        if slot is None:
+            return None
+        return glm.vec3(*self.game.projectiles.positions[slot])
+
+    @property
+    def distance_traveled(self):
+        slot = self.game.projectiles.slot_of(self.id)
+        if slot is None:
+            return self.max_distance
+        return float(self.game.projectiles.distances[slot])
 
-    def update(self, delta_time: float):
-        self.position += self.direction * self.speed * delta_time
-        self.distance_traveled += self.speed * delta_time
-        if self.distance_traveled > self.max_distance:
-            self.game.remove_entity(self)
\ No newline at end of file
+    def remove(self):
+        self.game.projectiles.remove([self.id])
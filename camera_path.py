@@ -0,0 +1,112 @@
+import json
+import math
+from collections import deque
+
+import numpy as np
+
+from generator.dungeon_generator import WALL
+
+CAMERA_PATH_VERSION = 1
+
+# One sample per frame: x, y, z, yaw, pitch (degrees)
+CAMERA_SAMPLE_SIZE = 5
+
+
+def save_camera_path(path, samples):
+    """Write per-frame ``(x, y, z, yaw, pitch)`` samples as JSON."""
+    samples = np.asarray(samples, dtype=np.float64).reshape(-1, CAMERA_SAMPLE_SIZE)
+    with open(path, "w") as file:
+        json.dump(
+            {"version": CAMERA_PATH_VERSION, "samples": np.round(samples, 5).tolist()},
+            file,
+        )
+
+
+def load_camera_path(path):
+    """Read a path written by :func:`save_camera_path` as an (n, 5) array."""
+    with open(path) as file:
+        data = json.load(file)
+    if data.get("version") != CAMERA_PATH_VERSION:
+        raise ValueError(f"{path}: unsupported camera path version {data.get('version')}")
+    return np.asarray(data["samples"], dtype=np.float64).reshape(-1, CAMERA_SAMPLE_SIZE)
+
+
+def _grid_route(grid, start, goal):
+    # Breadth-first search over open cells, 4-connected
+    rows, cols = grid.shape
+    previous = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        if cell == goal:
+            break
+        row, col = cell
+        for step in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)):
+            if (
+                0 <= step[0] < rows
+                and 0 <= step[1] < cols
+                and step not in previous
+                and grid[step] != WALL
+            ):
+                previous[step] = cell
+                queue.append(step)
+    if goal not in previous:
+        return []
+    route = []
+    while goal is not None:
+        route.append(goal)
+        goal = previous[goal]
+    return route[::-1]
+
+
+def walk_camera_path(
+    grid, frames, seed=0, start=None, spacing=1.6, speed=4.0, dt=1 / 60, height=0.6
+):
+    """A seeded walk through the dungeon as an (frames, 5) camera path.
+
+    The camera follows shortest routes between random open cells, starting
+    at ``start`` ((row, col), or a random open cell), at ``speed`` units
+    per second and facing where it is going, with a slow pitch sway. The
+    same grid and seed always give the same path.
+    """
+    grid = np.asarray(grid)
+    rng = np.random.default_rng(seed)
+    open_cells = [tuple(cell) for cell in np.argwhere(grid != WALL).tolist()]
+    if not open_cells:
+        raise ValueError("grid has no open cells")
+    cell = tuple(start) if start is not None else open_cells[rng.integers(len(open_cells))]
+
+    # Enough cells to cover the distance, plus a look-ahead
+    step = speed * dt
+    needed = frames * step / spacing + 16
+    route = [cell]
+    for _ in range(64):
+        if len(route) > needed:
+            break
+        goal = open_cells[rng.integers(len(open_cells))]
+        route += _grid_route(grid, route[-1], goal)[1:]
+    route = np.asarray(route, dtype=np.float64)
+    points = np.column_stack((route[:, 1], route[:, 0])) * spacing
+
+    # Resample the cell route at constant speed
+    lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    along = np.concatenate(([0.0], np.cumsum(lengths)))
+    distance = np.minimum(np.arange(frames + 12) * step, along[-1])
+    x = np.interp(distance, along, points[:, 0])
+    z = np.interp(distance, along, points[:, 1])
+
+    # Face a few frames ahead so corners turn smoothly
+    dx, dz = x[12:] - x[:-12], z[12:] - z[:-12]
+    yaw = np.degrees(np.unwrap(np.arctan2(dz, dx)))
+    moving = np.hypot(dx, dz) > 1e-6
+    if moving.any():
+        # Hold the last heading where the walk stalls
+        first = np.argmax(moving)
+        yaw[:first] = yaw[first]
+        held = np.maximum.accumulate(np.where(moving, np.arange(frames), 0))
+        yaw = yaw[held]
+    else:
+        yaw[:] = -90.0
+    t = np.arange(frames) * dt
+    pitch = 8.0 * np.sin(t * 2 * math.pi / 7.0)
+    return np.column_stack((x[:frames], np.full(frames, height), z[:frames], yaw, pitch))
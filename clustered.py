@@ -0,0 +1,231 @@
+import math
+
+import numpy as np
+
+# Contribution below which a light is treated as out of range
+LIGHT_CUTOFF = 1.0 / 256
+
+
+def light_radii(intensities, colors, cutoff=LIGHT_CUTOFF):
+    """Distance at which each light's attenuation in shaders.py drops below ``cutoff``.
+
+    Diffuse plus specular peaks at 1.5x the attenuated color. Lights that
+    never reach ``cutoff`` get radius 0.
+    """
+    intensities = np.asarray(intensities, dtype=np.float64)
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    ratio = 1.5 * intensities * colors.max(axis=1) / cutoff
+    # intensity / (1 + 0.09 d + 0.032 d^2) == cutoff
+    radii = (-0.09 + np.sqrt(0.0081 + 0.128 * np.maximum(ratio - 1.0, 0.0))) / 0.064
+    return np.where(ratio > 1.0, radii, 0.0)
+
+
+class ClusterGrid:
+    """Splits the view frustum into screen tiles times exponential depth slices.
+
+    :meth:`assign` bins lights (world-space spheres) into every cluster
+    their bounds overlap, on the CPU with NumPy, and returns the table the
+    fragment shader walks: one ``(offset, count)`` row per cluster into a
+    flat array of light indices. Cluster ids are
+    ``(slice * tiles_y + tile_y) * tiles_x + tile_x`` with tile (0, 0) at
+    the bottom-left of the screen, matching ``gl_FragCoord``.
+    """
+
+    def __init__(
+        self,
+        width=800,
+        height=600,
+        fov_y=45.0,
+        near=0.1,
+        far=500.0,
+        tiles=(16, 12),
+        slices=24,
+    ):
+        self.width, self.height = width, height
+        self.tiles_x, self.tiles_y = tiles
+        self.slices = slices
+        self.near, self.far = near, far
+        self.tan_y = math.tan(math.radians(fov_y) / 2)
+        self.tan_x = self.tan_y * width / height
+        self.cluster_count = self.tiles_x * self.tiles_y * slices
+        # slice = log(depth) * depth_scale - depth_bias
+        self.depth_scale = slices / math.log(far / near)
+        self.depth_bias = math.log(near) * self.depth_scale
+        self.lights_assigned = 0
+
+    @property
+    def shader_params(self):
+        """``(tile width px, tile height px, depth scale, depth bias)`` for the shader."""
+        return (
+            self.width / self.tiles_x,
+            self.height / self.tiles_y,
+            self.depth_scale,
+            self.depth_bias,
+        )
+
+    def slice_of(self, depth):
+        depth = np.maximum(depth, self.near)
+        slices = np.floor(np.log(depth) * self.depth_scale - self.depth_bias)
+        return np.clip(slices, 0, self.slices - 1).astype(np.int64)
+
+    def cluster_of(self, frag_x, frag_y, depth):
+        """Cluster ids of fragments, computed the way the fragment shader does."""
+        tile_x = np.clip(
+            (np.asarray(frag_x) / (self.width / self.tiles_x)).astype(np.int64),
+            0,
+            self.tiles_x - 1,
+        )
+        tile_y = np.clip(
+            (np.asarray(frag_y) / (self.height / self.tiles_y)).astype(np.int64),
+            0,
+            self.tiles_y - 1,
+        )
+        return (self.slice_of(depth) * self.tiles_y + tile_y) * self.tiles_x + tile_x
+
+    def assign(self, view, positions, radii):
+        """Bin lights into clusters for a row-major ``view`` matrix.
+
+        Returns ``(table, indices)``: a (cluster_count, 2) uint32 array of
+        ``(offset, count)`` into ``indices``, the uint32 light indices.
+        Bounds are conservative, so a cluster may list a light that only
+        touches its bounding box.
+        """
+        view = np.asarray(view, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        radii = np.asarray(radii, dtype=np.float64)
+        local = positions @ view[:3, :3].T + view[:3, 3]
+        depth = -local[:, 2]
+        z_min = np.maximum(depth - radii, self.near)
+        z_max = np.minimum(depth + radii, self.far)
+
+        x0, x1 = self._tile_range(local[:, 0], radii, z_min, z_max, self.tan_x, self.tiles_x)
+        y0, y1 = self._tile_range(local[:, 1], radii, z_min, z_max, self.tan_y, self.tiles_y)
+        keep = (radii > 0) & (z_min <= z_max) & (x0 <= x1) & (y0 <= y1)
+
+        lights = np.flatnonzero(keep)
+        x0, y0 = x0[keep], y0[keep]
+        z0 = self.slice_of(z_min[keep])
+        size_x, size_y = x1[keep] - x0 + 1, y1[keep] - y0 + 1
+        size_z = self.slice_of(z_max[keep]) - z0 + 1
+        per_light = size_x * size_y * size_z
+
+        # One (cluster, light) pair per cluster in each light's box
+        total = int(per_light.sum())
+        owner = np.repeat(np.arange(len(lights)), per_light)
+        step = np.arange(total) - np.repeat(np.cumsum(per_light) - per_light, per_light)
+        step, dx = np.divmod(step, size_x[owner])
+        dz, dy = np.divmod(step, size_y[owner])
+        clusters = ((z0[owner] + dz) * self.tiles_y + y0[owner] + dy) * self.tiles_x + (
+            x0[owner] + dx
+        )
+
+        if self.cluster_count <= 1 << 16:
+            # NumPy's stable sort is a radix sort for 16-bit keys
+            clusters = clusters.astype(np.uint16)
+        order = np.argsort(clusters, kind="stable")
+        indices = lights[owner[order]].astype(np.uint32)
+        counts = np.bincount(clusters, minlength=self.cluster_count)
+        table = np.empty((self.cluster_count, 2), dtype=np.uint32)
+        table[:, 0] = np.cumsum(counts) - counts
+        table[:, 1] = counts
+        self.lights_assigned = total
+        return table, indices
+
+    def _tile_range(self, centers, radii, z_min, z_max, tan_half, tiles):
+        # Leftmost/rightmost screen position of the sphere's box over its depth range
+        low, high = centers - radii, centers + radii
+        # Lights wholly behind the camera divide by z_max <= 0; assign() drops them
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ndc_low = low / (np.where(low >= 0, z_max, z_min) * tan_half)
+            ndc_high = high / (np.where(high >= 0, z_min, z_max) * tan_half)
+            first = np.floor((ndc_low * 0.5 + 0.5) * tiles)
+            last = np.floor((ndc_high * 0.5 + 0.5) * tiles)
+            # Off-screen lights end up with first > last
+            first = np.clip(first, 0, tiles).astype(np.int64)
+            last = np.clip(last, -1, tiles - 1).astype(np.int64)
+        return first, last
+
+
+if __name__ == "__main__":
+    import time
+
+    from generator.dungeon_generator import WALL, DungeonGenerator
+
+    def column_depths(grid, x, z, yaw, columns, tan_x, spacing=1.6, max_distance=200.0):
+        """View-space depth of the nearest wall for each screen column (2D DDA)."""
+        depths = np.full(columns, max_distance)
+        forward = np.array([math.cos(yaw), math.sin(yaw)])
+        right = np.array([-forward[1], forward[0]])
+        cell_x, cell_z = x / spacing + 0.5, z / spacing + 0.5
+        for column in range(columns):
+            ndc = (column + 0.5) / columns * 2 - 1
+            direction = forward + right * ndc * tan_x
+            col, row = int(cell_x), int(cell_z)
+            step_x, step_z = (1 if direction[0] > 0 else -1), (1 if direction[1] > 0 else -1)
+            delta_x = abs(1 / direction[0]) if direction[0] else math.inf
+            delta_z = abs(1 / direction[1]) if direction[1] else math.inf
+            side_x = ((col + 1 - cell_x) if step_x > 0 else (cell_x - col)) * delta_x
+            side_z = ((row + 1 - cell_z) if step_z > 0 else (cell_z - row)) * delta_z
+            t = 0.0
+            while t * spacing < max_distance:
+                if side_x < side_z:
+                    t, side_x, col = side_x, side_x + delta_x, col + step_x
+                else:
+                    t, side_z, row = side_z, side_z + delta_z, row + step_z
+                if not (0 <= row < grid.shape[0] and 0 <= col < grid.shape[1]):
+                    break
+                if grid[row, col] == WALL:
+                    # t is along ``direction``, whose forward component is 1
+                    depths[column] = t * spacing
+                    break
+        return depths
+
+    width, height = 800, 600
+    clusters = ClusterGrid(width, height)
+    generator = DungeonGenerator(80, 60, seed=0)
+    generator.generate_dungeon()
+    grid = generator.grid
+    spacing = 1.6
+
+    # Eye at the spawn, looking down +x; floor at y=-1, roof at y=2.5
+    eye = np.array([generator.spawn[0] * spacing, 0.6, generator.spawn[1] * spacing])
+    yaw = 0.0
+    walls = column_depths(grid, eye[0], eye[2], yaw, width, clusters.tan_x, spacing)
+    frag_x, frag_y = np.meshgrid(np.arange(width) + 0.5, np.arange(height) + 0.5)
+    ndc_y = frag_y / height * 2 - 1
+    with np.errstate(divide="ignore"):
+        planes = np.where(
+            ndc_y < 0,
+            (eye[1] + 1.0) / (-ndc_y * clusters.tan_y),
+            (2.5 - eye[1]) / (ndc_y * clusters.tan_y),
+        )
+    depth = np.minimum(walls[None, :], planes)
+    fragment_clusters = clusters.cluster_of(frag_x, frag_y, depth).ravel()
+    fragments = fragment_clusters.size
+
+    view = np.identity(4)
+    # Looking down +x: view-space -z is world +x, view-space +x is world +z
+    view[:3, :3] = [[0, 0, 1], [0, 1, 0], [-1, 0, 0]]
+    view[:3, 3] = -view[:3, :3] @ eye
+
+    open_cells = np.argwhere(grid != WALL)
+    rng = np.random.default_rng(0)
+    print(f"{width}x{height} fragments, {clusters.cluster_count} clusters")
+    for count in (8, 64, 256, 1024, 4096):
+        cells = open_cells[rng.integers(len(open_cells), size=count)]
+        positions = np.column_stack(
+            (cells[:, 1] * spacing, np.full(count, 1.5), cells[:, 0] * spacing)
+        )
+        radii = np.full(count, 10.0)
+
+        start = time.perf_counter()
+        for _ in range(20):
+            table, indices = clusters.assign(view, positions, radii)
+        assign_ms = (time.perf_counter() - start) / 20 * 1000
+
+        clustered = int(table[fragment_clusters, 1].sum())
+        print(
+            f"{count:5d} lights: all-lights {fragments * count:>13,} evaluations, "
+            f"clustered {clustered:>11,} ({fragments * count / max(clustered, 1):.0f}x fewer), "
+            f"assign {assign_ms:.2f} ms, {len(indices)} indices"
+        )
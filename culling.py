@@ -0,0 +1,128 @@
+import numpy as np
+
+
+def frustum_planes(view_projection):
+    """Extract the six frustum planes from a row-major ``projection * view``.
+
+    Returns a (6, 4) array of normalized ``(a, b, c, d)`` planes ordered left,
+    right, bottom, top, near, far; a point is inside when
+    ``a*x + b*y + c*z + d >= 0``. ``np.array(glm_matrix)`` already gives the
+    row-major form.
+    """
+    m = np.asarray(view_projection, dtype=np.float64)
+    planes = np.array(
+        [
+            m[3] + m[0],
+            m[3] - m[0],
+            m[3] + m[1],
+            m[3] - m[1],
+            m[3] + m[2],
+            m[3] - m[2],
+        ]
+    )
+    return planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+
+def aabbs_in_frustum(planes, mins, maxs):
+    """Test (n, 3) boxes against all planes at once; returns an (n,) bool mask.
+
+    Uses the positive vertex of each box per plane, so boxes that straddle
+    a plane count as visible.
+    """
+    normals = planes[:, :3]
+    # (n, 6, 3): the box corner furthest along each plane normal
+    corners = np.where(normals[None] >= 0, maxs[:, None], mins[:, None])
+    distances = np.einsum("npk,pk->np", corners, normals) + planes[:, 3]
+    return np.all(distances >= 0, axis=1)
+
+
+class ChunkGrid:
+    """Splits a dungeon grid into fixed-size chunks for frustum culling.
+
+    Instance arrays registered with :meth:`sort_instances` are reordered so
+    each chunk's instances are contiguous; :meth:`cull` then marks chunks
+    visible and :meth:`visible_ranges` returns the ``(first, count)``
+    instance ranges to draw, with adjacent visible chunks merged.
+    """
+
+    def __init__(self, grid_shape, spacing=1.6, chunk_size=16, y_range=(-1.0, 2.8), padding=0.1):
+        self.rows, self.cols = grid_shape
+        self.spacing = spacing
+        self.chunk_size = chunk_size
+        self.chunk_rows = -(-self.rows // chunk_size)
+        self.chunk_cols = -(-self.cols // chunk_size)
+        self.total_chunks = self.chunk_rows * self.chunk_cols
+
+        # Chunk ids are row-major: id = chunk_row * chunk_cols + chunk_col
+        chunk_row, chunk_col = np.divmod(np.arange(self.total_chunks), self.chunk_cols)
+        first_row = chunk_row * chunk_size
+        first_col = chunk_col * chunk_size
+        last_row = np.minimum(first_row + chunk_size, self.rows) - 1
+        last_col = np.minimum(first_col + chunk_size, self.cols) - 1
+        # Tile meshes overhang their cell slightly, hence the padding
+        half = spacing / 2 + padding
+        self.mins = np.column_stack(
+            (
+                first_col * spacing - half,
+                np.full(self.total_chunks, y_range[0]),
+                first_row * spacing - half,
+            )
+        )
+        self.maxs = np.column_stack(
+            (
+                last_col * spacing + half,
+                np.full(self.total_chunks, y_range[1]),
+                last_row * spacing + half,
+            )
+        )
+
+        self.visible = np.ones(self.total_chunks, dtype=bool)
+        self.visible_chunks = self.total_chunks
+        self._starts = {}
+
+    def chunk_of(self, offsets):
+        """Chunk id for each (n, 3) world-space instance offset."""
+        offsets = np.asarray(offsets, dtype=np.float64).reshape(-1, 3)
+        col = np.clip(np.rint(offsets[:, 0] / self.spacing), 0, self.cols - 1)
+        row = np.clip(np.rint(offsets[:, 2] / self.spacing), 0, self.rows - 1)
+        chunk_row = row.astype(np.int64) // self.chunk_size
+        chunk_col = col.astype(np.int64) // self.chunk_size
+        return chunk_row * self.chunk_cols + chunk_col
+
+    def sort_instances(self, name, instances):
+        """Reorder ``instances`` by chunk and remember each chunk's range."""
+        instances = np.asarray(instances)
+        if instances.dtype.names:
+            offsets = instances["offset"]
+        else:
+            instances = instances.astype(np.float32).reshape(-1, 3)
+            offsets = instances
+        chunks = self.chunk_of(offsets)
+        order = np.argsort(chunks, kind="stable")
+        self._starts[name] = np.searchsorted(chunks[order], np.arange(self.total_chunks + 1))
+        return instances[order]
+
+    def cull(self, view_projection):
+        """Mark chunks that intersect the view frustum; returns the mask."""
+        self.visible = aabbs_in_frustum(frustum_planes(view_projection), self.mins, self.maxs)
+        self.visible_chunks = int(self.visible.sum())
+        return self.visible
+
+    def visible_ranges(self, name):
+        """``(first, count)`` instance ranges of visible chunks for ``name``."""
+        starts = self._starts[name]
+        # Empty chunks don't break a run, so neighbouring visible chunks merge
+        mergeable = self.visible | (np.diff(starts) == 0)
+
+        padded = np.concatenate(([False], mergeable, [False]))
+        edges = np.diff(padded.astype(np.int8))
+        firsts = starts[np.flatnonzero(edges == 1)]
+        counts = starts[np.flatnonzero(edges == -1)] - firsts
+        keep = counts > 0
+        return list(zip(firsts[keep].tolist(), counts[keep].tolist()))
+
+    def stats(self):
+        return {
+            "visible_chunks": self.visible_chunks,
+            "total_chunks": self.total_chunks,
+        }
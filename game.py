@@ -1,21 +1,453 @@
 import glm
+import numpy as np
 from OpenGL.GL import *
 from dataclasses import dataclass, field
-from objloader import Object
+from collision import CollisionGrid
+from objloader import Object, make_instances, yaw_quaternion
+from profiler import default_profiler
+from shaders import ShaderProgram
+
+# Projectiles are tested against the spatial hash as spheres this big
+PROJECTILE_RADIUS = 0.1
+
+
+class ProjectileStore:
+    """Structure-of-arrays storage for projectiles.
+
+    Positions, directions, speeds and distances live in contiguous NumPy
+    arrays so that :meth:`update` advances every projectile in one call.
+    Expired projectiles are swap-removed: live projectiles from the tail
+    move into the freed slots, so slot order is not stable. Each projectile
+    keeps a stable integer id for lookups.
+    """
+
+    GROWTH = 2
+    MIN_CAPACITY = 64
+
+    def __init__(self, capacity=MIN_CAPACITY):
+        self.count = 0
+        self._next_id = 0
+        self._allocate(max(capacity, 1))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def active_positions(self):
+        return self.positions[: self.count]
+
+    def spawn(self, positions, directions, speeds=10.0, max_distances=20.0):
+        """Add one or more projectiles and return their ids."""
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float32).reshape(-1, 3)
+        n = len(positions)
+        start, end = self.count, self.count + n
+        if end > len(self.ids):
+            capacity = len(self.ids)
+            while capacity < end:
+                capacity *= self.GROWTH
+            self._allocate(capacity)
+
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+        self.ids[start:end] = ids
+        self.positions[start:end] = positions
+        self.directions[start:end] = directions
+        self.speeds[start:end] = speeds
+        self.distances[start:end] = 0.0
+        self.max_distances[start:end] = max_distances
+        self.count = end
+        return ids
+
+    def update(self, delta_time, collision=None):
+        """Advance every projectile and drop expired ones; returns the expired ids.
+
+        With a :class:`collision.CollisionGrid`, projectiles stop where they
+        hit a wall and are removed too.
+        """
+        n = self.count
+        step = self.speeds[:n] * delta_time
+        moves = self.directions[:n] * step[:, None]
+        expired = np.zeros(n, dtype=bool)
+        if collision is not None:
+            travelled, expired = collision.raycast(self.positions[:n], moves)
+            moves *= travelled[:, None]
+            step *= travelled
+        self.positions[:n] += moves
+        self.distances[:n] += step
+        expired |= self.distances[:n] > self.max_distances[:n]
+        return self.remove_slots(np.flatnonzero(expired))
+
+    def remove(self, ids):
+        """Remove projectiles by id; unknown ids are ignored."""
+        slots = np.flatnonzero(np.isin(self.ids[: self.count], ids))
+        return self.remove_slots(slots)
+
+    def remove_slots(self, slots):
+        """Swap-remove the given (unique) slots, returning the removed ids."""
+        slots = np.asarray(slots, dtype=np.int64)
+        if len(slots) == 0:
+            return np.zeros(0, dtype=np.int64)
+        removed = self.ids[slots].copy()
+
+        new_count = self.count - len(slots)
+        dead = np.zeros(self.count, dtype=bool)
+        dead[slots] = True
+        # Holes below the new end are filled from live slots past it
+        holes = np.flatnonzero(dead[:new_count])
+        fillers = new_count + np.flatnonzero(~dead[new_count:])
+        for array in self._arrays():
+            array[holes] = array[fillers]
+
+        self.count = new_count
+        return removed
+
+    def slot_of(self, projectile_id):
+        slots = np.flatnonzero(self.ids[: self.count] == projectile_id)
+        return int(slots[0]) if len(slots) else None
+
+    def _arrays(self):
+        return (
+            self.ids,
+            self.positions,
+            self.directions,
+            self.speeds,
+            self.distances,
+            self.max_distances,
+        )
+
+    def _allocate(self, capacity):
+        old = self._arrays() if self.count else None
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.directions = np.zeros((capacity, 3), dtype=np.float32)
+        self.speeds = np.zeros(capacity, dtype=np.float32)
+        self.distances = np.zeros(capacity, dtype=np.float32)
+        self.max_distances = np.zeros(capacity, dtype=np.float32)
+        if old is not None:
+            for new_array, old_array in zip(self._arrays(), old):
+                new_array[: self.count] = old_array[: self.count]
+
+
+class SpatialHash:
+    """Dynamic hash grid of spheres for broadphase queries.
+
+    Each entry is a position and radius under a stable integer id, stored
+    in NumPy arrays and filed under the cell containing its centre (a
+    loose grid: queries widen by the largest radius). Entries are kept
+    sorted by cell key, so a cell's entries are found with a binary search
+    and a batch of queries expands into candidate pairs without Python
+    loops. :meth:`update` only records which entries changed cell; they
+    are re-filed in one merge before the next query, and the order is
+    only rebuilt from scratch when most entries moved.
+    """
+
+    GROWTH = 2
+    MIN_CAPACITY = 64
+
+    # Cell coordinates are packed into one int64 key, 21 bits per axis
+    _KEY_BITS = 21
+    _KEY_OFFSET = 1 << 20
+
+    def __init__(self, cell_size=2.0, capacity=MIN_CAPACITY):
+        self.cell_size = float(cell_size)
+        self.count = 0
+        self.max_radius = 0.0
+        self._next_id = 0
+        self._slot_of = np.full(max(capacity, 1), -1, dtype=np.int64)
+        self._free = []
+        self._used = 0
+        self._allocate(max(capacity, 1))
+        self._order = np.zeros(0, dtype=np.int64)
+        self._sorted_keys = np.zeros(0, dtype=np.int64)
+        self._cell_keys = self._cell_starts = self._cell_counts = self._sorted_keys
+        self._pending = []
+
+    def __len__(self):
+        return self.count
+
+    def insert(self, positions, radii=0.5):
+        """Add spheres and return their ids."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        n = len(positions)
+        reused = self._free[-n:] if n else []
+        del self._free[len(self._free) - len(reused) :]
+        fresh = n - len(reused)
+        if self._used + fresh > len(self.ids):
+            capacity = len(self.ids)
+            while capacity < self._used + fresh:
+                capacity *= self.GROWTH
+            self._allocate(capacity)
+        slots = np.concatenate(
+            (np.asarray(reused, dtype=np.int64), np.arange(self._used, self._used + fresh))
+        )
+        self._used += fresh
+
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+        if self._next_id > len(self._slot_of):
+            grown = np.full(max(self._next_id, len(self._slot_of) * self.GROWTH), -1, np.int64)
+            grown[: len(self._slot_of)] = self._slot_of
+            self._slot_of = grown
+        self._slot_of[ids] = slots
+
+        self.ids[slots] = ids
+        self.positions[slots] = positions
+        self.radii[slots] = radii
+        self.keys[slots] = self._keys(positions)
+        self.alive[slots] = True
+        self.count += n
+        if n:
+            self.max_radius = max(self.max_radius, float(self.radii[slots].max()))
+        self._pending.append(slots)
+        return ids
+
+    def update(self, ids, positions):
+        """Move entries; only those that change cell are re-filed."""
+        slots = self._slots(ids)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.positions[slots] = positions
+        keys = self._keys(positions)
+        moved = keys != self.keys[slots]
+        if moved.any():
+            self.keys[slots[moved]] = keys[moved]
+            self._pending.append(slots[moved])
+
+    def remove(self, ids):
+        """Remove entries by id; unknown ids are ignored."""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        ids = ids[(ids >= 0) & (ids < self._next_id)]
+        slots = self._slot_of[ids]
+        ids, slots = ids[slots >= 0], slots[slots >= 0]
+        self._slot_of[ids] = -1
+        self.alive[slots] = False
+        self.count -= len(slots)
+        self._free.extend(slots.tolist())
+        self._pending.append(slots)
+
+    def positions_of(self, ids):
+        return self.positions[self._slots(ids)]
+
+    def query_radius(self, center, radius):
+        """Ids of spheres overlapping the sphere at ``center``."""
+        return self.query_pairs([center], radius)[1]
+
+    def query_aabb(self, low, high):
+        """Ids of spheres whose bounding box overlaps the box ``low``..``high``."""
+        self._flush()
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        first = np.floor((low - self.max_radius) / self.cell_size).astype(np.int64)
+        last = np.floor((high + self.max_radius) / self.cell_size).astype(np.int64)
+        cells = np.prod(last - first + 1)
+        if cells > len(self._order):
+            # Bigger than the population: cheaper to test every entry
+            candidates = self._order
+        else:
+            axes = [np.arange(a, b + 1) for a, b in zip(first, last)]
+            grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+            candidates = self._gather(self._pack(grid))[1]
+        positions = self.positions[candidates]
+        radii = self.radii[candidates][:, None]
+        inside = np.all((positions + radii >= low) & (positions - radii <= high), axis=1)
+        return self.ids[candidates[inside]]
+
+    def query_pairs(self, positions, radii=0.0):
+        """Overlaps between query spheres and the entries, for many queries at once.
+
+        Returns ``(query_indices, ids)``: one row per overlapping pair.
+        """
+        self._flush()
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), len(positions))
+        empty = np.zeros(0, dtype=np.int64)
+        if len(positions) == 0 or len(self._order) == 0:
+            return empty, empty
+
+        reach = (radii + self.max_radius)[:, None]
+        first = np.floor((positions - reach) / self.cell_size).astype(np.int64)
+        last = np.floor((positions + reach) / self.cell_size).astype(np.int64)
+        # Every query scans the same block of neighbour offsets; offsets past
+        # a query's own range are masked out. Keys are packed per axis and
+        # combined by broadcasting to (queries, span, span, span)
+        offsets = np.arange(int((last - first).max()) + 1)
+        cells = first[:, None, :] + offsets[None, :, None]
+        valid = cells <= last[:, None, :]
+        shifts = (2 * self._KEY_BITS, self._KEY_BITS, 0)
+        parts = [(cells[:, :, axis] + self._KEY_OFFSET) << shifts[axis] for axis in range(3)]
+        keys = parts[0][:, :, None, None] | parts[1][:, None, :, None] | parts[2][:, None, None, :]
+        valid = (
+            valid[:, :, None, None, 0] & valid[:, None, :, None, 1] & valid[:, None, None, :, 2]
+        )
+        queries = np.nonzero(valid)[0]
+        keys = keys[valid]
+
+        owners, candidates = self._gather(keys)
+        queries = queries[owners]
+        distance = np.linalg.norm(self.positions[candidates] - positions[queries], axis=1)
+        hit = distance <= radii[queries] + self.radii[candidates]
+        return queries[hit], self.ids[candidates[hit]]
+
+    def self_pairs(self):
+        """Every pair of overlapping entries as ``(ids_a, ids_b)`` with ``ids_a < ids_b``."""
+        self._flush()
+        slots = self._order
+        queries, ids = self.query_pairs(self.positions[slots], self.radii[slots])
+        first = self.ids[slots[queries]]
+        keep = first < ids
+        return first[keep], ids[keep]
+
+    def _gather(self, keys):
+        # Entries filed under each key: (index into keys, slot) per candidate
+        if len(self._cell_keys) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        cell = np.searchsorted(self._cell_keys, keys).clip(max=len(self._cell_keys) - 1)
+        starts = self._cell_starts[cell]
+        counts = np.where(self._cell_keys[cell] == keys, self._cell_counts[cell], 0)
+        owners = np.repeat(np.arange(len(keys)), counts)
+        within = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return owners, self._order[starts[owners] + within]
+
+    def _flush(self):
+        if not self._pending:
+            return
+        changed = np.unique(np.concatenate(self._pending))
+        self._pending.clear()
+        if len(changed) * 4 > len(self._order):
+            live = np.flatnonzero(self.alive[: self._used])
+            order = np.argsort(self.keys[live], kind="stable")
+            self._order = live[order]
+            self._sorted_keys = self.keys[self._order]
+        else:
+            self._merge(changed)
+
+        # One row per occupied cell: key, first index into the order, count
+        sorted_keys = self._sorted_keys
+        starts = np.flatnonzero(np.diff(sorted_keys, prepend=sorted_keys[:1] - 1))
+        self._cell_keys = sorted_keys[starts]
+        self._cell_starts = starts
+        self._cell_counts = np.diff(starts, append=len(sorted_keys))
+
+    def _merge(self, changed):
+        # Take the changed entries out, then merge them back in at their keys
+        changed_mask = np.zeros(self._used, dtype=bool)
+        changed_mask[changed] = True
+        keep = ~changed_mask[self._order]
+        order, sorted_keys = self._order[keep], self._sorted_keys[keep]
+        added = changed[self.alive[changed]]
+        added = added[np.argsort(self.keys[added], kind="stable")]
+        at = np.searchsorted(sorted_keys, self.keys[added])
+        self._order = np.insert(order, at, added)
+        self._sorted_keys = np.insert(sorted_keys, at, self.keys[added])
+
+    def _keys(self, positions):
+        return self._pack(np.floor(positions / self.cell_size).astype(np.int64))
+
+    def _pack(self, cells):
+        cells = cells + self._KEY_OFFSET
+        bits = self._KEY_BITS
+        return (cells[..., 0] << (2 * bits)) | (cells[..., 1] << bits) | cells[..., 2]
+
+    def _slots(self, ids):
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        slots = self._slot_of[ids]
+        if (slots < 0).any():
+            raise KeyError(f"unknown spatial hash ids {ids[slots < 0].tolist()}")
+        return slots
+
+    def _arrays(self):
+        return (self.ids, self.positions, self.radii, self.keys, self.alive)
+
+    def _allocate(self, capacity):
+        old = self._arrays() if self._used else None
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.zeros((capacity, 3), dtype=np.float64)
+        self.radii = np.zeros(capacity, dtype=np.float64)
+        self.keys = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        if old is not None:
+            for new_array, old_array in zip(self._arrays(), old):
+                new_array[: self._used] = old_array[: self._used]
 
 
 @dataclass
 class GameContext:
-    shader_program: any
+    shader_program: ShaderProgram
     entities: list["Entity"] = field(default_factory=list)
+    projectiles: ProjectileStore = field(default_factory=ProjectileStore)
+    # Walls that stop projectiles; None lets them fly through
+    collision: CollisionGrid | None = None
+    # Entities and props projectiles can hit, by spatial id
+    spatial: SpatialHash = field(default_factory=SpatialHash)
+    spatial_owners: dict[int, "Entity"] = field(default_factory=dict)
 
     def remove_entity(self, entity: "Entity"):
-        self.entities.remove(entity)
+        if self._updating:
+            # Deferred so entities can remove themselves during update()
+            self._pending_removals.append(entity)
+        else:
+            self.entities.remove(entity)
+            self._forget(entity)
+
+    def update(self, delta_time: float):
+        """Update every entity, then all projectiles in one vectorized step."""
+        self._updating = True
+        try:
+            for entity in self.entities:
+                entity.update(delta_time)
+        finally:
+            self._updating = False
+
+        if self._pending_removals:
+            removed = {id(entity) for entity in self._pending_removals}
+            self.entities = [e for e in self.entities if id(e) not in removed]
+            for entity in self._pending_removals:
+                self._forget(entity)
+            self._pending_removals.clear()
+
+        self.projectiles.update(delta_time, self.collision)
+        self.projectile_hits = self._hit_projectiles()
+
+    def _hit_projectiles(self):
+        # Projectiles touching an entry of the spatial hash stop there
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(self.spatial) or not len(self.projectiles):
+            return empty, empty
+        slots, spatial_ids = self.spatial.query_pairs(
+            self.projectiles.active_positions, PROJECTILE_RADIUS
+        )
+        if not len(slots):
+            return empty, empty
+        slots, first = np.unique(slots, return_index=True)
+        spatial_ids = spatial_ids[first]
+        projectile_ids = self.projectiles.remove_slots(slots)
+        for projectile_id, spatial_id in zip(projectile_ids.tolist(), spatial_ids.tolist()):
+            owner = self.spatial_owners.get(spatial_id)
+            if owner is not None:
+                owner.on_hit(projectile_id)
+        return projectile_ids, spatial_ids
+
+    def _forget(self, entity):
+        if entity.spatial_id is None:
+            return
+        self.spatial.remove([entity.spatial_id])
+        self.spatial_owners.pop(entity.spatial_id, None)
 
     def __post_init__(self):
-        # Get uniform locations once during initialization
-        self.pos_loc = glGetUniformLocation(self.shader_program, "pos")
-        self.model_loc = glGetUniformLocation(self.shader_program, "model")
+        self._updating = False
+        self._pending_removals = []
+        # (projectile ids, spatial ids) hit during the last update()
+        self.projectile_hits = (np.zeros(0, dtype=np.int64),) * 2
+
+        self.set_program(self.shader_program)
+
+    def set_program(self, shader_program):
+        """Draw with a :class:`shaders.ShaderProgram`, taking its reflected locations."""
+        self.shader_program = shader_program
+        self.pos_loc = shader_program.location("pos")
+        self.model_loc = shader_program.location("model")
+
 
 class Entity:
     def __init__(
@@ -23,16 +455,40 @@ class Entity:
         game: GameContext,
         name: str,
         obj: Object,
+        radius: float = 0.5,
+        collides: bool = False,
     ):
         self.name = name
         self.game = game
         self.rotation = 0.0
         self.obj: Object = obj
-        self.position = glm.vec3(0.0, 0.0, 0.0)
+        self.radius = radius
+        self._position = glm.vec3(0.0, 0.0, 0.0)
+        # Colliding entities are filed in the game's spatial hash so
+        # projectiles can hit them; the rest stay out of it
+        self.spatial_id = None
+        if collides:
+            self.spatial_id = int(game.spatial.insert((0.0, 0.0, 0.0), radius)[0])
+            game.spatial_owners[self.spatial_id] = self
+
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, position):
+        # Assign rather than mutate in place, so the spatial hash follows
+        self._position = glm.vec3(position)
+        if self.spatial_id is not None:
+            self.game.spatial.update([self.spatial_id], [tuple(self._position)])
 
     def update(self, delta_time: float):
         pass
 
+    def on_hit(self, projectile_id: int):
+        """Called when a projectile hits this entity; the projectile is already gone."""
+        pass
+
     def draw(self):
         wall_model = glm.mat4(1.0)
 
@@ -40,13 +496,163 @@ class Entity:
             wall_model, glm.vec3(self.position.x, self.position.y, self.position.z)
         )
 
-        wall_model = glm.rotate(
-            wall_model, glm.radians(self.rotation), glm.vec3(0, 1, 0)
-        )
+        wall_model = glm.rotate(wall_model, glm.radians(self.rotation), glm.vec3(0, 1, 0))
 
         # Set the model matrix uniform for this specific wall
-        glUniformMatrix4fv(
-            self.game.model_loc, 1, GL_FALSE, glm.value_ptr(wall_model)
+        glUniformMatrix4fv(self.game.model_loc, 1, GL_FALSE, glm.value_ptr(wall_model))
+        default_profiler.count("uniform_uploads")
+
+        self.obj.draw()
+
+
+class RenderBatcher:
+    """Draws entities that share a mesh and texture with one instanced call.
+
+    Every frame the entities are grouped by their Object's mesh and texture
+    handles, and each group's positions and rotations are packed into one
+    instance array. Entities whose Object is already instanced fall back to
+    ``Entity.draw``. Per-frame counts are kept in ``draw_calls``,
+    ``uniform_uploads`` and ``instances_drawn``.
+    """
+
+    def __init__(self, game: GameContext):
+        self.game = game
+        self.batches: dict[tuple, Object] = {}
+        self.draw_calls = 0
+        self.uniform_uploads = 0
+        self.instances_drawn = 0
+        self._identity = np.identity(4, dtype=np.float32)
+
+    def draw(self, entities, camera_position=None):
+        """Draw ``entities``; batches pick levels of detail by ``camera_position``."""
+        self.draw_calls = 0
+        self.uniform_uploads = 0
+        self.instances_drawn = 0
+
+        groups: dict[tuple, list[Entity]] = {}
+        for entity in entities:
+            obj = entity.obj
+            if obj.mesh is None or obj.instances is not None:
+                entity.draw()
+                self.draw_calls += 1
+                self.uniform_uploads += 1
+                self.instances_drawn += max(len(obj.instanced_offsets), 1)
+                continue
+            texture_key = obj.texture.key if obj.texture is not None else None
+            groups.setdefault((obj.mesh.key, texture_key), []).append(entity)
+
+        if not groups and self.draw_calls == 0:
+            return
+
+        # Instance data carries the whole entity transform; this also resets
+        # the model matrix left behind by any fallback Entity.draw calls
+        glUniformMatrix4fv(self.game.model_loc, 1, GL_FALSE, self._identity)
+        self.uniform_uploads += 1
+        default_profiler.count("uniform_uploads")
+
+        for key, group in groups.items():
+            batch = self.batches.get(key)
+            if batch is None:
+                batch = self.batches[key] = self._create_batch(group[0].obj)
+
+            positions = np.array(
+                [(e.position.x, e.position.y, e.position.z) for e in group],
+                dtype=np.float32,
+            )
+            rotations = yaw_quaternion([e.rotation for e in group])
+            batch.set_instances(make_instances(positions, rotation=rotations))
+            batch.update_lods(camera_position)
+            batch.draw()
+
+            self.draw_calls += 1
+            self.instances_drawn += len(group)
+
+    def release(self):
+        for batch in self.batches.values():
+            batch.release()
+        self.batches.clear()
+
+    def _create_batch(self, obj: Object) -> Object:
+        # Re-acquires the entity's mesh and texture from the registry (a hit)
+        texture_path = obj.texture.key[1] if obj.texture is not None else None
+        batch = Object(
+            obj.mesh.key[1],
+            texture_path,
+            flip_texture=obj.flip,
+            registry=obj.registry,
+            lod_distances=obj.lod_distances,
         )
+        batch.set_instances(np.zeros(0, dtype=np.float32))
+        return batch
+
 
-        self.obj.draw()
\ No newline at end of file
+if __name__ == "__main__":
+    import time
+
+    store = ProjectileStore()
+    rng = np.random.default_rng(0)
+    count = 50_000
+    directions = rng.normal(size=(count, 3)).astype(np.float32)
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    store.spawn(np.zeros((count, 3)), directions, max_distances=rng.uniform(5, 50, count))
+
+    frames = 600
+    start = time.perf_counter()
+    for _ in range(frames):
+        store.update(1 / 60)
+        # Keep the population steady so every frame does the same work
+        missing = count - len(store)
+        if missing:
+            store.spawn(np.zeros((missing, 3)), directions[:missing])
+    elapsed = time.perf_counter() - start
+    print(f"{count} projectiles: {elapsed / frames * 1000:.3f} ms per update")
+
+    for count in (1_000, 10_000, 100_000):
+        # Constant density: about one entity per 16 square units
+        side = np.sqrt(count) * 4.0
+        positions = np.column_stack(
+            (
+                rng.uniform(0, side, count),
+                rng.uniform(-1.0, 2.0, count),
+                rng.uniform(0, side, count),
+            )
+        )
+        spatial = SpatialHash()
+        start = time.perf_counter()
+        ids = spatial.insert(positions, rng.uniform(0.3, 0.8, count))
+        spatial.query_radius((0.0, 0.0, 0.0), 1.0)
+        insert_ms = (time.perf_counter() - start) * 1000
+
+        # A tenth of the entities walk every frame; the rest stand still
+        movers = rng.choice(count, count // 10, replace=False)
+        start = time.perf_counter()
+        for _ in range(60):
+            positions[movers] += rng.normal(0, 0.05, (len(movers), 3))
+            spatial.update(ids[movers], positions[movers])
+            spatial.query_radius((0.0, 0.0, 0.0), 1.0)
+        move_ms = (time.perf_counter() - start) / 60 * 1000
+
+        bullets = np.column_stack(
+            (
+                rng.uniform(0, side, 10_000),
+                rng.uniform(-1.0, 2.0, 10_000),
+                rng.uniform(0, side, 10_000),
+            )
+        )
+        start = time.perf_counter()
+        pairs = spatial.query_pairs(bullets, PROJECTILE_RADIUS)
+        pairs_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for center in bullets[:1000]:
+            spatial.query_radius(center, 2.0)
+        radius_us = (time.perf_counter() - start) / 1000 * 1e6
+
+        start = time.perf_counter()
+        self_a, _ = spatial.self_pairs()
+        self_ms = (time.perf_counter() - start) * 1000
+
+        print(
+            f"{count:7d} entities: insert {insert_ms:6.1f} ms, 10% moving {move_ms:6.2f} ms/frame, "
+            f"10k bullets {pairs_ms:6.2f} ms ({len(pairs[0])} hits), radius query {radius_us:5.0f} us, self pairs {self_ms:6.1f} ms ({len(self_a)})"
+        )
@@ -1,27 +1,65 @@
 import random
 
+import numpy as np
+
+EMPTY = 0
+WALL = 1
+SPAWN = 2
+CHEST = 3
+
 
 class DungeonGenerator:
-    def __init__(self, width, height):
+    """Rooms joined by 1-wide corridors on a ``uint8`` grid.
+
+    ``cells`` is a (height, width) NumPy array; ``grid`` is the same array,
+    which still indexes like the old nested lists (``grid[y][x]``).
+    Generation draws only from a private ``random.Random(seed)``, so the
+    same seed and parameters always give the same dungeon. Without a seed
+    one is picked from the global ``random`` module and kept in ``seed``.
+    """
+
+    def __init__(self, width, height, seed=None, min_room_size=5, max_room_size=12, max_rooms=20):
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.random = random.Random(seed)
         self.width = width
         self.height = height
         self.cell_size = 10
-        self.min_room_size = 5
-        self.max_room_size = 12
-        self.max_rooms = 20
+        self.min_room_size = min_room_size
+        self.max_room_size = max_room_size
+        self.max_rooms = max_rooms
         self.rooms = []
         self.spawn = (0, 0)
         self.chests = []
-        self.grid = [[1 for _ in range(width)] for _ in range(height)]
+        self.cells = np.full((height, width), WALL, dtype=np.uint8)
+
+    @property
+    def grid(self):
+        return self.cells
+
+    def params(self):
+        """Everything besides the seed and size that shapes the layout."""
+        return {
+            "min_room_size": self.min_room_size,
+            "max_room_size": self.max_room_size,
+            "max_rooms": self.max_rooms,
+        }
 
     def generate_room(self):
-        width = random.randint(self.min_room_size, self.max_room_size)
-        height = random.randint(self.min_room_size, self.max_room_size)
-        x = random.randint(0, self.width - width - 1) + 1
-        y = random.randint(0, self.height - height - 1) + 1
+        width = self.random.randint(self.min_room_size, self.max_room_size)
+        height = self.random.randint(self.min_room_size, self.max_room_size)
+        x = self.random.randint(0, self.width - width - 1) + 1
+        y = self.random.randint(0, self.height - height - 1) + 1
         return (x, y, width, height)
 
-    def generate_dungeon(self):
+    def generate_dungeon(self, doors=()):
+        """Place and connect rooms, then clean the grid.
+
+        ``doors`` are (x, y) cells on the grid border that each get a
+        corridor to the nearest room, e.g. to line up with a neighbouring
+        chunk. They draw nothing from the random stream.
+        """
         first_room = True
 
         for i in range(self.max_rooms):
@@ -32,6 +70,9 @@ class DungeonGenerator:
                     self.connect_rooms(self.rooms[-1], room)
                 self.rooms.append(room)
 
+        for door in doors:
+            self.connect_door(door)
+
         first_room = self.rooms[0]
 
         # set spawn
@@ -44,42 +85,27 @@ class DungeonGenerator:
         for room in self.rooms:
             center_x = room[0] + room[2] // 2
             center_y = room[1] + room[3] // 2
-            if random.random() < 0.6:
-                self.grid[center_y][center_x] = 3
+            if self.random.random() < 0.6:
+                self.cells[center_y, center_x] = CHEST
 
         self.spawn = (spawn_x, spawn_y)
-        self.grid[spawn_y][spawn_x] = 2  # Set spawn point
-
+        self.cells[spawn_y, spawn_x] = SPAWN  # Set spawn point
 
     def clean_grid(self):
-        """Remove redundant corridor tiles that are completely surrounded by other corridor/room tiles."""
-        new_grid = [[0 for _ in range(self.width)] for _ in range(self.height)]
-        
-        # Include diagonals in the neighbor check
-        neighbors = [(-1,0), (1,0), (0,-1), (0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
-        
-        for j in range(self.height):
-            for i in range(self.width):
-                if self.grid[j][i] == 1:
-                    # Always keep edge tiles
-                    if i == 0 or i == self.width-1 or j == 0 or j == self.height-1:
-                        new_grid[j][i] = 1
-                        continue
-                    
-                    # Check if this tile is adjacent to at least one empty space (0)
-                    has_adjacent_empty = False
-                    for dy, dx in neighbors:
-                        ny, nx = j + dy, i + dx
-                        if (0 <= ny < self.height and 
-                            0 <= nx < self.width and 
-                            self.grid[ny][nx] == 0):
-                            has_adjacent_empty = True
-                            break
-                    
-                    if has_adjacent_empty:
-                        new_grid[j][i] = 1
-        
-        self.grid = new_grid
+        """Remove redundant wall tiles that have no empty tile among their 8 neighbours."""
+        empty = np.pad(self.cells == EMPTY, 1, constant_values=False)
+        adjacent_empty = np.zeros((self.height, self.width), dtype=bool)
+        for dy in (0, 1, 2):
+            for dx in (0, 1, 2):
+                if dy != 1 or dx != 1:
+                    adjacent_empty |= empty[dy : dy + self.height, dx : dx + self.width]
+
+        # Always keep edge tiles
+        keep = adjacent_empty
+        keep[[0, -1], :] = True
+        keep[:, [0, -1]] = True
+
+        self.cells = ((self.cells == WALL) & keep).astype(np.uint8)
 
     def connect_rooms(self, room1, room2):
         x1, y1, width1, height1 = room1
@@ -89,33 +115,54 @@ class DungeonGenerator:
         end_x, end_y = x2 + width2 // 2, y2 + height2 // 2
 
         # Move horizontally first
-        for x in range(min(start_x, end_x), max(start_x, end_x) + 1):
-            self.grid[start_y][x] = 0
+        self.cells[start_y, min(start_x, end_x) : max(start_x, end_x) + 1] = EMPTY
 
         # Move vertically
-        step = 1 if end_y >= start_y else -1
-        for y in range(start_y, end_y + step, step):
-            self.grid[y][end_x] = 0
+        self.cells[min(start_y, end_y) : max(start_y, end_y) + 1, end_x] = EMPTY
+
+    def connect_door(self, door):
+        x, y = door
+        door_room = (x, y, 1, 1)
+        room = min(
+            self.rooms,
+            key=lambda r: (r[0] + r[2] // 2 - x) ** 2 + (r[1] + r[3] // 2 - y) ** 2,
+        )
+        # connect_rooms moves horizontally first; leave the border straight
+        # away from the door so only the door cell opens on the edge
+        if x in (0, self.width - 1):
+            self.connect_rooms(door_room, room)
+        else:
+            self.connect_rooms(room, door_room)
 
     def place_room(self, room):
         x, y, width, height = room
         # Check if room overlaps with existing corridors
-        for j in range(y, y + height):
-            for i in range(x, x + width):
-                if j >= self.height or i >= self.width or self.grid[j][i] == 0:
-                    return False
+        if y + height > self.height or x + width > self.width:
+            return False
+        area = self.cells[y : y + height, x : x + width]
+        if (area == EMPTY).any():
+            return False
 
         # Place the room
-        for j in range(y, y + height):
-            for i in range(x, x + width):
-                self.grid[j][i] = 0  # Wall
+        area[:] = EMPTY
 
         return True
 
 
 if __name__ == "__main__":
+    import time
+
     generator = DungeonGenerator(80, 60)
     generator.generate_dungeon()
 
     for i in generator.grid:
         print("".join(" " if str(cell) == "0" else str(cell) for cell in i))
+
+    for width, height in ((80, 60), (256, 256), (1024, 1024), (4096, 4096)):
+        generator = DungeonGenerator(
+            width, height, seed=0, max_rooms=max(20, width * height // 2000)
+        )
+        start = time.perf_counter()
+        generator.generate_dungeon()
+        elapsed = time.perf_counter() - start
+        print(f"{width}x{height}: {len(generator.rooms)} rooms in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,231 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .dungeon_generator import WALL
+
+
+@dataclass
+class DungeonMesh:
+    """Baked dungeon geometry in the interleaved 8-float layout used by objloader.
+
+    ``parts`` maps a surface name ("floor", "roof", "wall") to its
+    ``(first_index, index_count)`` range in ``indices``.
+    """
+
+    vertices: np.ndarray
+    indices: np.ndarray
+    parts: dict = field(default_factory=dict)
+    triangles_before: int = 0
+    triangles_after: int = 0
+
+
+def _runs(mask):
+    """Horizontal runs of True in a 2D mask as (row, start, length) arrays."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends - starts
+
+
+def greedy_rectangles(mask):
+    """Cover a 2D boolean mask with rectangles (row, col, height, width).
+
+    Each row is split into maximal runs, and runs with the same start and
+    length on consecutive rows are merged into one rectangle.
+    """
+    rows, starts, lengths = _runs(np.asarray(mask, dtype=bool))
+    rects = []
+    open_rects = {}
+    current_row = None
+    for row, start, length in zip(rows.tolist(), starts.tolist(), lengths.tolist()):
+        if row != current_row:
+            # Rectangles that did not continue onto this row are finished
+            continuing = {}
+            for key, rect in open_rects.items():
+                if rect[0] + rect[2] == row:
+                    continuing[key] = rect
+                else:
+                    rects.append(rect)
+            open_rects = continuing
+            current_row = row
+
+        rect = open_rects.get((start, length))
+        if rect is not None and rect[0] + rect[2] == row:
+            rect[2] += 1
+        else:
+            if rect is not None:
+                rects.append(rect)
+            open_rects[(start, length)] = [row, start, 1, length]
+    rects.extend(open_rects.values())
+    return np.array(rects, dtype=np.int64).reshape(-1, 4)
+
+
+class DungeonMesher:
+    """Greedy-meshes a dungeon grid into a few large quads.
+
+    The floor and roof become merged horizontal quads and walls become
+    solid blocks whose exposed sides are merged along each wall line. UVs
+    are in cell units so tiled textures repeat once per cell with
+    GL_REPEAT; ``uv_styles`` can remap a surface's UVs as
+    ``origin + uv * scale`` (a zero scale samples a single palette texel).
+    Output is plain NumPy, so no GL context is needed.
+    """
+
+    def __init__(
+        self,
+        grid,
+        spacing=1.6,
+        floor_height=-0.7,
+        roof_height=2.5,
+        roof_thickness=0.3,
+        uv_styles=None,
+    ):
+        self.grid = np.asarray(grid)
+        self.spacing = spacing
+        self.floor_height = floor_height
+        self.roof_height = roof_height
+        self.roof_thickness = roof_thickness
+        self.uv_styles = uv_styles or {}
+
+    def build(self):
+        height, width = self.grid.shape
+        walls = self.grid == WALL
+        everywhere = np.ones((height, width), dtype=bool)
+
+        surfaces = {"floor": [], "roof": [], "wall": []}
+        before = 0
+
+        # Floor and roof span the whole map, like the per-cell tiles did
+        floor_rects = greedy_rectangles(everywhere)
+        surfaces["floor"].append(self._horizontal(floor_rects, self.floor_height, up=True))
+        surfaces["roof"].append(self._horizontal(floor_rects, self.roof_height, up=False))
+        surfaces["roof"].append(
+            self._horizontal(floor_rects, self.roof_height + self.roof_thickness, up=True)
+        )
+        before += 3 * height * width
+
+        # Wall tops, visible when the roof is hidden
+        surfaces["wall"].append(
+            self._horizontal(greedy_rectangles(walls), self.roof_height, up=True)
+        )
+        before += int(walls.sum())
+
+        # Exposed wall sides; the map border counts as open space
+        padded = np.pad(walls, 1, constant_values=False)
+        inner = padded[1:-1, 1:-1]
+        for axis, step in ((1, 1), (1, -1), (0, 1), (0, -1)):
+            neighbour = np.roll(padded, -step, axis=axis)[1:-1, 1:-1]
+            exposed = inner & ~neighbour
+            before += int(exposed.sum())
+            surfaces["wall"].append(self._sides(exposed, axis, step))
+
+        vertices = []
+        indices = []
+        parts = {}
+        base = 0
+        first = 0
+        for name, quads in surfaces.items():
+            quads = np.concatenate(quads) if quads else np.zeros((0, 4, 8))
+            quads = self._apply_uv_style(name, quads.astype(np.float32))
+            count = len(quads)
+            quad_indices = base + 4 * np.arange(count)[:, None] + [0, 1, 2, 0, 2, 3]
+            vertices.append(quads.reshape(-1, 8))
+            indices.append(quad_indices.reshape(-1))
+            parts[name] = (first, 6 * count)
+            base += 4 * count
+            first += 6 * count
+
+        vertices = np.concatenate(vertices).astype(np.float32)
+        indices = np.concatenate(indices).astype(np.uint32)
+        return DungeonMesh(
+            vertices,
+            indices,
+            parts,
+            triangles_before=2 * before,
+            triangles_after=len(indices) // 3,
+        )
+
+    def _apply_uv_style(self, name, quads):
+        style = self.uv_styles.get(name)
+        if style is not None:
+            origin, scale = style
+            quads[:, :, 3:5] = np.asarray(origin) + quads[:, :, 3:5] * np.asarray(scale)
+        return quads
+
+    def _horizontal(self, rects, y, up):
+        """Quads for rectangles of cells at height ``y``, facing +Y or -Y."""
+        s = self.spacing
+        row, col, h, w = rects.T.astype(np.float64)
+        x0, x1 = (col - 0.5) * s, (col + w - 0.5) * s
+        z0, z1 = (row - 0.5) * s, (row + h - 0.5) * s
+
+        # Counter-clockwise when seen from the side the normal points to
+        if up:
+            corners = [(x0, z0), (x0, z1), (x1, z1), (x1, z0)]
+        else:
+            corners = [(x0, z0), (x1, z0), (x1, z1), (x0, z1)]
+
+        quads = np.zeros((len(rects), 4, 8))
+        for k, (x, z) in enumerate(corners):
+            quads[:, k, 0] = x
+            quads[:, k, 1] = y
+            quads[:, k, 2] = z
+            quads[:, k, 3] = x / s
+            quads[:, k, 4] = z / s
+        quads[:, :, 6] = 1.0 if up else -1.0
+        return quads
+
+    def _sides(self, exposed, axis, step):
+        """Merged wall faces for cells exposed towards ``step`` along ``axis``.
+
+        axis 1 is +-X (faces run along Z), axis 0 is +-Z (faces run along X).
+        """
+        s = self.spacing
+        bottom, top = self.floor_height, self.roof_height
+        v_top = (top - bottom) / s
+
+        if axis == 1:
+            # Runs down each column become one face along Z
+            cols, starts, lengths = _runs(exposed.T)
+            plane = (cols + 0.5 * step) * s
+            a0, a1 = (starts - 0.5) * s, (starts + lengths - 0.5) * s
+        else:
+            rows, starts, lengths = _runs(exposed)
+            plane = (rows + 0.5 * step) * s
+            a0, a1 = (starts - 0.5) * s, (starts + lengths - 0.5) * s
+
+        # Order the run endpoints so the quad winds counter-clockwise
+        # when seen from outside the wall
+        if (axis == 1) == (step > 0):
+            a0, a1 = a1, a0
+
+        quads = np.zeros((len(plane), 4, 8))
+        for k, (a, y, v) in enumerate(
+            ((a0, bottom, 0.0), (a1, bottom, 0.0), (a1, top, v_top), (a0, top, v_top))
+        ):
+            if axis == 1:
+                quads[:, k, 0] = plane
+                quads[:, k, 2] = a
+            else:
+                quads[:, k, 0] = a
+                quads[:, k, 2] = plane
+            quads[:, k, 1] = y
+            quads[:, k, 3] = a / s
+            quads[:, k, 4] = v
+        quads[:, :, 5 + (0 if axis == 1 else 2)] = step
+        return quads
+
+
+if __name__ == "__main__":
+    from .dungeon_generator import DungeonGenerator
+
+    generator = DungeonGenerator(80, 60)
+    generator.generate_dungeon()
+    mesh = DungeonMesher(generator.grid).build()
+    print(
+        f"triangles: {mesh.triangles_before} per-cell faces -> "
+        f"{mesh.triangles_after} greedy-meshed"
+    )
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import random
+import struct
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .dungeon_generator import DungeonGenerator
+from .level_layout import LEVEL_LAYERS, build_level_instances
+
+LEVEL_CACHE_DIR = "./.levelcache"
+LEVEL_CACHE_SUFFIX = ".level"
+LEVEL_CACHE_VERSION = 1
+
+# magic, version, seed, width, height, spawn x, spawn y, one count per layer
+_LEVEL_CACHE_HEADER = struct.Struct("<4sIQIIII" + "I" * len(LEVEL_LAYERS))
+_LEVEL_CACHE_MAGIC = b"P3DL"
+# Any int is a valid seed; the header stores it modulo 2**64
+_SEED_MASK = 2**64 - 1
+
+
+@dataclass
+class Level:
+    """A generated dungeon plus the instance offsets main.py draws it with.
+
+    ``instances`` maps each name in ``LEVEL_LAYERS`` to an (n, 3) float32
+    array of world-space offsets. Levels loaded from the cache hold
+    read-only memory maps.
+    """
+
+    seed: int
+    grid: np.ndarray
+    spawn: tuple
+    instances: dict = field(default_factory=dict)
+    from_cache: bool = False
+
+
+def level_cache_path(seed, width, height, params, spacing=1.6, cache_dir=LEVEL_CACHE_DIR):
+    """Cache file for a layout, named by a hash of everything that shapes it."""
+    key = json.dumps(
+        {
+            "version": LEVEL_CACHE_VERSION,
+            "seed": seed,
+            "width": width,
+            "height": height,
+            "params": params,
+            "spacing": spacing,
+        },
+        sort_keys=True,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+    return os.path.join(cache_dir, digest + LEVEL_CACHE_SUFFIX)
+
+
+def _read_level_cache(path, seed, width, height):
+    try:
+        with open(path, "rb") as file:
+            header = file.read(_LEVEL_CACHE_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != _LEVEL_CACHE_HEADER.size:
+        return None
+
+    magic, version, cached_seed, cached_width, cached_height, spawn_x, spawn_y, *counts = (
+        _LEVEL_CACHE_HEADER.unpack(header)
+    )
+    if (
+        magic != _LEVEL_CACHE_MAGIC
+        or version != LEVEL_CACHE_VERSION
+        or (cached_seed, cached_width, cached_height) != (seed & _SEED_MASK, width, height)
+    ):
+        return None
+
+    offset = _LEVEL_CACHE_HEADER.size
+    grid_bytes = _aligned(width * height)
+    expected = offset + grid_bytes + sum(counts) * 3 * 4
+    if os.path.getsize(path) != expected:
+        return None
+
+    grid = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(height, width))
+    offset += grid_bytes
+
+    instances = {}
+    for name, count in zip(LEVEL_LAYERS, counts):
+        # np.memmap refuses zero-length maps
+        if count == 0:
+            instances[name] = np.zeros((0, 3), dtype=np.float32)
+            continue
+        instances[name] = np.memmap(
+            path, dtype=np.float32, mode="r", offset=offset, shape=(count, 3)
+        )
+        offset += count * 3 * 4
+    return Level(seed, grid, (spawn_x, spawn_y), instances, from_cache=True)
+
+
+def _write_level_cache(path, level):
+    height, width = level.grid.shape
+    header = _LEVEL_CACHE_HEADER.pack(
+        _LEVEL_CACHE_MAGIC,
+        LEVEL_CACHE_VERSION,
+        level.seed & _SEED_MASK,
+        width,
+        height,
+        *level.spawn,
+        *(len(level.instances[name]) for name in LEVEL_LAYERS),
+    )
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            file.write(header)
+            grid = np.ascontiguousarray(level.grid, dtype=np.uint8).tobytes()
+            file.write(grid.ljust(_aligned(len(grid)), b"\0"))
+            for name in LEVEL_LAYERS:
+                offsets = np.ascontiguousarray(level.instances[name], dtype=np.float32)
+                file.write(offsets.tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only working directory just skips the cache
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _aligned(size):
+    # Keeps the float32 arrays after the grid 4-byte aligned
+    return -(-size // 4) * 4
+
+
+def load_level(
+    width, height, seed=None, spacing=1.6, use_cache=True, cache_dir=LEVEL_CACHE_DIR, **params
+):
+    """Generate (or load from the cache) the dungeon for ``seed``.
+
+    ``params`` are passed to :class:`DungeonGenerator`. The cache is keyed
+    on the seed, size, generator parameters and spacing, so revisiting a
+    seed memory-maps the stored grid and instance arrays instead of
+    generating again.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    generator = DungeonGenerator(width, height, seed=seed, **params)
+    path = level_cache_path(seed, width, height, generator.params(), spacing, cache_dir)
+
+    if use_cache:
+        level = _read_level_cache(path, seed, width, height)
+        if level is not None:
+            return level
+
+    generator.generate_dungeon()
+    level = Level(
+        seed,
+        generator.grid,
+        generator.spawn,
+        build_level_instances(generator.grid, spacing),
+    )
+    if use_cache:
+        _write_level_cache(path, level)
+    return level
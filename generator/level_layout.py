@@ -0,0 +1,76 @@
+import numpy as np
+
+from .dungeon_generator import CHEST, WALL
+
+LEVEL_LAYERS = ("wall", "wall_vert", "ground", "roof", "chest")
+
+# World-space height of each layer's instances
+LAYER_HEIGHTS = {
+    "wall": 0.0,
+    "wall_vert": 0.0,
+    "ground": -1.0,
+    "roof": 2.5,
+    "chest": -0.6,
+}
+
+
+def layer_masks(grid):
+    """Boolean (height, width) mask of the cells drawn in each layer.
+
+    A wall cell gets a horizontal panel when it has a wall to its left or
+    right or sits on the top or bottom row, and a vertical panel when it
+    has a wall above or below or sits on the left or right column.
+    """
+    grid = np.asarray(grid)
+    wall = grid == WALL
+    height, width = wall.shape
+
+    horizontal = np.zeros_like(wall)
+    horizontal[:, 1:] |= wall[:, :-1]
+    horizontal[:, :-1] |= wall[:, 1:]
+    horizontal[[0, -1], :] = True
+
+    vertical = np.zeros_like(wall)
+    vertical[1:, :] |= wall[:-1, :]
+    vertical[:-1, :] |= wall[1:, :]
+    vertical[:, [0, -1]] = True
+
+    every = np.ones((height, width), dtype=bool)
+    return {
+        "wall": wall & horizontal,
+        "wall_vert": wall & vertical,
+        "ground": every,
+        "roof": every,
+        "chest": grid == CHEST,
+    }
+
+
+def build_level_instances(grid, spacing=1.6):
+    """Per-layer (n, 3) float32 offsets for ``grid``, in row-major cell order."""
+    instances = {}
+    for name, mask in layer_masks(grid).items():
+        rows, cols = np.nonzero(mask)
+        offsets = np.empty((len(rows), 3), dtype=np.float32)
+        offsets[:, 0] = cols * spacing
+        offsets[:, 1] = LAYER_HEIGHTS[name]
+        offsets[:, 2] = rows * spacing
+        instances[name] = offsets
+    return instances
+
+
+if __name__ == "__main__":
+    import time
+
+    from .dungeon_generator import DungeonGenerator
+
+    for width, height in ((80, 60), (256, 256), (512, 512), (1024, 1024)):
+        generator = DungeonGenerator(
+            width, height, seed=0, max_rooms=max(20, width * height // 2000)
+        )
+        generator.generate_dungeon()
+
+        start = time.perf_counter()
+        instances = build_level_instances(generator.grid)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        total = sum(len(offsets) for offsets in instances.values())
+        print(f"{width}x{height}: {elapsed_ms:.2f} ms for {total} instances")
@@ -0,0 +1,211 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from culling import ChunkGrid
+from generator.level_cache import Level, load_level
+from objloader import INSTANCE_DTYPE, make_instances, yaw_quaternion
+from visibility import PortalVisibility
+
+LEVEL_LAYER_NAMES = ("roof", "wall", "ground", "chest")
+
+
+def wall_instances(wall_offsets, wall_vert_offsets):
+    """Horizontal walls as-is plus vertical walls as the same mesh turned 90 degrees."""
+    return np.concatenate(
+        (
+            make_instances(wall_offsets),
+            make_instances(wall_vert_offsets, rotation=yaw_quaternion(90.0)),
+        )
+    )
+
+
+def level_layers(level, chunks):
+    """Chunk-sorted instance arrays for each drawn layer of ``level``."""
+    offsets = level.instances
+    return {
+        "roof": chunks.sort_instances("roof", make_instances(offsets["roof"])),
+        "wall": chunks.sort_instances(
+            "wall", wall_instances(offsets["wall"], offsets["wall_vert"])
+        ),
+        "ground": chunks.sort_instances("ground", make_instances(offsets["ground"])),
+        "chest": chunks.sort_instances("chest", make_instances(offsets["chest"])),
+    }
+
+
+@dataclass
+class PreparedLevel:
+    """Everything the renderer needs for one level, built without GL.
+
+    ``objects`` is filled in once the instance arrays have been uploaded.
+    """
+
+    level: Level
+    chunks: ChunkGrid
+    visibility: PortalVisibility
+    instances: dict
+    cells: dict
+    generation_ms: float = 0.0
+    objects: dict = field(default_factory=dict)
+
+
+def prepare_level(width, height, seed=None):
+    """Generate a level and its CPU-side render data; safe to run off the GL thread."""
+    start = time.perf_counter()
+    level = load_level(width, height, seed=seed)
+    chunks = ChunkGrid(level.grid.shape)
+    instances = level_layers(level, chunks)
+    visibility = PortalVisibility(level.grid)
+    cells = {name: visibility.cell_index(rows) for name, rows in instances.items()}
+    return PreparedLevel(
+        level,
+        chunks,
+        visibility,
+        instances,
+        cells,
+        generation_ms=(time.perf_counter() - start) * 1000,
+    )
+
+
+class LevelLoader:
+    """Builds levels on a worker thread and uploads them over several frames.
+
+    :meth:`request` starts generation in the background. :meth:`update` is
+    called once per frame on the GL thread: once the worker is done it
+    appends instance rows into a second set of Objects (created with
+    ``create_objects``) until ``upload_budget_ms`` is spent, and returns the
+    finished :class:`PreparedLevel` on the frame the upload completes. The
+    caller swaps it in and hands its old Objects back with :meth:`recycle`
+    so the two sets are reused as front and back buffers.
+
+    Generation runs on a single worker thread unless another executor is
+    passed in.
+
+    ``stats`` holds the last swap's worker time, upload time and frame
+    count, and the worst frame time seen while the level was loading.
+    """
+
+    def __init__(self, create_objects, upload_budget_ms=2.0, rows_per_step=2048, executor=None):
+        self.create_objects = create_objects
+        self.upload_budget_ms = upload_budget_ms
+        self.rows_per_step = rows_per_step
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level")
+        self.executor = executor
+        self.stats = {}
+        self._back_objects = None
+        self._future = None
+        self._steps = None
+        self._prepared = None
+        self._last_update = None
+        self._requested_at = None
+        self._uploading = None
+        self._reset_stats()
+
+    @property
+    def busy(self):
+        return self._future is not None or self._steps is not None
+
+    def request(self, width, height, seed=None):
+        """Start building a level in the background; ignored while one is loading."""
+        if self.busy:
+            return False
+        self._reset_stats()
+        self._requested_at = time.perf_counter()
+        self._future = self.executor.submit(prepare_level, width, height, seed)
+        return True
+
+    def load_now(self, width, height, seed=None):
+        """Build and upload a level synchronously (used at startup)."""
+        prepared = prepare_level(width, height, seed)
+        objects = self._take_back_objects()
+        for _ in self._upload_steps(prepared, objects):
+            pass
+        prepared.objects = objects
+        return prepared
+
+    def update(self):
+        """Advance the pending load; returns the level once it is ready to swap in."""
+        now = time.perf_counter()
+        if self.busy and self._last_update is not None:
+            frame_ms = (now - self._last_update) * 1000
+            self.stats["worst_frame_ms"] = max(self.stats["worst_frame_ms"], frame_ms)
+        self._last_update = now
+
+        if self._future is not None:
+            if not self._future.done():
+                return None
+            # Re-raises any generation error on the GL thread
+            self._prepared = self._future.result()
+            self._future = None
+            self.stats["generation_ms"] = self._prepared.generation_ms
+            self._steps = self._upload_steps(self._prepared, self._take_back_objects())
+
+        if self._steps is None:
+            return None
+
+        start = time.perf_counter()
+        deadline = start + self.upload_budget_ms / 1000
+        done = True
+        for _ in self._steps:
+            if time.perf_counter() >= deadline:
+                done = False
+                break
+        self.stats["upload_ms"] += (time.perf_counter() - start) * 1000
+        self.stats["upload_frames"] += 1
+        if not done:
+            return None
+
+        prepared, self._prepared, self._steps = self._prepared, None, None
+        prepared.objects = self._uploading
+        self.stats["latency_ms"] = (time.perf_counter() - self._requested_at) * 1000
+        return prepared
+
+    def recycle(self, objects):
+        """Keep a swapped-out set of Objects as the next back buffer."""
+        if self._back_objects is not None:
+            self._release_objects(self._back_objects)
+        self._back_objects = objects
+
+    def release(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self._future = None
+        if self._steps is not None:
+            # Objects of a half-uploaded level
+            self._release_objects(self._uploading)
+            self._steps = None
+        if self._back_objects is not None:
+            self._release_objects(self._back_objects)
+            self._back_objects = None
+
+    def _take_back_objects(self):
+        objects = self._back_objects or self.create_objects()
+        self._back_objects = None
+        self._uploading = objects
+        return objects
+
+    def _upload_steps(self, prepared, objects):
+        """Yield after each slice of rows appended to ``objects``."""
+        for name in LEVEL_LAYER_NAMES:
+            rows = prepared.instances[name]
+            obj = objects[name]
+            obj.set_instances(np.zeros(0, dtype=INSTANCE_DTYPE))
+            obj.reserve(len(rows))
+            for first in range(0, len(rows), self.rows_per_step):
+                obj.append(rows[first : first + self.rows_per_step])
+                yield
+
+    def _release_objects(self, objects):
+        for obj in objects.values():
+            obj.release()
+
+    def _reset_stats(self):
+        self.stats = {
+            "generation_ms": 0.0,
+            "latency_ms": 0.0,
+            "upload_ms": 0.0,
+            "upload_frames": 0,
+            "worst_frame_ms": 0.0,
+        }
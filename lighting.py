@@ -2,73 +2,247 @@ from pyglm import glm
 from OpenGL.GL import *
 import numpy as np
 
+from clustered import ClusterGrid, light_radii
+from profiler import default_profiler
+from uniforms import LIGHTS_BINDING, UniformBuffer
+
+MAX_LIGHTS = 1024
+
+# Texture units of the light buffer textures (unit 0 is the material texture)
+LIGHT_DATA_UNIT = 1
+CLUSTER_TABLE_UNIT = 2
+LIGHT_INDEX_UNIT = 3
+LIGHTMAP_UNIT = 4
+
+# std140 layout of the Lights block in shaders.py
+LIGHTS_DTYPE = np.dtype(
+    [
+        ("grid", "<i4", (4,)),
+        ("scale", "<f4", (4,)),
+        ("lightmap_transform", "<f4", (4,)),
+        ("lightmap_params", "<f4", (4,)),
+    ]
+)
+
+# Baked light is sampled this far in front of a surface, so walls pick up
+# the open cell they face
+LIGHTMAP_NORMAL_OFFSET = 0.8
+
+
+def light_data_dtype(max_lights=MAX_LIGHTS):
+    """Two RGBA32F texels per light: xyz position + radius, rgb color + intensity."""
+    return np.dtype([("lights", "<f4", (max_lights, 2, 4))])
+
+
 class Light:
-    def __init__(self, position, color=(1.0, 1.0, 1.0), intensity=1.0):
+    def __init__(self, position, color=(1.0, 1.0, 1.0), intensity=1.0, radius=None, static=False):
         self.position = glm.vec3(position)
         self.color = glm.vec3(color)
         self.intensity = intensity
+        # None derives the range from the intensity (see clustered.light_radii)
+        self.radius = radius
+        # Static lights can be baked into a lightmap (see lightmap.py)
+        self.static = static
+
+    @property
+    def range(self):
+        if self.radius is not None:
+            return self.radius
+        return float(light_radii(self.intensity, tuple(self.color))[0])
+
 
 class LightManager:
-    def __init__(self, shader_program, max_lights=8):
-        self.shader_program = shader_program
+    """Clustered forward lighting for up to ``max_lights`` lights.
+
+    Light data lives in a buffer texture backed by a persistent structured
+    array; the ``update_*`` methods write only the changed light's texels
+    and :meth:`upload_to_shader` re-uploads only those bytes. Given the
+    view matrix it also bins the lights into ``clusters`` (see
+    :class:`clustered.ClusterGrid`) and uploads the per-cluster light
+    lists, so each fragment only evaluates the lights that can reach it.
+    The lists are rebuilt only when the view or a light changed. Change
+    lights through the manager rather than on the :class:`Light` objects.
+
+    While a :class:`lightmap.Lightmap` is set with :meth:`set_lightmap`,
+    static lights come from the baked texture and are left out of the
+    clusters. ``static_version`` changes whenever a static light does, so
+    callers know when to bake again.
+    """
+
+    def __init__(
+        self, shader_program, max_lights=MAX_LIGHTS, clusters=None, binding=LIGHTS_BINDING
+    ):
         self.max_lights = max_lights
         self.lights = []
-        
-        # Get uniform locations
-        self.num_lights_loc = glGetUniformLocation(shader_program, "numLights")
-        self.light_positions_loc = glGetUniformLocation(shader_program, "lightPositions")
-        self.light_colors_loc = glGetUniformLocation(shader_program, "lightColors")
-        self.light_intensities_loc = glGetUniformLocation(shader_program, "lightIntensities")
-    
+        self.clusters = clusters if clusters is not None else ClusterGrid()
+        self.positions = np.zeros((max_lights, 3), dtype=np.float32)
+        self.radii = np.zeros(max_lights, dtype=np.float32)
+        self.cluster_bytes = 0
+        self.lightmap = None
+        self.static_version = 0
+
+        self.buffer = UniformBuffer(LIGHTS_DTYPE, binding)
+        self.buffer.set(
+            "grid", (self.clusters.tiles_x, self.clusters.tiles_y, self.clusters.slices, 0)
+        )
+        self.buffer.set("scale", self.clusters.shader_params)
+        self.buffer.set("lightmap_params", (0.0, LIGHTMAP_NORMAL_OFFSET, 0.0, 0.0))
+
+        self.data = UniformBuffer(light_data_dtype(max_lights), target=GL_TEXTURE_BUFFER)
+        self.cluster_table = glGenBuffers(1)
+        self.light_indices = glGenBuffers(1)
+        self.textures = glGenTextures(3)
+        for texture, buffer, fmt in zip(
+            self.textures,
+            (self.data.buffer_id, self.cluster_table, self.light_indices),
+            (GL_RGBA32F, GL_RG32UI, GL_R32UI),
+        ):
+            glBindBuffer(GL_TEXTURE_BUFFER, buffer)
+            if buffer != self.data.buffer_id:
+                glBufferData(GL_TEXTURE_BUFFER, 8, None, GL_STREAM_DRAW)
+            glBindTexture(GL_TEXTURE_BUFFER, texture)
+            glTexBuffer(GL_TEXTURE_BUFFER, fmt, buffer)
+        glBindTexture(GL_TEXTURE_BUFFER, 0)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+        self.bind_program(shader_program)
+
+        self._assigned_view = None
+        self._lights_changed = True
+
+    def bind_program(self, shader_program):
+        """Point a :class:`shaders.ShaderProgram`'s Lights block and samplers here."""
+        self.shader_program = shader_program
+        self.buffer.bind(shader_program.program, "Lights")
+        shader_program.use()
+        for name, unit in (
+            ("lightData", LIGHT_DATA_UNIT),
+            ("clusterLights", CLUSTER_TABLE_UNIT),
+            ("lightIndices", LIGHT_INDEX_UNIT),
+            ("bakedLight", LIGHTMAP_UNIT),
+        ):
+            glUniform1i(shader_program.location(name), unit)
+
+    @property
+    def bytes_uploaded(self):
+        """Bytes sent by the last :meth:`upload_to_shader` call."""
+        return self.buffer.bytes_uploaded + self.data.bytes_uploaded + self.cluster_bytes
+
+    @property
+    def static_lights(self):
+        return [light for light in self.lights if light.static]
+
+    def set_lightmap(self, lightmap):
+        """Light static lights from ``lightmap``, or per pixel again when None."""
+        self.lightmap = lightmap
+        if lightmap is not None:
+            self.buffer.set("lightmap_transform", lightmap.transform)
+        strength = 0.0 if lightmap is None else 1.0
+        self.buffer.set("lightmap_params", (strength, LIGHTMAP_NORMAL_OFFSET, 0.0, 0.0))
+        for index, light in enumerate(self.lights):
+            if light.static:
+                self._write_light(index)
+        self._lights_changed = True
+
     def add_light(self, light):
         if len(self.lights) < self.max_lights:
             self.lights.append(light)
+            self._write_light(len(self.lights) - 1)
         else:
             print(f"Maximum number of lights ({self.max_lights}) reached")
-    
+
     def remove_light(self, index):
         if 0 <= index < len(self.lights):
             del self.lights[index]
-    
+            # Later lights shift down a slot
+            for i in range(index, len(self.lights) + 1):
+                self._write_light(i)
+
+    def truncate(self, count):
+        """Drop every light after the first ``count``."""
+        removed = len(self.lights)
+        del self.lights[count:]
+        for i in range(count, removed):
+            self._write_light(i)
+
     def update_light_position(self, index, position):
         if 0 <= index < len(self.lights):
             self.lights[index].position = glm.vec3(position)
-    
+            self._write_light(index)
+
     def update_light_color(self, index, color):
         if 0 <= index < len(self.lights):
             self.lights[index].color = glm.vec3(color)
-    
+            self._write_light(index)
+
     def update_light_intensity(self, index, intensity):
         if 0 <= index < len(self.lights):
             self.lights[index].intensity = intensity
-    
-    def upload_to_shader(self):
-        """Upload all light data to the shader"""
-        glUseProgram(self.shader_program)
-        
-        num_lights = len(self.lights)
-        glUniform1i(self.num_lights_loc, num_lights)
-        
-        if num_lights > 0:
-            # Prepare arrays for positions, colors, and intensities
-            positions = []
-            colors = []
-            intensities = []
-            
-            for light in self.lights:
-                positions.extend([light.position.x, light.position.y, light.position.z])
-                colors.extend([light.color.x, light.color.y, light.color.z])
-                intensities.append(light.intensity)
-            
-            # Pad arrays to max_lights size if needed
-            while len(positions) < self.max_lights * 3:
-                positions.extend([0.0, 0.0, 0.0])
-            while len(colors) < self.max_lights * 3:
-                colors.extend([0.0, 0.0, 0.0])
-            while len(intensities) < self.max_lights:
-                intensities.append(0.0)
-            
-            # Upload to shader
-            glUniform3fv(self.light_positions_loc, self.max_lights, positions)
-            glUniform3fv(self.light_colors_loc, self.max_lights, colors)
-            glUniform1fv(self.light_intensities_loc, self.max_lights, intensities)
+            self._write_light(index)
+
+    def upload_to_shader(self, view=None):
+        """Upload changed light data and re-bin lights for a row-major ``view``.
+
+        Without ``view`` the previous cluster lists are kept. Returns the
+        number of bytes sent.
+        """
+        self.buffer.upload()
+        self.data.upload()
+        self.cluster_bytes = 0
+        if view is not None:
+            view = np.asarray(view, dtype=np.float32)
+            if self._lights_changed or not np.array_equal(view, self._assigned_view):
+                self._upload_clusters(view)
+
+        for unit, texture in zip(
+            (LIGHT_DATA_UNIT, CLUSTER_TABLE_UNIT, LIGHT_INDEX_UNIT), self.textures
+        ):
+            glActiveTexture(GL_TEXTURE0 + unit)
+            glBindTexture(GL_TEXTURE_BUFFER, texture)
+        if self.lightmap is not None:
+            glActiveTexture(GL_TEXTURE0 + LIGHTMAP_UNIT)
+            glBindTexture(GL_TEXTURE_2D, self.lightmap.texture_id)
+        glActiveTexture(GL_TEXTURE0)
+        return self.bytes_uploaded
+
+    def release(self):
+        self.buffer.release()
+        self.data.release()
+        glDeleteBuffers(2, [self.cluster_table, self.light_indices])
+        glDeleteTextures(self.textures)
+
+    def _upload_clusters(self, view):
+        count = len(self.lights)
+        table, indices = self.clusters.assign(view, self.positions[:count], self.radii[:count])
+        if len(indices) == 0:
+            # Zero-sized buffer textures are not allowed
+            indices = np.zeros(1, dtype=np.uint32)
+        for buffer, array in ((self.cluster_table, table), (self.light_indices, indices)):
+            glBindBuffer(GL_TEXTURE_BUFFER, buffer)
+            glBufferData(GL_TEXTURE_BUFFER, array.nbytes, array, GL_STREAM_DRAW)
+            self.cluster_bytes += array.nbytes
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+        default_profiler.count("buffer_bytes", self.cluster_bytes)
+        self._assigned_view = view
+        self._lights_changed = False
+
+    def _write_light(self, index):
+        if index < len(self.lights):
+            light = self.lights[index]
+            radius = light.range
+            texels = ((*light.position, radius), (*light.color, light.intensity))
+            self.positions[index] = tuple(light.position)
+            static = light.static
+            if static and self.lightmap is not None:
+                # Baked; a zero radius keeps it out of every cluster
+                radius = 0.0
+        else:
+            radius = 0.0
+            texels = ((0.0,) * 4, (0.0,) * 4)
+            static = True
+        if self.radii[index] != radius:
+            self.radii[index] = radius
+            self._lights_changed = True
+        if self.data.set("lights", texels, index):
+            self._lights_changed = True
+            if static:
+                self.static_version += 1
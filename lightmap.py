@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+from OpenGL.GL import *
+
+from generator.dungeon_generator import WALL
+
+LIGHTMAP_CACHE_DIR = "./.lightcache"
+LIGHTMAP_CACHE_SUFFIX = ".irradiance"
+LIGHTMAP_CACHE_VERSION = 1
+
+# magic, version, rows, cols
+_LIGHTMAP_HEADER = struct.Struct("<4sIII")
+_LIGHTMAP_MAGIC = b"P3DI"
+
+# Raycast samples per cell crossed
+RAY_SAMPLES_PER_CELL = 4
+
+
+def visible_cells(grid, origin, cells, spacing=1.6):
+    """Which ``cells`` ((n, 2) row, col) have no wall between them and ``origin``.
+
+    ``origin`` is a world (x, z). Each ray is sampled several times per
+    cell it crosses; the origin's and target's own cells never block.
+    """
+    grid = np.asarray(grid)
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    start = np.array([origin[1], origin[0]], dtype=np.float64) / spacing
+    start_cell = np.floor(start + 0.5).astype(np.int64)
+    delta = cells - start
+    if len(cells) == 0:
+        return np.zeros(0, dtype=bool)
+
+    steps = int(np.abs(delta).max() * RAY_SAMPLES_PER_CELL) + 2
+    t = np.linspace(0.0, 1.0, steps)
+    # (n, steps, 2) sampled cells along every ray
+    samples = np.floor(start + t[None, :, None] * delta[:, None, :] + 0.5).astype(np.int64)
+    samples[..., 0] = samples[..., 0].clip(0, grid.shape[0] - 1)
+    samples[..., 1] = samples[..., 1].clip(0, grid.shape[1] - 1)
+    blocked = grid[samples[..., 0], samples[..., 1]] == WALL
+    ends = np.all(samples == cells[:, None, :], axis=2) | np.all(samples == start_cell, axis=2)
+    return ~np.any(blocked & ~ends, axis=1)
+
+
+def bake_irradiance(grid, lights, spacing=1.6, sample_height=0.0, roof_height=2.5):
+    """Per-cell RGB light from ``lights``, as a (rows, cols, 3) float32 array.
+
+    Uses the attenuation and range window of the fragment shader without
+    the surface-facing term, evaluated at ``sample_height`` above each
+    cell centre. Lights below ``roof_height`` are occluded by wall cells
+    (see :func:`visible_cells`); lights above it shine over the walls.
+    Wall cells take the mean of their open neighbours so the texture can
+    be sampled with linear filtering.
+    """
+    grid = np.asarray(grid)
+    rows, cols = grid.shape
+    irradiance = np.zeros((rows, cols, 3), dtype=np.float32)
+    open_cells = np.argwhere(grid != WALL)
+
+    for light in lights:
+        radius = light.range
+        if radius <= 0 or light.intensity <= 0:
+            continue
+        position = np.array(tuple(light.position), dtype=np.float64)
+        offsets = np.column_stack(
+            (
+                open_cells[:, 1] * spacing - position[0],
+                np.full(len(open_cells), sample_height - position[1]),
+                open_cells[:, 0] * spacing - position[2],
+            )
+        )
+        distance = np.linalg.norm(offsets, axis=1)
+        near = distance < radius
+        cells, distance = open_cells[near], distance[near]
+        if position[1] < roof_height:
+            seen = visible_cells(grid, (position[0], position[2]), cells, spacing)
+            cells, distance = cells[seen], distance[seen]
+
+        attenuation = light.intensity / (1.0 + 0.09 * distance + 0.032 * distance**2)
+        window = np.clip(1.0 - (distance / radius) ** 4, 0.0, 1.0)
+        irradiance[cells[:, 0], cells[:, 1]] += (
+            (attenuation * window * window)[:, None] * np.array(tuple(light.color))
+        ).astype(np.float32)
+
+    wall = grid == WALL
+    padded = np.pad(irradiance, ((1, 1), (1, 1), (0, 0)))
+    is_open = np.pad(~wall, 1)
+    total = np.zeros_like(irradiance)
+    count = np.zeros((rows, cols), dtype=np.float32)
+    for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        neighbour_open = is_open[1 + dr : 1 + dr + rows, 1 + dc : 1 + dc + cols]
+        total += padded[1 + dr : 1 + dr + rows, 1 + dc : 1 + dc + cols] * neighbour_open[..., None]
+        count += neighbour_open
+    filled = total / np.maximum(count, 1)[..., None]
+    irradiance[wall] = filled[wall]
+    return irradiance
+
+
+def lightmap_cache_path(seed, grid, lights, spacing=1.6, cache_dir=LIGHTMAP_CACHE_DIR):
+    """Cache file for a seed's lightmap, keyed on the grid and every baked light."""
+    key = json.dumps(
+        {
+            "version": LIGHTMAP_CACHE_VERSION,
+            "grid": hashlib.sha1(np.ascontiguousarray(grid, dtype=np.uint8)).hexdigest(),
+            "spacing": spacing,
+            "lights": [
+                (tuple(light.position), tuple(light.color), light.intensity, light.range)
+                for light in lights
+            ],
+        },
+        sort_keys=True,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+    return os.path.join(cache_dir, f"{seed}-{digest}{LIGHTMAP_CACHE_SUFFIX}")
+
+
+def _read_lightmap_cache(path, rows, cols):
+    try:
+        with open(path, "rb") as file:
+            header = file.read(_LIGHTMAP_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != _LIGHTMAP_HEADER.size:
+        return None
+    magic, version, cached_rows, cached_cols = _LIGHTMAP_HEADER.unpack(header)
+    if (
+        magic != _LIGHTMAP_MAGIC
+        or version != LIGHTMAP_CACHE_VERSION
+        or (cached_rows, cached_cols) != (rows, cols)
+        or os.path.getsize(path) != _LIGHTMAP_HEADER.size + rows * cols * 3 * 4
+    ):
+        return None
+    return np.memmap(
+        path, dtype=np.float32, mode="r", offset=_LIGHTMAP_HEADER.size, shape=(rows, cols, 3)
+    )
+
+
+def _write_lightmap_cache(path, irradiance):
+    rows, cols = irradiance.shape[:2]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            file.write(_LIGHTMAP_HEADER.pack(_LIGHTMAP_MAGIC, LIGHTMAP_CACHE_VERSION, rows, cols))
+            file.write(np.ascontiguousarray(irradiance, dtype=np.float32).tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only working directory just skips the cache
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_irradiance(seed, grid, lights, spacing=1.6, use_cache=True, cache_dir=LIGHTMAP_CACHE_DIR):
+    """Bake (or memory-map from the cache) the irradiance grid of ``lights``."""
+    grid = np.asarray(grid)
+    path = lightmap_cache_path(seed, grid, lights, spacing, cache_dir)
+    if use_cache:
+        irradiance = _read_lightmap_cache(path, *grid.shape)
+        if irradiance is not None:
+            return irradiance
+    irradiance = bake_irradiance(grid, lights, spacing)
+    if use_cache:
+        _write_lightmap_cache(path, irradiance)
+    return irradiance
+
+
+class Lightmap:
+    """An irradiance grid uploaded as an RGB16F texture, one texel per cell."""
+
+    def __init__(self, irradiance, spacing=1.6):
+        self.rows, self.cols = irradiance.shape[:2]
+        self.spacing = spacing
+        self.texture_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexImage2D(
+            GL_TEXTURE_2D,
+            0,
+            GL_RGB16F,
+            self.cols,
+            self.rows,
+            0,
+            GL_RGB,
+            GL_FLOAT,
+            np.ascontiguousarray(irradiance, dtype=np.float32),
+        )
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    @property
+    def transform(self):
+        """``(scale u, scale v, offset u, offset v)`` mapping world x/z to texture uv."""
+        return (
+            1.0 / (self.cols * self.spacing),
+            1.0 / (self.rows * self.spacing),
+            0.5 / self.cols,
+            0.5 / self.rows,
+        )
+
+    def release(self):
+        if self.texture_id is not None:
+            glDeleteTextures([self.texture_id])
+            self.texture_id = None
+
+
+if __name__ == "__main__":
+    import time
+
+    from generator.dungeon_generator import DungeonGenerator
+    from lighting import Light
+
+    for size in (80, 256):
+        generator = DungeonGenerator(size, size, seed=0, max_rooms=max(20, size * size // 2000))
+        generator.generate_dungeon()
+        open_cells = np.argwhere(generator.grid != WALL)
+        rng = np.random.default_rng(0)
+        picks = open_cells[rng.integers(len(open_cells), size=64)]
+        lights = [
+            Light((col * 1.6, 1.8, row * 1.6), (1.0, 0.6, 0.25), 1.5, radius=8.0)
+            for row, col in picks.tolist()
+        ]
+        start = time.perf_counter()
+        bake_irradiance(generator.grid, lights)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{size}x{size}, {len(lights)} lights: baked in {elapsed:.1f} ms")
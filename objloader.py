@@ -1,20 +1,924 @@
 from pygame.locals import *
 from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import *
 import numpy as np
 import ctypes
+import os
+import struct
 import pygame
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from profiler import default_profiler
+from textures import BC1, BC3, RGBA8, load_texture_pixels
+
+MESH_CACHE_SUFFIX = ".meshcache"
+MESH_CACHE_VERSION = 1
+# magic, version, source mtime_ns, source size, vertex count, index count, face shape
+_MESH_CACHE_HEADER = struct.Struct("<4sIqqIII")
+_MESH_CACHE_MAGIC = b"P3DM"
+
+# Cluster cell size of each simplified level of detail, as a fraction of the
+# mesh's bounding box diagonal; level 0 is the source mesh
+LOD_CELL_FRACTIONS = (0.1, 0.15)
+# Camera distance at which each simplified level takes over
+LOD_DISTANCES = (10.0, 20.0)
+# Instances keep their level until they are this far past a switch distance
+LOD_HYSTERESIS = 1.0
+
+
+def _float_block(lines, width):
+    """Parse "<tag> x y z ..." lines into an (n, width) float32 array."""
+    if not lines:
+        return np.zeros((0, width), dtype=np.float32)
+
+    tokens = np.array(b" ".join(lines).split())
+    # Every row starts with the tag, so equally spaced tags mean equal rows
+    starts = np.flatnonzero(tokens == tokens[0])
+    row_width = len(tokens) // len(lines)
+    if (
+        len(starts) == len(lines)
+        and len(tokens) == len(lines) * row_width
+        and np.all(np.diff(starts) == row_width)
+    ):
+        table = tokens.reshape(len(lines), -1)[:, 1 : width + 1]
+    else:
+        # Ragged rows (optional v w or vt v/w components): split per line,
+        # padding missing components with 0
+        table = np.array([(line.split()[1:] + [b"0"] * width)[:width] for line in lines])
+    if table.shape[1] < width:
+        table = np.hstack((table, np.full((len(lines), width - table.shape[1]), b"0")))
+    # Parse as double first so rounding matches float(...) -> float32
+    return table.astype(np.float64).astype(np.float32)
+
+
+def _face_corners(corners):
+    """Split "v/vt/vn" corner tokens into an (n, 3) zero-based index array."""
+    fields = b"/".join(corners).split(b"/")
+    if len(fields) == 3 * len(corners):
+        table = np.array(fields).reshape(-1, 3)
+    else:
+        table = np.array([(c.split(b"/") + [b"", b""])[:3] for c in corners], dtype=np.bytes_)
+    # Missing vt/vn fields map to index 0, matching the old per-line loader
+    table[table == b""] = b"1"
+    return table.astype(np.int64) - 1
+
+
+def parse_obj(filename):
+    """Parse an OBJ file into interleaved vertices and triangle indices.
+
+    Returns ``(vertices, indices, face_shape)`` where ``vertices`` is an
+    (n, 8) float32 array of position, texcoord and normal, and ``indices``
+    is a uint32 array with quads split into (0, 1, 2) and (0, 2, 3).
+    """
+    with open(filename, "rb") as file:
+        lines = file.read().splitlines()
+
+    v_lines, vt_lines, vn_lines, f_lines = [], [], [], []
+    for line in lines:
+        if line.startswith(b"v "):
+            v_lines.append(line)
+        elif line.startswith(b"vt "):
+            vt_lines.append(line)
+        elif line.startswith(b"vn "):
+            vn_lines.append(line)
+        elif line.startswith(b"f "):
+            f_lines.append(line)
+
+    positions = _float_block(v_lines, 3)
+    texcoords = _float_block(vt_lines, 2)
+    normals = _float_block(vn_lines, 3)
+
+    face_tokens = [line.split()[1:] for line in f_lines]
+    counts = np.array([len(tokens) for tokens in face_tokens], dtype=np.int64)
+    if np.any((counts != 3) & (counts != 4)):
+        raise ValueError("Unsupported face format")
+
+    face_shape = None
+    if len(counts):
+        face_shape = GL_QUADS if counts[-1] == 4 else GL_TRIANGLES
+
+    corners = _face_corners([t for tokens in face_tokens for t in tokens])
+    if len(corners) == 0:
+        return (
+            np.zeros((0, 8), dtype=np.float32),
+            np.zeros(0, dtype=np.uint32),
+            face_shape,
+        )
+
+    # Dedupe on (v, vt) keeping first-occurrence order, like the old dict did
+    _, first, inverse = np.unique(corners[:, :2], axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    corner_vertex = remap[inverse.reshape(-1)]
+    first = first[order]
+
+    v_idx, vt_idx, vn_idx = corners[first].T
+    tex = np.zeros((len(first), 2), dtype=np.float32)
+    has_tex = vt_idx < len(texcoords)
+    tex[has_tex] = texcoords[vt_idx[has_tex]]
+    vertices = np.hstack((positions[v_idx], tex, normals[vn_idx]))
+
+    # Triangulate: tri -> (0, 1, 2), quad -> (0, 1, 2) + (0, 2, 3)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    is_quad = counts == 4
+    pattern = np.where(is_quad[:, None], [0, 1, 2, 0, 2, 3], [0, 1, 2, 0, 0, 0])
+    keep = is_quad[:, None] | (np.arange(6) < 3)
+    indices = corner_vertex[(starts[:, None] + pattern)[keep]]
+
+    return vertices, indices.astype(np.uint32), face_shape
+
+
+def _mesh_cache_path(filename, variant=""):
+    return filename + variant + MESH_CACHE_SUFFIX
+
+
+def _read_mesh_cache(filename, stat, variant=""):
+    path = _mesh_cache_path(filename, variant)
+    try:
+        with open(path, "rb") as file:
+            header = file.read(_MESH_CACHE_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != _MESH_CACHE_HEADER.size:
+        return None
+
+    magic, version, mtime_ns, size, n_vertices, n_indices, face_shape = _MESH_CACHE_HEADER.unpack(
+        header
+    )
+    if (
+        magic != _MESH_CACHE_MAGIC
+        or version != MESH_CACHE_VERSION
+        or mtime_ns != stat.st_mtime_ns
+        or size != stat.st_size
+    ):
+        return None
+
+    offset = _MESH_CACHE_HEADER.size
+    expected = offset + n_vertices * 8 * 4 + n_indices * 4
+    if os.path.getsize(path) != expected:
+        return None
+
+    # np.memmap refuses zero-length maps
+    if n_vertices == 0 or n_indices == 0:
+        return None
+
+    vertices = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(n_vertices, 8))
+    offset += n_vertices * 8 * 4
+    indices = np.memmap(path, dtype=np.uint32, mode="r", offset=offset, shape=(n_indices,))
+    return vertices, indices, face_shape or None
+
+
+def _write_mesh_cache(filename, stat, vertices, indices, face_shape, variant=""):
+    path = _mesh_cache_path(filename, variant)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    header = _MESH_CACHE_HEADER.pack(
+        _MESH_CACHE_MAGIC,
+        MESH_CACHE_VERSION,
+        stat.st_mtime_ns,
+        stat.st_size,
+        len(vertices),
+        len(indices),
+        int(face_shape or 0),
+    )
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(header)
+            file.write(np.ascontiguousarray(vertices, dtype=np.float32).tobytes())
+            file.write(np.ascontiguousarray(indices, dtype=np.uint32).tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        # Read-only asset directories just skip the cache
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_mesh(filename, use_cache=True):
+    """Load an OBJ mesh, using the binary sidecar cache when it is fresh.
+
+    The sidecar (``<file>.meshcache``) is keyed on the source file's mtime
+    and size; cached arrays are returned as read-only memory maps.
+    """
+    if not use_cache:
+        return parse_obj(filename)
+
+    stat = os.stat(filename)
+    cached = _read_mesh_cache(filename, stat)
+    if cached is not None:
+        return cached
+
+    vertices, indices, face_shape = parse_obj(filename)
+    _write_mesh_cache(filename, stat, vertices, indices, face_shape)
+    return vertices, indices, face_shape
+
+
+def simplify_mesh(vertices, indices, cell_size):
+    """Vertex-cluster a mesh on a grid of ``cell_size`` cubes.
+
+    Vertices sharing a cell and a dominant normal axis (so hard edges
+    survive) merge into one at their mean position and normal; it keeps
+    the texcoord of the vertex nearest that mean, so palette textures are
+    not blended. Triangles that collapse or duplicate another are dropped.
+    Returns ``(vertices, indices)`` in the :func:`parse_obj` layout.
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    indices = np.asarray(indices, dtype=np.uint32)
+    positions = vertices[:, :3].astype(np.float64)
+    normals = vertices[:, 5:8].astype(np.float64)
+    cells = np.floor((positions - positions.min(axis=0)) / cell_size).astype(np.int64)
+    axis = np.abs(normals).argmax(axis=1)
+    facing = axis * 2 + (normals[np.arange(len(normals)), axis] < 0)
+    _, cluster = np.unique(np.column_stack((cells, facing)), axis=0, return_inverse=True)
+    cluster = cluster.reshape(-1)
+    count = cluster.max() + 1 if len(cluster) else 0
+
+    sizes = np.bincount(cluster, minlength=count)[:, None]
+    merged = np.zeros((count, 8), dtype=np.float64)
+    np.add.at(merged, cluster, vertices)
+    merged /= sizes
+    length = np.linalg.norm(merged[:, 5:8], axis=1, keepdims=True)
+    merged[:, 5:8] /= np.maximum(length, 1e-12)
+    # Texcoord of the member nearest each cluster's mean position
+    distance = np.linalg.norm(positions - merged[cluster, :3], axis=1)
+    order = np.lexsort((distance, cluster))
+    first = order[np.r_[True, cluster[order][1:] != cluster[order][:-1]]]
+    merged[cluster[first], 3:5] = vertices[first, 3:5]
+
+    triangles = cluster[indices].reshape(-1, 3)
+    keep = (
+        (triangles[:, 0] != triangles[:, 1])
+        & (triangles[:, 1] != triangles[:, 2])
+        & (triangles[:, 0] != triangles[:, 2])
+    )
+    triangles = triangles[keep]
+    _, unique = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    triangles = triangles[np.sort(unique)]
+    return merged.astype(np.float32), triangles.reshape(-1).astype(np.uint32)
+
+
+def load_lod_meshes(filename, fractions=LOD_CELL_FRACTIONS, use_cache=True):
+    """Simplified levels of detail of an OBJ mesh, one per cell fraction.
+
+    Each level is :func:`simplify_mesh` of the level before it with cells
+    of ``fraction`` times the source's bounding box diagonal, so coarser
+    levels never have more triangles. Levels are cached like
+    :func:`load_mesh`, in ``<file>.lod<fractions>.meshcache``. Returns
+    ``(vertices, indices, face_shape)`` like :func:`load_mesh`; simplified
+    levels are always ``GL_TRIANGLES``.
+    """
+    stat = os.stat(filename) if use_cache else None
+    vertices, indices, _ = load_mesh(filename, use_cache)
+    positions = np.asarray(vertices)[:, :3]
+    diagonal = float(np.linalg.norm(positions.max(axis=0) - positions.min(axis=0)))
+    levels = []
+    for level, fraction in enumerate(fractions):
+        # Named after every fraction up to this one, since levels build on each other
+        variant = ".lod" + "-".join(f"{f:g}" for f in fractions[: level + 1])
+        cached = _read_mesh_cache(filename, stat, variant) if use_cache else None
+        if cached is not None and cached[2] == GL_TRIANGLES:
+            vertices, indices = cached[:2]
+        else:
+            vertices, indices = simplify_mesh(vertices, indices, fraction * diagonal)
+            if use_cache:
+                _write_mesh_cache(filename, stat, vertices, indices, GL_TRIANGLES, variant)
+        levels.append((vertices, indices, GL_TRIANGLES))
+    return levels
+
+
+def select_lods(distances, previous, switch_distances, hysteresis=LOD_HYSTERESIS):
+    """Level of detail for each instance at ``distances`` from the camera.
+
+    An instance moves to a coarser level only once it is ``hysteresis / 2``
+    past that level's switch distance, and back only once it is as far
+    inside it, so instances near a switch distance do not flicker.
+    ``previous`` holds the last levels (-1 for instances without one).
+    """
+    switch = np.asarray(switch_distances, dtype=np.float64)
+    nearest = np.searchsorted(switch + hysteresis / 2, distances)
+    farthest = np.searchsorted(switch - hysteresis / 2, distances)
+    previous = np.asarray(previous)
+    levels = np.where(previous < 0, np.searchsorted(switch, distances), previous)
+    return np.clip(levels, nearest, farthest).astype(np.int8)
+
+
+# GL objects created by this module that have not been deleted yet, by kind
+_live_handles = {"vertex_array": 0, "buffer": 0, "texture": 0}
+
+
+def _track_handles(kind, delta):
+    _live_handles[kind] += delta
+
+
+def live_handles():
+    """Return the number of live GL handles owned by this module, by kind."""
+    return dict(_live_handles)
+
+
+def live_handle_count():
+    return sum(_live_handles.values())
+
+
+def _set_vertex_layout():
+    """Describe the interleaved position/texcoord/normal layout on the bound VBO."""
+    stride = 8 * ctypes.sizeof(ctypes.c_float)
+
+    # Position attribute
+    glEnableVertexAttribArray(0)
+    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+
+    # Texture attribute
+    glEnableVertexAttribArray(1)
+    glVertexAttribPointer(
+        1,
+        2,
+        GL_FLOAT,
+        GL_FALSE,
+        stride,
+        ctypes.c_void_p(3 * ctypes.sizeof(ctypes.c_float)),
+    )
+
+    # Normals attribute
+    glEnableVertexAttribArray(2)
+    glVertexAttribPointer(
+        2,
+        3,
+        GL_FLOAT,
+        GL_FALSE,
+        stride,
+        ctypes.c_void_p(5 * ctypes.sizeof(ctypes.c_float)),
+    )
+
+
+def upload_mesh(vertices, indices):
+    """Upload mesh data and return ``(vao, vbo, ebo)`` with the vertex layout bound."""
+    # np.asarray keeps memory-mapped cache data zero-copy
+    vertices = np.asarray(vertices, dtype=np.float32)
+    indices = np.asarray(indices, dtype=np.uint32)
+
+    vao = glGenVertexArrays(1)
+    vbo = glGenBuffers(1)
+    ebo = glGenBuffers(1)
+    _track_handles("vertex_array", 1)
+    _track_handles("buffer", 2)
+
+    glBindVertexArray(vao)
+
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
+    _set_vertex_layout()
+
+    glBindVertexArray(0)
+
+    return vao, vbo, ebo
+
+
+# Generic vertex attribute holding the array-texture layer of a draw; -1
+# samples the plain 2D texture bound to unit 0 instead
+TEXTURE_LAYER_LOCATION = 7
+# Texture unit the shared texture array stays bound to
+TEXTURE_ARRAY_UNIT = 5
+
+_COMPRESSED_FORMATS = {
+    BC1: GL_COMPRESSED_RGB_S3TC_DXT1_EXT,
+    BC3: GL_COMPRESSED_RGBA_S3TC_DXT5_EXT,
+}
+
+
+def supports_texture_compression():
+    """Whether the current context can sample S3TC (BC1/BC3) textures."""
+    count = glGetIntegerv(GL_NUM_EXTENSIONS)
+    return any(
+        glGetStringi(GL_EXTENSIONS, i) == b"GL_EXT_texture_compression_s3tc" for i in range(count)
+    )
+
+
+def _set_texture_parameters(target, levels):
+    glTexParameteri(target, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(target, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    glTexParameteri(target, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    glTexParameteri(target, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    glTexParameteri(target, GL_TEXTURE_MAX_LEVEL, levels - 1)
+
+
+def upload_texture(filename, flip=True, fmt=RGBA8):
+    """Upload an image's cached mip chain (see ``textures.load_texture_pixels``).
+
+    Returns ``(texture_id, width, height, nbytes)``.
+    """
+    pixels = load_texture_pixels(filename, flip, fmt=fmt)
+    texture = glGenTextures(1)
+    _track_handles("texture", 1)
+    glBindTexture(GL_TEXTURE_2D, texture)
+    _set_texture_parameters(GL_TEXTURE_2D, len(pixels.levels))
+
+    for level, data in enumerate(pixels.levels):
+        width, height = pixels.level_size(level)
+        if fmt == RGBA8:
+            glTexImage2D(
+                GL_TEXTURE_2D, level, GL_RGBA8, width, height, 0,
+                GL_RGBA, GL_UNSIGNED_BYTE, np.ascontiguousarray(data),
+            )  # fmt: skip
+        else:
+            glCompressedTexImage2D(
+                GL_TEXTURE_2D, level, _COMPRESSED_FORMATS[fmt], width, height, 0,
+                np.ascontiguousarray(data),
+            )  # fmt: skip
+    return texture, pixels.width, pixels.height, pixels.nbytes
+
+
+def upload_texture_array(filenames, flip=True, fmt=RGBA8):
+    """Pack images into one ``GL_TEXTURE_2D_ARRAY``, one layer per file.
+
+    Layers take the largest width and height among the images; smaller
+    ones are resampled to it (see ``textures.resize_nearest``). Returns
+    ``(texture_id, width, height, nbytes)``.
+    """
+    # Natural sizes come from the cached chains, without decoding the images
+    sources = [load_texture_pixels(filename, flip) for filename in filenames]
+    size = (max(p.width for p in sources), max(p.height for p in sources))
+    layers = [load_texture_pixels(f, flip, size, fmt) for f in filenames]
+
+    texture = glGenTextures(1)
+    _track_handles("texture", 1)
+    glBindTexture(GL_TEXTURE_2D_ARRAY, texture)
+    levels = len(layers[0].levels)
+    _set_texture_parameters(GL_TEXTURE_2D_ARRAY, levels)
+
+    for level in range(levels):
+        width, height = layers[0].level_size(level)
+        data = np.concatenate([layer.levels[level].reshape(-1) for layer in layers])
+        if fmt == RGBA8:
+            glTexImage3D(
+                GL_TEXTURE_2D_ARRAY, level, GL_RGBA8, width, height, len(layers), 0,
+                GL_RGBA, GL_UNSIGNED_BYTE, data,
+            )  # fmt: skip
+        else:
+            glCompressedTexImage3D(
+                GL_TEXTURE_2D_ARRAY, level, _COMPRESSED_FORMATS[fmt],
+                width, height, len(layers), 0, data,
+            )  # fmt: skip
+    glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+    return texture, size[0], size[1], sum(layer.nbytes for layer in layers)
+
+
+@dataclass
+class MeshHandle:
+    key: tuple
+    vao: int
+    vbo: int
+    ebo: int
+    index_count: int
+    face_shape: int
+    nbytes: int
+    refcount: int = 0
+
+
+@dataclass
+class TextureHandle:
+    key: tuple
+    texture_id: int
+    width: int
+    height: int
+    nbytes: int
+    refcount: int = 0
+    # Layer of the registry's texture array, or -1 for a texture of its own
+    layer: int = -1
+
+
+class AssetRegistry:
+    """Shares GPU meshes and textures between Objects.
+
+    Handles are reference counted and keyed on the resolved path plus load
+    options. Released handles stay resident in an LRU so that re-acquiring
+    them is free; the oldest are deleted once more than ``max_unused`` are
+    idle or :meth:`evict` is called.
+
+    Textures registered with :meth:`set_texture_array` are packed into one
+    array texture instead; their handles carry a ``layer`` and share the
+    array, which stays resident until :meth:`clear`.
+    """
+
+    def __init__(self, max_unused=16):
+        self.max_unused = max_unused
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_resident = 0
+        self.texture_array = None
+        self._handles = {}
+        self._unused = OrderedDict()
+        self._array_layers = {}
+
+    def acquire_mesh(self, filename):
+        key = ("mesh", os.path.abspath(filename))
+        handle = self._lookup(key)
+        if handle is None:
+            vertices, indices, face_shape = load_mesh(filename)
+            handle = self._upload_mesh(key, vertices, indices, face_shape)
+        return handle
+
+    def acquire_lods(self, filename, fractions=LOD_CELL_FRACTIONS):
+        """Mesh handles of the simplified levels of ``filename`` (see :func:`load_lod_meshes`)."""
+        path = os.path.abspath(filename)
+        keys = [("mesh", path, tuple(fractions[: i + 1])) for i in range(len(fractions))]
+        handles = [self._lookup(key) for key in keys]
+        if None in handles:
+            levels = load_lod_meshes(filename, fractions)
+            for i, (vertices, indices, face_shape) in enumerate(levels):
+                if handles[i] is None:
+                    handles[i] = self._upload_mesh(keys[i], vertices, indices, face_shape)
+        return handles
+
+    def acquire_texture(self, filename, flip=True):
+        key = ("texture", os.path.abspath(filename), bool(flip))
+        handle = self._lookup(key)
+        if handle is None:
+            layer = self._array_layers.get(key)
+            if layer is not None:
+                array = self.texture_array
+                handle = TextureHandle(
+                    key, array.texture_id, array.width, array.height, 0, layer=layer
+                )
+            else:
+                handle = TextureHandle(key, *upload_texture(filename, flip))
+            self._insert(handle)
+        return handle
+
+    def set_texture_array(self, filenames, flip=True, fmt=RGBA8):
+        """Serve ``filenames`` from one ``GL_TEXTURE_2D_ARRAY`` from now on.
+
+        Call before acquiring them. The array is bound to
+        ``TEXTURE_ARRAY_UNIT`` for the life of the registry, so drawing
+        these textures needs no binding changes. ``fmt`` may ask for S3TC
+        blocks (``textures.BC1``/``BC3``); contexts without S3TC get RGBA8.
+        """
+        if self.texture_array is not None:
+            raise RuntimeError("The texture array is already set; clear() first")
+        if fmt != RGBA8 and not supports_texture_compression():
+            print(f"S3TC textures unsupported, uploading {fmt} as {RGBA8}")
+            fmt = RGBA8
+        paths = tuple(os.path.abspath(filename) for filename in filenames)
+        self.texture_array = TextureHandle(
+            ("texture_array", paths, bool(flip), fmt),
+            *upload_texture_array(filenames, flip, fmt),
+            refcount=1,
+        )
+        self.bytes_resident += self.texture_array.nbytes
+        self._array_layers = {
+            ("texture", path, bool(flip)): layer for layer, path in enumerate(paths)
+        }
+        glActiveTexture(GL_TEXTURE0 + TEXTURE_ARRAY_UNIT)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.texture_array.texture_id)
+        glActiveTexture(GL_TEXTURE0)
+
+    def release(self, handle):
+        """Drop one reference; unreferenced handles become evictable."""
+        if handle.refcount <= 0:
+            raise ValueError(f"Handle {handle.key} released more times than acquired")
+        handle.refcount -= 1
+        if handle.refcount == 0:
+            self._unused[handle.key] = handle
+            self.evict(self.max_unused)
+
+    def evict(self, keep=0):
+        """Delete unreferenced GPU resources, keeping the ``keep`` most recent."""
+        while len(self._unused) > keep:
+            _, handle = self._unused.popitem(last=False)
+            self._destroy(handle)
+
+    def clear(self):
+        """Delete every resource, referenced or not (e.g. before context teardown)."""
+        for handle in list(self._handles.values()):
+            self._destroy(handle)
+        self._unused.clear()
+        if self.texture_array is not None:
+            glDeleteTextures([self.texture_array.texture_id])
+            _track_handles("texture", -1)
+            self.bytes_resident -= self.texture_array.nbytes
+            self.texture_array = None
+            self._array_layers = {}
+
+    def __contains__(self, key):
+        return key in self._handles
+
+    def __len__(self):
+        return len(self._handles)
+
+    def _lookup(self, key):
+        handle = self._handles.get(key)
+        if handle is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._unused.pop(key, None)
+        handle.refcount += 1
+        return handle
+
+    def _upload_mesh(self, key, vertices, indices, face_shape):
+        vao, vbo, ebo = upload_mesh(vertices, indices)
+        handle = MeshHandle(
+            key,
+            vao,
+            vbo,
+            ebo,
+            len(indices),
+            face_shape,
+            np.asarray(vertices).nbytes + np.asarray(indices).nbytes,
+        )
+        self._insert(handle)
+        return handle
+
+    def _insert(self, handle):
+        handle.refcount = 1
+        self._handles[handle.key] = handle
+        self.bytes_resident += handle.nbytes
+
+    def _destroy(self, handle):
+        if isinstance(handle, MeshHandle):
+            glDeleteVertexArrays(1, [handle.vao])
+            glDeleteBuffers(2, [handle.vbo, handle.ebo])
+            _track_handles("vertex_array", -1)
+            _track_handles("buffer", -2)
+        elif handle.layer < 0:
+            glDeleteTextures([handle.texture_id])
+            _track_handles("texture", -1)
+        del self._handles[handle.key]
+        self.bytes_resident -= handle.nbytes
+        self.evictions += 1
+
+
+# Shared by every Object that is not given its own registry
+default_registry = AssetRegistry()
+
+
+# Per-instance attributes, bound to consecutive locations starting at 3.
+# Rotation is a unit quaternion (x, y, z, w); tint multiplies the texture.
+INSTANCE_DTYPE = np.dtype(
+    [
+        ("offset", np.float32, 3),
+        ("rotation", np.float32, 4),
+        ("scale", np.float32, 3),
+        ("tint", np.float32, 4),
+    ]
+)
+INSTANCE_LOCATION = 3
+
+
+def yaw_quaternion(degrees):
+    """Quaternion(s) for a rotation of ``degrees`` around +Y, like glm.rotate."""
+    half = np.radians(np.asarray(degrees, dtype=np.float64)) / 2
+    quat = np.zeros(half.shape + (4,), dtype=np.float32)
+    quat[..., 1] = np.sin(half)
+    quat[..., 3] = np.cos(half)
+    return quat
+
+
+def make_instances(offsets, rotation=None, scale=None, tint=None):
+    """Build an ``INSTANCE_DTYPE`` array; omitted fields get identity values.
+
+    ``rotation``, ``scale`` and ``tint`` may be a single value for every
+    instance or one row per instance.
+    """
+    offsets = np.asarray(offsets, dtype=np.float32).reshape(-1, 3)
+    instances = np.empty(len(offsets), dtype=INSTANCE_DTYPE)
+    instances["offset"] = offsets
+    instances["rotation"] = (0.0, 0.0, 0.0, 1.0) if rotation is None else rotation
+    instances["scale"] = 1.0 if scale is None else scale
+    instances["tint"] = 1.0 if tint is None else tint
+    return instances
+
+
+def _set_default_instance_attributes():
+    """Identity values for instance attributes when no instance buffer is bound."""
+    glVertexAttrib4f(INSTANCE_LOCATION + 1, 0.0, 0.0, 0.0, 1.0)
+    glVertexAttrib3f(INSTANCE_LOCATION + 2, 1.0, 1.0, 1.0)
+    glVertexAttrib4f(INSTANCE_LOCATION + 3, 1.0, 1.0, 1.0, 1.0)
+
+
+def _bind_material(texture_id, layer=-1):
+    """Sample a layer of the texture array, or bind ``texture_id`` to unit 0."""
+    glVertexAttrib1f(TEXTURE_LAYER_LOCATION, layer)
+    if layer < 0 and texture_id is not None:
+        glBindTexture(GL_TEXTURE_2D, texture_id)
+        default_profiler.count("texture_binds")
+
+
+def _instanced_vao(mesh, instances):
+    """A VAO drawing ``mesh`` with per-instance attributes from ``instances``."""
+    # Instanced objects need their own VAO to bind a per-object instance
+    # buffer, but still source vertices and indices from the shared mesh
+    vao = glGenVertexArrays(1)
+    _track_handles("vertex_array", 1)
+    glBindVertexArray(vao)
+
+    glBindBuffer(GL_ARRAY_BUFFER, mesh.vbo)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, mesh.ebo)
+    _set_vertex_layout()
+    instances.bind_attributes()
+
+    glBindVertexArray(0)
+    return vao
+
+
+class InstanceBuffer:
+    """Growable per-instance attribute buffer (``GL_DYNAMIC_DRAW``).
+
+    Rows are ``INSTANCE_DTYPE`` records; plain (n, 3) offset arrays are
+    expanded with identity rotation, scale and tint. A CPU mirror of the
+    active rows is kept so that :meth:`append` and :meth:`remove` can edit
+    in place. ``INSTANCE_DTYPE`` arrays passed to :meth:`set_instances` are
+    uploaded and mirrored without copying when they are C-contiguous; the
+    mirror is only copied the first time it has to be modified.
+    """
+
+    GROWTH = 2
+    MIN_CAPACITY = 16
+
+    def __init__(self, dtype=INSTANCE_DTYPE, location=INSTANCE_LOCATION):
+        self.dtype = dtype
+        self.location = location
+        self.stride = dtype.itemsize
+        self.count = 0
+        self.capacity = 0
+        self.bytes_uploaded = 0
+        self._data = np.zeros(0, dtype=dtype)
+        self._owned = True
+        self.vbo = glGenBuffers(1)
+        _track_handles("buffer", 1)
+
+    @property
+    def data(self):
+        """Active instance rows (read-only view)."""
+        view = self._data[: self.count].view()
+        view.flags.writeable = False
+        return view
+
+    def __len__(self):
+        return self.count
+
+    def bind_attributes(self, first_instance=0):
+        """Point the instanced attributes of the bound VAO at this buffer.
+
+        A non-zero ``first_instance`` offsets the pointers so a draw starts at
+        that instance (GL 3.3 has no base-instance draw call).
+        """
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        base = first_instance * self.stride
+        for i, name in enumerate(self.dtype.names):
+            field_dtype, offset = self.dtype.fields[name][:2]
+            location = self.location + i
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(
+                location,
+                field_dtype.shape[0],
+                GL_FLOAT,
+                GL_FALSE,
+                self.stride,
+                ctypes.c_void_p(base + offset),
+            )
+            glVertexAttribDivisor(location, 1)  # This makes it instanced
+
+    def set_instances(self, array):
+        """Replace every instance; costs one sub-upload unless capacity grows."""
+        rows = self._rows(array)
+        self.count = 0
+        self._reserve_gpu(len(rows))
+        self._data = rows
+        self._owned = False
+        self.count = len(rows)
+        self._upload(0, rows)
+
+    def update_range(self, start, array):
+        """Overwrite instances ``start .. start + len(array)`` in place."""
+        rows = self._rows(array)
+        end = start + len(rows)
+        if start < 0 or end > self.count:
+            raise IndexError(f"Instance range {start}:{end} outside 0:{self.count}")
+        self._make_owned(self.count)
+        self._data[start:end] = rows
+        self._upload(start, rows)
+
+    def append(self, array):
+        """Add instances at the end, growing capacity geometrically."""
+        rows = self._rows(array)
+        start = self.count
+        self._make_owned(start + len(rows))
+        self._reserve_gpu(start + len(rows))
+        self._data[start : start + len(rows)] = rows
+        self.count += len(rows)
+        self._upload(start, rows)
+
+    def reserve(self, count):
+        """Grow capacity to at least ``count`` instances ahead of appends."""
+        self._make_owned(count)
+        self._reserve_gpu(count)
+
+    def remove(self, index):
+        """Swap-remove one instance; the last instance takes its slot."""
+        if not 0 <= index < self.count:
+            raise IndexError(f"Instance {index} outside 0:{self.count}")
+        last = self.count - 1
+        self._make_owned(self.count)
+        if index != last:
+            self._data[index] = self._data[last]
+            self._upload(index, self._data[index : index + 1])
+        self.count = last
+
+    def release(self):
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            _track_handles("buffer", -1)
+            self.vbo = None
+
+    def _rows(self, array):
+        if isinstance(array, np.ndarray) and array.dtype == self.dtype:
+            return np.ascontiguousarray(array.reshape(-1))
+        return make_instances(array)
+
+    def _grown(self, required):
+        capacity = max(self.capacity, self.MIN_CAPACITY)
+        while capacity < required:
+            capacity *= self.GROWTH
+        return capacity
+
+    def _make_owned(self, required):
+        if self._owned and len(self._data) >= required:
+            return
+        data = np.empty(self._grown(required), dtype=self.dtype)
+        data[: self.count] = self._data[: self.count]
+        self._data = data
+        self._owned = True
+
+    def _reserve_gpu(self, required):
+        if required <= self.capacity:
+            return
+        capacity = self._grown(required)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, capacity * self.stride, None, GL_DYNAMIC_DRAW)
+        self.capacity = capacity
+        # Orphaned storage lost its contents; re-send rows the caller keeps
+        if self.count:
+            self._upload(0, self._data[: self.count])
+
+    def _upload(self, start, rows):
+        if len(rows) == 0:
+            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, start * self.stride, rows.nbytes, rows)
+        self.bytes_uploaded += rows.nbytes
+        default_profiler.count("buffer_bytes", rows.nbytes)
 
 
 class Object:
-    def __init__(self, object: str, texture: str, flip_texture=True, offsets: list = []):
-        self.vertices = []
-        self.indices = []
+    """A mesh and texture from the registry, drawn once or instanced.
+
+    With ``lod_distances`` the mesh's simplified levels (see
+    :func:`load_lod_meshes`) are loaded too. After :meth:`update_lods`
+    has assigned every instance a level from its camera distance, draws
+    copy the instances to draw into a second buffer grouped by level and
+    issue one instanced draw per level. ``lod_counts`` holds the
+    instances per level and ``triangles_submitted`` the triangles of the
+    last draw.
+    """
+
+    def __init__(
+        self,
+        object: str,
+        texture: str,
+        flip_texture=True,
+        offsets: list = [],
+        registry: AssetRegistry = None,
+        lod_distances=None,
+    ):
+        self.registry = registry if registry is not None else default_registry
+        self.mesh = None
+        self.texture = None
         self.face_shape = None
         self.vao = None
+        self.instance_vao = None
+        self.instances = None
         self.flip = flip_texture
         self.index_count = 0
         self.texture_id = None
-        self.instanced_offsets = offsets  # Default offset for instancing
+        self.texture_layer = -1
+        self._initial_offsets = offsets  # Default offset for instancing
+
+        self.lod_distances = tuple(lod_distances or ())
+        self.lods = []
+        self.lod_levels = None
+        self.lod_counts = []
+        self.triangles_submitted = 0
+        self._lod_offsets = None
+        self._lod_buffer = None
+        self._lod_vaos = []
+        self._lod_key = None
 
         if object:
             self.load_obj(object)
@@ -23,219 +927,272 @@ class Object:
             self.texture_id = self.load_texture(texture)
 
     def load_texture(self, filename):
-        texture = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture)
-
-        self.texture_id = texture
-
-        # Set texture parameters
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-
-        # Load image data
-        image = pygame.image.load(filename)
-        if self.flip:
-            image = pygame.transform.flip(
-                image, False, True
-            )  # Flip vertically, not horizontally
-        image_data = pygame.image.tostring(image, "RGBA", True)
-        width, height = image.get_size()
-
-        # Upload texture data
-        glTexImage2D(
-            GL_TEXTURE_2D,
-            0,
-            GL_RGBA,
-            width,
-            height,
-            0,
-            GL_RGBA,
-            GL_UNSIGNED_BYTE,
-            image_data,
-        )
-        glGenerateMipmap(GL_TEXTURE_2D)
-
-        return texture
+        self.texture = self.registry.acquire_texture(filename, self.flip)
+        self.texture_id = self.texture.texture_id
+        self.texture_layer = self.texture.layer
+        return self.texture_id
 
     def load_obj(self, filename):
-        _positions = []
-        _texcoords = []
-        _normals = []
-        unique_verts = {}
-        self.vertices = []
-        self.indices = []
-
-        with open(filename, "r") as file:
-            for line in file:
-                if line.startswith("v "):
-                    parts = line.strip().split()
-                    _positions.append(tuple(map(float, parts[1:4])))
-                elif line.startswith("vt "):
-                    parts = line.strip().split()
-                    _texcoords.append(tuple(map(float, parts[1:3])))
-                elif line.startswith("vn "):
-                    parts = line.strip().split()
-                    _normals.append(tuple(map(float, parts[1:4])))
-                elif line.startswith("f "):
-                    parts = line.strip().split()[1:]
-
-                    if len(parts) == 3:
-                        # Triangle - process normally
-                        self.face_shape = GL_TRIANGLES
-                        face_indices = []
-                        for part in parts:
-                            vals = part.split("/")
-                            v_idx = int(vals[0]) - 1
-                            vt_idx = (
-                                int(vals[1]) - 1 if len(vals) > 1 and vals[1] else 0
-                            )
-                            vn_idx = (
-                                int(vals[2]) - 1 if len(vals) > 2 and vals[2] else 0
-                            )
-
-                            key = (v_idx, vt_idx)
-                            if key not in unique_verts:
-                                unique_verts[key] = len(self.vertices) // 8
-                                pos = _positions[v_idx]
-                                tex = (
-                                    _texcoords[vt_idx]
-                                    if vt_idx < len(_texcoords)
-                                    else (0.0, 0.0)
-                                )
-                                normal = _normals[vn_idx]  # Placeholder for normals
-                                self.vertices.extend(pos + tex + normal)
-                            face_indices.append(unique_verts[key])
-
-                        # Store triangle indices
-                        self.indices.extend(face_indices)
-
-                    elif len(parts) == 4:
-                        # Quad - convert to two triangles
-                        self.face_shape = GL_QUADS
-                        quad_indices = []
-                        for part in parts:
-                            vals = part.split("/")
-                            v_idx = int(vals[0]) - 1
-                            vt_idx = (
-                                int(vals[1]) - 1 if len(vals) > 1 and vals[1] else 0
-                            )
-                            vn_idx = (
-                                int(vals[2]) - 1 if len(vals) > 2 and vals[2] else 0
-                            )
-
-                            key = (v_idx, vt_idx)
-                            if key not in unique_verts:
-                                unique_verts[key] = len(self.vertices) // 8
-                                pos = _positions[v_idx]
-                                tex = (
-                                    _texcoords[vt_idx]
-                                    if vt_idx < len(_texcoords)
-                                    else (0.0, 0.0)
-                                )
-                                normal = _normals[vn_idx]  # Placeholder for normals
-                                self.vertices.extend(pos + tex + normal)
-                            quad_indices.append(unique_verts[key])
-
-                        # Convert quad to two triangles (0,1,2) and (0,2,3)
-                        self.indices.extend(
-                            [quad_indices[0], quad_indices[1], quad_indices[2]]
-                        )
-                        self.indices.extend(
-                            [quad_indices[0], quad_indices[2], quad_indices[3]]
-                        )
-
-                    else:
-                        raise ValueError("Unsupported face format")
-
-        # print("Vertices:", self.vertices)
-        # print("Indices:", self.indices)
+        self.mesh = self.registry.acquire_mesh(filename)
+        self.face_shape = self.mesh.face_shape
+        self.index_count = self.mesh.index_count
+        if self.lod_distances:
+            fractions = LOD_CELL_FRACTIONS[: len(self.lod_distances)]
+            self.lods = self.registry.acquire_lods(filename, fractions)
         self._create_buffers()
 
     def _create_buffers(self):
-        vertices = np.array(self.vertices, dtype=np.float32)
-        indices = np.array(self.indices, dtype=np.uint32)
+        if len(self.instanced_offsets) == 0:
+            # Non-instanced objects draw straight from the shared mesh VAO
+            self.vao = self.mesh.vao
+            return
 
-        self.index_count = len(indices)
+        self._create_instance_buffer()
+        self.instances.set_instances(self._initial_offsets)
 
-        vao = glGenVertexArrays(1)
-        vbo = glGenBuffers(1)
-        ebo = glGenBuffers(1)
+    def _create_instance_buffer(self):
+        self.instances = InstanceBuffer()
+        self.vao = self.instance_vao = _instanced_vao(self.mesh, self.instances)
 
-        glBindVertexArray(vao)
+    @property
+    def instanced_offsets(self):
+        if self.instances is None:
+            return self._initial_offsets
+        return self.instances.data["offset"]
 
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+    def set_instances(self, array):
+        """Replace the instance offsets, switching to instanced drawing if needed."""
+        if self.instances is None:
+            self._create_instance_buffer()
+        self.instances.set_instances(array)
 
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+    def update_range(self, start, array):
+        self.instances.update_range(start, array)
 
-        stride = 8 * ctypes.sizeof(ctypes.c_float)
+    def append(self, array):
+        if self.instances is None:
+            self._create_instance_buffer()
+        self.instances.append(array)
 
-        # Position attribute
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+    def reserve(self, count):
+        if self.instances is None:
+            self._create_instance_buffer()
+        self.instances.reserve(count)
 
-        # Texture attribute
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(
-            1,
-            2,
-            GL_FLOAT,
-            GL_FALSE,
-            stride,
-            ctypes.c_void_p(3 * ctypes.sizeof(ctypes.c_float)),
-        )
+    def remove(self, index):
+        self.instances.remove(index)
+
+    def update_lods(self, camera_position, hysteresis=LOD_HYSTERESIS):
+        """Assign each instance a level of detail by its distance to ``camera_position``.
 
-        # Normals attribute
-        glEnableVertexAttribArray(2)
-        glVertexAttribPointer(
-            2,
-            3,
-            GL_FLOAT,
-            GL_FALSE,
-            stride,
-            ctypes.c_void_p(5 * ctypes.sizeof(ctypes.c_float)),
+        Instances keep their level while within the hysteresis band of a
+        switch distance, also when the instances were re-uploaded in a
+        different order. ``None`` draws everything at full detail again.
+        """
+        if not self.lods or self.instances is None or camera_position is None:
+            self.lod_levels = self._lod_offsets = None
+            return
+        offsets = self.instances.data["offset"]
+        distances = np.linalg.norm(offsets - np.asarray(camera_position), axis=1)
+        self.lod_levels = select_lods(
+            distances, self._previous_lods(offsets), self.lod_distances, hysteresis
         )
+        self._lod_offsets = offsets.copy()
+
+    def _previous_lods(self, offsets):
+        old = self._lod_offsets
+        if old is None or len(old) == 0:
+            return np.full(len(offsets), -1)
+        if len(old) == len(offsets) and np.array_equal(old, offsets):
+            return self.lod_levels
+        # Rows were replaced; instances are matched up by their offset
+        row = np.dtype((np.void, offsets.dtype.itemsize * 3))
+        old_keys = np.ascontiguousarray(old).view(row).reshape(-1)
+        keys = np.ascontiguousarray(offsets).view(row).reshape(-1)
+        order = np.argsort(old_keys)
+        found = np.searchsorted(old_keys[order], keys).clip(0, len(old) - 1)
+        match = old_keys[order][found] == keys
+        return np.where(match, self.lod_levels[order][found], -1)
 
-        offsets = np.array(
-            self.instanced_offsets,
-            dtype=np.float32,
-        ).flatten()
-        instance_vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, instance_vbo)
-        glBufferData(GL_ARRAY_BUFFER, offsets.nbytes, offsets, GL_STATIC_DRAW)
+    def _draw_lods(self, ranges):
+        rows = [np.arange(first, first + count) for first, count in ranges]
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        levels = self.lod_levels[rows]
+        order = np.argsort(levels, kind="stable")
+        rows = rows[order]
 
-        # Set up instanced offset attribute
-        glEnableVertexAttribArray(3)
-        glVertexAttribPointer(3, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
-        glVertexAttribDivisor(3, 1)  # This makes it instanced
+        # Regroup only when the drawn instances, their levels or their data change
+        key = (self.instances.bytes_uploaded, rows.tobytes(), levels[order].tobytes())
+        if key != self._lod_key:
+            if self._lod_buffer is None:
+                self._lod_buffer = InstanceBuffer()
+                self._lod_vaos = [
+                    _instanced_vao(mesh, self._lod_buffer) for mesh in (self.mesh, *self.lods)
+                ]
+            self._lod_buffer.set_instances(self.instances.data[rows])
+            self.lod_counts = np.bincount(levels, minlength=len(self._lod_vaos)).tolist()
+            self._lod_key = key
 
+        _bind_material(self.texture_id, self.texture_layer)
+        self.triangles_submitted = 0
+        first = 0
+        for vao, mesh, count in zip(self._lod_vaos, (self.mesh, *self.lods), self.lod_counts):
+            if count:
+                glBindVertexArray(vao)
+                self._lod_buffer.bind_attributes(first)
+                glDrawElementsInstanced(
+                    GL_TRIANGLES, mesh.index_count, GL_UNSIGNED_INT, None, count
+                )
+                default_profiler.count_draw(mesh.index_count, count)
+                self.triangles_submitted += mesh.index_count // 3 * count
+                first += count
         glBindVertexArray(0)
 
-        self.vao = vao
+    @property
+    def _lods_assigned(self):
+        return self.lod_levels is not None and len(self.lod_levels) == self.instances.count
+
+    def release(self):
+        """Delete GL objects owned by this Object and drop its shared handles.
+
+        Safe to call more than once; the Object must not be drawn afterwards.
+        """
+        if self.instance_vao is not None:
+            glDeleteVertexArrays(1, [self.instance_vao])
+            _track_handles("vertex_array", -1)
+            self.instances.release()
+            self.instance_vao = None
+            self.instances = None
+        if self._lod_buffer is not None:
+            glDeleteVertexArrays(len(self._lod_vaos), self._lod_vaos)
+            _track_handles("vertex_array", -len(self._lod_vaos))
+            self._lod_buffer.release()
+            self._lod_buffer = None
+            self._lod_vaos = []
+            self._lod_key = None
+        for lod in self.lods:
+            self.registry.release(lod)
+        self.lods = []
+        self.lod_levels = self._lod_offsets = None
+
+        if self.mesh is not None:
+            self.registry.release(self.mesh)
+            self.mesh = None
+        if self.texture is not None:
+            self.registry.release(self.texture)
+            self.texture = None
+
+        self.vao = None
+        self.texture_id = None
+        self.texture_layer = -1
+        self.index_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def draw_ranges(self, ranges):
+        """Draw ``(first, count)`` sub-ranges of the instance buffer.
+
+        Non-instanced objects ignore ``ranges`` and draw normally.
+        """
+        if self.instances is None:
+            self.draw()
+            return
+        if self._lods_assigned:
+            self._draw_lods(ranges)
+            return
+        if not ranges:
+            return
+        _bind_material(self.texture_id, self.texture_layer)
+        glBindVertexArray(self.vao)
+        self.triangles_submitted = 0
+        for first, count in ranges:
+            self.instances.bind_attributes(first)
+            glDrawElementsInstanced(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None, count)
+            default_profiler.count_draw(self.index_count, count)
+            self.triangles_submitted += self.index_count // 3 * count
+        self.instances.bind_attributes(0)
+        glBindVertexArray(0)
 
     def draw(self, texture_id=None):
-        if self.texture_id is not None:
-            glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        if texture_id is None and self.instances is not None and self._lods_assigned:
+            self._draw_lods([(0, self.instances.count)])
+            return
         if texture_id is not None:
-            glBindTexture(GL_TEXTURE_2D, texture_id)
+            _bind_material(texture_id)
+        else:
+            _bind_material(self.texture_id, self.texture_layer)
         glBindVertexArray(self.vao)
 
-        if len(self.instanced_offsets) > 0 :
+        if self.instances is not None:
             # Draw instances
             glDrawElementsInstanced(
                 GL_TRIANGLES,
                 self.index_count,
                 GL_UNSIGNED_INT,
                 None,
-                len(self.instanced_offsets),  # Number of instances
+                self.instances.count,  # Number of instances
             )
+            default_profiler.count_draw(self.index_count, self.instances.count)
+            self.triangles_submitted = self.index_count // 3 * self.instances.count
         else:
             # Regular draw
+            _set_default_instance_attributes()
             glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None)
+            default_profiler.count_draw(self.index_count)
+            self.triangles_submitted = self.index_count // 3
 
         glBindVertexArray(0)
         if texture_id is not None:
             glBindTexture(GL_TEXTURE_2D, 0)
+
+
+class BakedMesh:
+    """Static geometry baked into one VBO/EBO and drawn as textured index ranges.
+
+    ``parts`` maps a name to ``(first_index, index_count)`` and ``textures``
+    maps the same names to texture paths acquired from the registry.
+    """
+
+    def __init__(self, vertices, indices, parts, textures, flip_texture=True, registry=None):
+        self.registry = registry if registry is not None else default_registry
+        self.vao, self.vbo, self.ebo = upload_mesh(vertices, indices)
+        self.parts = dict(parts)
+        self.textures = {
+            name: self.registry.acquire_texture(path, flip_texture)
+            for name, path in textures.items()
+        }
+        self.triangle_count = len(indices) // 3
+
+    def draw(self, names=None):
+        glBindVertexArray(self.vao)
+        _set_default_instance_attributes()
+        for name, (first, count) in self.parts.items():
+            if count == 0 or (names is not None and name not in names):
+                continue
+            texture = self.textures.get(name)
+            if texture is not None:
+                _bind_material(texture.texture_id, texture.layer)
+            glDrawElements(
+                GL_TRIANGLES,
+                count,
+                GL_UNSIGNED_INT,
+                ctypes.c_void_p(first * ctypes.sizeof(ctypes.c_uint32)),
+            )
+            default_profiler.count_draw(count)
+        glBindVertexArray(0)
+
+    def release(self):
+        if self.vao is None:
+            return
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteBuffers(2, [self.vbo, self.ebo])
+        _track_handles("vertex_array", -1)
+        _track_handles("buffer", -2)
+        self.vao = self.vbo = self.ebo = None
+        for texture in self.textures.values():
+            self.registry.release(texture)
+        self.textures.clear()
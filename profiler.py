@@ -0,0 +1,443 @@
+import csv
+import ctypes
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+from OpenGL.GL import *
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as _query_result_u64
+
+from shaders import ShaderProgram
+
+# Per-frame counters every frame record starts with
+FRAME_COUNTERS = ("draw_calls", "triangles", "uniform_uploads", "buffer_bytes", "texture_binds")
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start", "record")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.record = self.profiler._open_scope(self.name)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        self.profiler._close_scope(self.record, self.start, end)
+        return False
+
+
+class Profiler:
+    """Named CPU/GPU scopes and per-frame counters kept in a ring buffer.
+
+    Wrap each part of the frame in ``with profiler.scope(name):`` between
+    :meth:`begin_frame` and :meth:`end_frame`. CPU time comes from
+    ``perf_counter_ns``; outermost scopes also get their GPU time from a
+    ``GL_TIME_ELAPSED`` query (those queries cannot nest). Queries are
+    double-buffered: a frame's results are read at the end of the next
+    frame, and a result that is still not ready is dropped rather than
+    waited for. :meth:`count` adds to counters such as ``draw_calls``.
+
+    The last ``capacity`` frames are kept and can be written with
+    :meth:`dump_json`, :meth:`dump_csv` or :meth:`dump_chrome_trace`
+    (chrome://tracing, Perfetto). While disabled, :meth:`scope` returns a shared no-op
+    context and :meth:`count` returns straight away.
+    """
+
+    def __init__(self, enabled=False, capacity=600, gpu=True):
+        self.enabled = enabled
+        self.gpu = gpu
+        self.frames = deque(maxlen=capacity)
+        self.frame_index = 0
+        self._frame = None
+        self._depth = 0
+        self._queries = ([], [])
+        self._used = 0
+        self._pending = []
+
+    def scope(self, name):
+        if not self.enabled or self._frame is None:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def count(self, name, value=1):
+        if not self.enabled or self._frame is None:
+            return
+        counters = self._frame["counters"]
+        counters[name] = counters.get(name, 0) + value
+
+    def count_draw(self, index_count, instances=1):
+        """Count one draw call of ``index_count`` indices times ``instances``."""
+        if not self.enabled or self._frame is None:
+            return
+        counters = self._frame["counters"]
+        counters["draw_calls"] += 1
+        counters["triangles"] += index_count // 3 * instances
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame = {
+            "frame": self.frame_index,
+            "start_us": time.perf_counter_ns() / 1000,
+            "cpu_ms": 0.0,
+            "scopes": [],
+            "counters": dict.fromkeys(FRAME_COUNTERS, 0),
+        }
+        self._frame_start = time.perf_counter_ns()
+        self._depth = 0
+        self._used = 0
+
+    def end_frame(self):
+        frame = self._frame
+        if frame is None:
+            return
+        frame["cpu_ms"] = (time.perf_counter_ns() - self._frame_start) / 1e6
+        self.frames.append(frame)
+        self._frame = None
+        self.frame_index += 1
+
+        # Read last frame's queries, freeing their set for the next frame;
+        # this frame's are read after the next one
+        self._resolve(self._pending)
+        self._pending = [
+            (record, record.pop("query")) for record in frame["scopes"] if "query" in record
+        ]
+
+    def set_enabled(self, enabled):
+        if not enabled:
+            self._frame = None
+        self.enabled = enabled
+
+    def reset(self, capacity=None):
+        """Forget recorded frames, optionally keeping ``capacity`` from now on."""
+        self.frames = deque(maxlen=capacity or self.frames.maxlen)
+
+    def summary(self, frames=60):
+        """Mean CPU/GPU ms per scope and mean counters over the last ``frames``."""
+        recent = list(self.frames)[-frames:]
+        scopes = {}
+        counters = {}
+        for frame in recent:
+            for record in frame["scopes"]:
+                cpu, gpu, n = scopes.get(record["name"], (0.0, 0.0, 0))
+                gpu_us = record.get("gpu_us")
+                scopes[record["name"]] = (
+                    cpu + record["cpu_us"] / 1000,
+                    gpu + (gpu_us / 1000 if gpu_us is not None else 0.0),
+                    n + 1,
+                )
+            for name, value in frame["counters"].items():
+                counters[name] = counters.get(name, 0) + value
+        count = max(len(recent), 1)
+        return {
+            "frames": len(recent),
+            "cpu_ms": sum(f["cpu_ms"] for f in recent) / count,
+            "scopes": {
+                name: {"cpu_ms": cpu / count, "gpu_ms": gpu / count}
+                for name, (cpu, gpu, _) in scopes.items()
+            },
+            "counters": {name: value / count for name, value in counters.items()},
+        }
+
+    def dump_json(self, path):
+        with open(path, "w") as file:
+            json.dump({"frames": list(self.frames)}, file)
+
+    def dump_csv(self, path):
+        """One row per frame: CPU/GPU ms of every scope name, then the counters."""
+        names = list(dict.fromkeys(r["name"] for f in self.frames for r in f["scopes"]))
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(
+                ["frame", "cpu_ms"]
+                + [f"{name} {kind}" for name in names for kind in ("cpu_ms", "gpu_ms")]
+                + list(FRAME_COUNTERS)
+            )
+            for frame in self.frames:
+                times = {}
+                for record in frame["scopes"]:
+                    cpu, gpu = times.get(record["name"], (0.0, None))
+                    gpu_us = record.get("gpu_us")
+                    if gpu_us is not None:
+                        gpu = (gpu or 0.0) + gpu_us / 1000
+                    times[record["name"]] = (cpu + record["cpu_us"] / 1000, gpu)
+                row = [frame["frame"], round(frame["cpu_ms"], 4)]
+                for name in names:
+                    cpu, gpu = times.get(name, (None, None))
+                    row += [
+                        "" if cpu is None else round(cpu, 4),
+                        "" if gpu is None else round(gpu, 4),
+                    ]
+                writer.writerow(row + [frame["counters"][name] for name in FRAME_COUNTERS])
+
+    def dump_chrome_trace(self, path):
+        """Write the ring buffer in the Chrome trace event format."""
+        events = []
+        for frame in self.frames:
+            start = frame["start_us"]
+            events.append(
+                {
+                    "name": "frame",
+                    "ph": "X",
+                    "ts": start,
+                    "dur": frame["cpu_ms"] * 1000,
+                    "pid": 1,
+                    "tid": 1,
+                }
+            )
+            for record in frame["scopes"]:
+                events.append(
+                    {
+                        "name": record["name"],
+                        "ph": "X",
+                        "ts": start + record["start_us"],
+                        "dur": record["cpu_us"],
+                        "pid": 1,
+                        "tid": 1,
+                    }
+                )
+                if record.get("gpu_us") is not None:
+                    # GPU work is only known as a duration; lay it out on its
+                    # own track at the scope's CPU start
+                    events.append(
+                        {
+                            "name": record["name"],
+                            "ph": "X",
+                            "ts": start + record["start_us"],
+                            "dur": record["gpu_us"],
+                            "pid": 1,
+                            "tid": 2,
+                        }
+                    )
+            events.append(
+                {"name": "counters", "ph": "C", "ts": start, "pid": 1, "args": frame["counters"]}
+            )
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "traceEvents": events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"tids": {"1": "CPU", "2": "GPU"}},
+                },
+                file,
+            )
+
+    def release(self):
+        for queries in self._queries:
+            if queries:
+                glDeleteQueries(len(queries), queries)
+            queries.clear()
+        self._pending = []
+
+    def _open_scope(self, name):
+        record = {
+            "name": name,
+            "depth": self._depth,
+            "start_us": 0.0,
+            "cpu_us": 0.0,
+            "gpu_us": None,
+        }
+        if self.gpu and self._depth == 0:
+            queries = self._queries[self.frame_index % 2]
+            if self._used == len(queries):
+                queries.append(int(glGenQueries(1)[0]))
+            record["query"] = queries[self._used]
+            glBeginQuery(GL_TIME_ELAPSED, record["query"])
+            self._used += 1
+        self._depth += 1
+        self._frame["scopes"].append(record)
+        return record
+
+    def _close_scope(self, record, start, end):
+        self._depth -= 1
+        if "query" in record:
+            glEndQuery(GL_TIME_ELAPSED)
+        record["start_us"] = (start - self._frame_start) / 1000
+        record["cpu_us"] = (end - start) / 1000
+
+    def _resolve(self, pending):
+        result = ctypes.c_uint64()
+        for record, query in pending:
+            if glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                # The wrapped glGetQueryObjectui64v has no uint64 output type
+                _query_result_u64(query, GL_QUERY_RESULT, ctypes.byref(result))
+                record["gpu_us"] = result.value / 1000
+
+
+# Shared profiler the renderer reports draw calls and uploads to
+default_profiler = Profiler()
+
+
+OVERLAY_VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec2 position;
+layout(location = 1) in vec2 texCoord;
+out vec2 TexCoord;
+void main() {
+    gl_Position = vec4(position, 0.0, 1.0);
+    TexCoord = texCoord;
+}
+"""
+
+OVERLAY_FRAGMENT_SHADER = """
+#version 330
+in vec2 TexCoord;
+out vec4 FragColor;
+uniform sampler2D overlay;
+void main() {
+    FragColor = texture(overlay, TexCoord);
+}
+"""
+
+
+class ProfilerOverlay:
+    """Draws :meth:`Profiler.summary` as text in the top-left corner.
+
+    The text is rendered with ``pygame.font`` into a texture that is
+    refreshed every ``refresh`` seconds, then drawn as one blended quad.
+    """
+
+    def __init__(self, profiler, screen_size=(800, 600), refresh=0.25, font_size=18):
+        self.profiler = profiler
+        self.screen_size = screen_size
+        self.refresh = refresh
+        self.font = pygame.font.Font(None, font_size)
+        self._last_refresh = -refresh
+        self._size = (0, 0)
+
+        self.shader = ShaderProgram(OVERLAY_VERTEX_SHADER, OVERLAY_FRAGMENT_SHADER)
+
+        self.texture_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        self.vao = glGenVertexArrays(1)
+        self.vbo = glGenBuffers(1)
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, 16 * 4, None, GL_DYNAMIC_DRAW)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 16, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 16, ctypes.c_void_p(8))
+        glBindVertexArray(0)
+
+    def lines(self):
+        summary = self.profiler.summary()
+        lines = [f"frame {summary['cpu_ms']:.2f} ms cpu ({summary['frames']} frames)"]
+        for name, times in summary["scopes"].items():
+            lines.append(f"{name:<14} cpu {times['cpu_ms']:6.2f}  gpu {times['gpu_ms']:6.2f} ms")
+        for name, value in summary["counters"].items():
+            lines.append(f"{name:<14} {value:,.0f}")
+        return lines
+
+    def draw(self):
+        now = time.perf_counter()
+        if now - self._last_refresh >= self.refresh:
+            self._last_refresh = now
+            self._render_text()
+        if self._size == (0, 0):
+            return
+
+        self.shader.use()
+        glDisable(GL_DEPTH_TEST)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+        glBindVertexArray(0)
+        glDisable(GL_BLEND)
+        glEnable(GL_DEPTH_TEST)
+
+    def release(self):
+        if self.shader.program is None:
+            return
+        self.shader.release()
+        glDeleteTextures([self.texture_id])
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteBuffers(1, [self.vbo])
+
+    def _render_text(self):
+        rendered = [self.font.render(line, True, (255, 255, 255)) for line in self.lines()]
+        width = max(line.get_width() for line in rendered) + 8
+        height = sum(line.get_height() for line in rendered) + 8
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        y = 4
+        for line in rendered:
+            surface.blit(line, (4, y))
+            y += line.get_height()
+
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexImage2D(
+            GL_TEXTURE_2D,
+            0,
+            GL_RGBA,
+            width,
+            height,
+            0,
+            GL_RGBA,
+            GL_UNSIGNED_BYTE,
+            pygame.image.tostring(surface, "RGBA", True),
+        )
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        if (width, height) != self._size:
+            self._size = (width, height)
+            screen_w, screen_h = self.screen_size
+            right = -1.0 + 2.0 * width / screen_w
+            bottom = 1.0 - 2.0 * height / screen_h
+            quad = np.array(
+                [-1, 1, 0, 1, -1, bottom, 0, 0, right, 1, 1, 1, right, bottom, 1, 0],
+                dtype=np.float32,
+            )
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferSubData(GL_ARRAY_BUFFER, 0, quad.nbytes, quad)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+if __name__ == "__main__":
+    calls = 1_000_000
+    for enabled in (False, True):
+        profiler = Profiler(enabled=enabled, gpu=False, capacity=10)
+        start = time.perf_counter_ns()
+        for i in range(calls // 1000):
+            profiler.begin_frame()
+            for _ in range(1000):
+                with profiler.scope("draw"):
+                    pass
+                profiler.count_draw(36)
+            profiler.end_frame()
+        elapsed = time.perf_counter_ns() - start
+        state = "enabled" if enabled else "disabled"
+        print(f"{state}: {elapsed / calls:.0f} ns per scope + count")
+
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        pass
+    print(f"empty loop: {(time.perf_counter_ns() - start) / calls:.0f} ns")
@@ -0,0 +1,530 @@
+import time
+
+import numpy as np
+from OpenGL.GL import *
+from pyglm import glm
+
+from bullet import Bullet, create_bullet_object
+from clustered import ClusterGrid
+from collision import CollisionGrid
+from game import Entity, GameContext, RenderBatcher
+from generator.dungeon_mesher import DungeonMesher
+from level_loader import LevelLoader
+from lighting import Light, LightManager
+from lightmap import Lightmap, load_irradiance
+from objloader import (
+    LOD_DISTANCES,
+    TEXTURE_ARRAY_UNIT,
+    BakedMesh,
+    Object,
+    default_registry,
+)
+from profiler import default_profiler
+from shaders import FRAGMENT_SHADER, VERTEX_SHADER, ShaderVariants
+from streaming import StreamingWorld
+from textures import RGBA8
+from uniforms import CameraUniforms
+
+# Packed into one array texture, so drawing the dungeon never rebinds textures
+TILE_TEXTURES = (
+    "./assets/ground.png",
+    "./assets/roof_flat.png",
+    "./assets/wall.png",
+    "./assets/chest.png",
+    "./assets/bench.png",
+)
+
+DUNGEON_TEXTURES = {
+    "floor": "./assets/ground.png",
+    "roof": "./assets/roof_flat.png",
+    "wall": "./assets/wall.png",
+}
+# The tile textures are 256x1 palettes, so each baked surface samples the
+# palette texel its tile mesh mostly uses instead of tiling
+DUNGEON_UV_STYLES = {
+    "floor": ((0.00195313, 0.5), (0.0, 0.0)),
+    "roof": ((0.0488281, 0.5), (0.0, 0.0)),
+    "wall": ((0.126953, 0.5), (0.0, 0.0)),
+}
+
+
+def bake_dungeon(grid):
+    """Greedy-mesh the static dungeon into a single vertex buffer."""
+    mesh = DungeonMesher(grid, uv_styles=DUNGEON_UV_STYLES).build()
+    print(f"Baked dungeon: {mesh.triangles_before} -> {mesh.triangles_after} triangles")
+    return BakedMesh(mesh.vertices, mesh.indices, mesh.parts, DUNGEON_TEXTURES)
+
+
+def create_level_objects():
+    """One Object per level layer; instances are uploaded by the LevelLoader."""
+    return {
+        "roof": Object("./assets/roof_flat.obj", "./assets/roof_flat.png"),
+        "wall": Object("./assets/wall.obj", "./assets/wall.png"),
+        "ground": Object("./assets/ground.obj", "./assets/ground.png"),
+        "chest": Object("./assets/chest.obj", "./assets/chest.png", lod_distances=LOD_DISTANCES),
+    }
+
+
+def upload_visible_instances(objects, instances, cells, mask):
+    """Upload each object's instances in visible cells, or all of them when ``mask`` is None."""
+    for name, obj in objects.items():
+        if mask is None:
+            obj.set_instances(instances[name])
+        else:
+            obj.set_instances(instances[name][mask.reshape(-1)[cells[name]]])
+
+
+def same_mask(a, b):
+    if a is None or b is None:
+        return a is b
+    return np.array_equal(a, b)
+
+
+TORCH_COLOR = (1.0, 0.6, 0.25)
+
+# Chests are filed in the game's spatial hash as spheres this big
+CHEST_RADIUS = 0.6
+
+
+def add_torches(light_manager, prepared):
+    """One torch per room region and per chest of a level."""
+    rooms = prepared.visibility.room_centers()
+    chests = np.asarray(prepared.level.instances["chest"])[:, [0, 2]]
+    for x, z in np.concatenate((rooms, chests)).tolist():
+        light_manager.add_light(
+            Light(
+                position=(x, 1.8, z),
+                color=TORCH_COLOR,
+                intensity=1.5,
+                radius=8.0,
+                static=True,
+            )
+        )
+
+
+def bake_lightmap(light_manager, level):
+    """Lightmap of the level's static lights, baked or loaded from .lightcache."""
+    start = time.perf_counter()
+    irradiance = load_irradiance(level.seed, level.grid, light_manager.static_lights)
+    print(f"Lightmap ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return Lightmap(irradiance)
+
+
+class Scene:
+    """The dungeon, its lights and entities, and the camera looking at them.
+
+    Needs a current GL context. Each frame, move the camera
+    (:meth:`move_camera` collides with walls, assigning ``camera_pos``
+    teleports; ``yaw``, ``pitch``), then call :meth:`update` and :meth:`render`;
+    presenting the frame is left to the caller. The ``use_*`` and
+    ``display_roof`` flags switch rendering paths between frames.
+    ``texture_format`` may store the tile textures as S3TC blocks
+    (``textures.BC1``/``BC3``), an eighth or a quarter of the RGBA8 memory.
+    """
+
+    def __init__(
+        self, seed=None, size=(800, 600), profiler=default_profiler, texture_format=RGBA8
+    ):
+        self.profiler = profiler
+        width, height = size
+
+        # Programs are linked (or loaded from .shadercache) per variant on first use
+        self.shaders = ShaderVariants(VERTEX_SHADER, FRAGMENT_SHADER)
+        self.shader = self.shaders.get(BAKED_LIGHTING=1)
+
+        # Tile textures are layers of one array bound for the whole session
+        default_registry.set_texture_array(TILE_TEXTURES, fmt=texture_format)
+
+        # Enable depth testing
+        glEnable(GL_DEPTH_TEST)
+
+        self.game = GameContext(self.shader)
+        self.render_batcher = RenderBatcher(self.game)
+
+        self.bench = Entity(
+            self.game,
+            "bench",
+            Object("./assets/bench.obj", "./assets/bench.png", lod_distances=LOD_DISTANCES),
+            collides=True,
+        )
+
+        # View, projection and eye position live in the shared Camera block
+        self.camera_uniforms = CameraUniforms()
+
+        # Initialize lighting system
+        light_manager = LightManager(self.shader, clusters=ClusterGrid(width, height))
+        self.light_manager = light_manager
+        self._use_shader(self.shader)
+
+        # Calculate center and corners of the grid (60x50 grid with 1.6 spacing)
+        grid_center_x = (60 * 1.6) / 2
+        grid_center_z = (50 * 1.6) / 2
+
+        # Calculate corner positions
+        corner_height = 15.0
+        self.corner_intensity = 0
+        corner_color = (1.0, 1.0, 1.0)
+
+        # Add corner lights
+        self.corner_light_indices = []
+        corner_positions = [
+            (0, corner_height, 0),  # Front left
+            (60 * 1.6, corner_height, 0),  # Front right
+            (0, corner_height, 50 * 1.6),  # Back left
+            (60 * 1.6, corner_height, 50 * 1.6),  # Back right
+        ]
+
+        for pos in corner_positions:
+            self.corner_light_indices.append(len(light_manager.lights))
+            light_manager.add_light(
+                Light(
+                    position=pos,
+                    color=corner_color,
+                    intensity=self.corner_intensity,
+                    static=True,
+                )
+            )
+
+        # Add bright ambient light that illuminates the entire scene
+        self.ambient_light_index = len(light_manager.lights)
+        light_manager.add_light(
+            Light(
+                position=(grid_center_x, 30.0, grid_center_z),
+                color=(1.0, 1.0, 1.0),
+                intensity=self.corner_intensity,
+                static=True,
+            )
+        )
+
+        # Dynamic light that will follow the camera (like a flashlight)
+        self.flashlight_index = len(light_manager.lights)
+        light_manager.add_light(
+            Light(position=(0.0, 0.0, 0.0), color=(1.0, 1.0, 0.8), intensity=3.0)
+        )
+
+        # Create transformation matrices
+        # Also bounds the view cone of portal visibility
+        self.fov_y = 45.0
+        self.aspect = width / height
+        self.projection = glm.perspective(glm.radians(self.fov_y), self.aspect, 0.1, 500.0)
+        self.camera_uniforms.set_projection(self.projection)
+
+        # Camera orientation; update() derives the vectors and view matrix
+        self.camera_front = glm.vec3(0.0, 0.0, -1.0)  # Direction camera is looking
+        self.camera_up = glm.vec3(0.0, 1.0, 0.0)
+        self.camera_right = glm.normalize(glm.cross(self.camera_front, self.camera_up))
+        self.yaw = -90.0  # Initial yaw (facing -Z direction)
+        self.pitch = 0.0
+        self.view = glm.mat4(1.0)
+
+        self.rotation = 0.0
+
+        # Levels are generated on a worker thread; the GL thread only uploads
+        self.level_loader = LevelLoader(create_level_objects)
+
+        # Generate dungeon (or memory-map it from the level cache)
+        self.current = self.level_loader.load_now(80, 60, seed=seed)
+
+        spawn = glm.vec3(self.current.level.spawn[0] * 1.6, 0.0, self.current.level.spawn[1] * 1.6)
+        self.bench.position = spawn
+        self.camera_pos = glm.vec3(spawn.x, 0.6, spawn.z)
+
+        # The camera and projectiles stop at the level's walls
+        self.use_collision = True
+        self.game.collision = CollisionGrid(self.grid)
+        # Projectiles also stop at chests
+        self.chest_ids = self._file_chests()
+
+        # Torches follow the level; every light before them is fixed
+        self.torch_start = len(light_manager.lights)
+        self.use_torches = True
+        add_torches(light_manager, self.current)
+
+        # Static lights are baked per level; rebaked when one of them changes
+        self.use_lightmap = True
+        self.lightmap = None
+        self.baked_version = None
+
+        # Portal visibility only draws the cells reachable from the camera's room
+        self.use_portals = True
+        # Endless chunk-streamed dungeon, replacing the level while enabled
+        self.streaming_world = None
+        self.streaming_report_timer = 0.0
+        # None means the full (chunk-sorted) instance arrays are uploaded
+        self.uploaded_mask = None
+
+        self.bullet_obj = create_bullet_object()
+
+        # Distant chests and benches are drawn with simplified meshes
+        self.use_lod = True
+
+        self.display_roof = True
+        self.baked_dungeon = None
+        self.use_baked_dungeon = False
+
+    @property
+    def grid(self):
+        return self.current.level.grid
+
+    @property
+    def lod_camera(self):
+        """Where levels of detail are measured from, or None when LOD is off."""
+        return tuple(self.camera_pos) if self.use_lod else None
+
+    def move_camera(self, delta):
+        """Move the camera by ``delta``, sliding along walls unless collision is off."""
+        collision = self.game.collision
+        if self.use_collision and collision is not None:
+            position = collision.slide([tuple(self.camera_pos)], [tuple(delta)])[0]
+            self.camera_pos = glm.vec3(*position)
+        else:
+            self.camera_pos += delta
+
+    def fire(self, speed=10.0, max_distance=20.0):
+        """Shoot a projectile from the camera along its view direction."""
+        return Bullet(self.game, self.camera_pos, self.camera_front, speed, max_distance)
+
+    def set_torches(self, enabled):
+        """Add or remove the room and chest torches."""
+        self.use_torches = enabled
+        self.light_manager.truncate(self.torch_start)
+        if enabled:
+            add_torches(self.light_manager, self.current)
+
+    def set_baked_dungeon(self, enabled):
+        """Draw the greedy-meshed dungeon instead of the instanced tiles."""
+        self.use_baked_dungeon = enabled
+        if enabled and self.baked_dungeon is None:
+            self.baked_dungeon = bake_dungeon(self.grid)
+
+    def set_streaming(self, enabled):
+        """Replace the level with the endless streaming dungeon, or go back."""
+        if enabled and self.streaming_world is None:
+            self.streaming_world = StreamingWorld(self.current.level.seed, create_level_objects)
+            spawn_x, spawn_z = self.streaming_world.spawn_position()
+            self.camera_pos = glm.vec3(spawn_x, 0.6, spawn_z)
+            # The endless world has no single grid to collide with
+            self.game.collision = None
+        elif not enabled and self.streaming_world is not None:
+            print(f"Streaming world OFF {self.streaming_world.stats()}")
+            self.streaming_world.release()
+            self.streaming_world = None
+            self.game.collision = CollisionGrid(self.grid)
+
+    def update(self, dt):
+        """Swap in finished levels, aim the camera, cull, and step the game."""
+        with self.profiler.scope("update"):
+            self._swap_level()
+
+            # Limit pitch to avoid camera flipping
+            self.pitch = min(max(self.pitch, -89.0), 89.0)
+
+            # Calculate new front vector
+            yaw, pitch = glm.radians(self.yaw), glm.radians(self.pitch)
+            direction = glm.vec3(
+                glm.cos(yaw) * glm.cos(pitch), glm.sin(pitch), glm.sin(yaw) * glm.cos(pitch)
+            )
+            self.camera_front = glm.normalize(direction)
+
+            # Update right and up vectors
+            self.camera_right = glm.normalize(
+                glm.cross(self.camera_front, glm.vec3(0.0, 1.0, 0.0))
+            )
+            self.camera_up = glm.normalize(glm.cross(self.camera_right, self.camera_front))
+
+            # Update view matrix
+            camera_pos = self.camera_pos
+            self.view = glm.lookAt(camera_pos, camera_pos + self.camera_front, self.camera_up)
+            view_projection = np.array(self.projection * self.view)
+
+            if self.streaming_world is not None:
+                # Load and evict chunks around the camera, then cull them
+                failures = self.streaming_world.update(camera_pos.x, camera_pos.z)
+                for key, error in failures:
+                    print(f"Streaming chunk {key} failed: {error!r}")
+                self.streaming_world.cull(view_projection)
+                self.streaming_report_timer += dt
+                if self.streaming_report_timer >= 5.0:
+                    self.streaming_report_timer = 0.0
+                    print(f"Streaming world: {self.streaming_world.stats()}")
+            else:
+                # Skip chunks outside the view frustum
+                self.current.chunks.cull(view_projection)
+
+                # Re-upload the level instances only when the visible cells change
+                visible_mask = None
+                if self.use_portals:
+                    visible_mask = self.current.visibility.visible_cell_mask(
+                        (camera_pos.x, camera_pos.y, camera_pos.z),
+                        self.yaw,
+                        self.pitch,
+                        fov_y=self.fov_y,
+                        aspect=self.aspect,
+                    )
+                if not same_mask(visible_mask, self.uploaded_mask):
+                    upload_visible_instances(
+                        self.current.objects,
+                        self.current.instances,
+                        self.current.cells,
+                        visible_mask,
+                    )
+                    self.uploaded_mask = visible_mask
+
+            lod_camera = self.lod_camera
+            objects = (
+                self.streaming_world.objects
+                if self.streaming_world is not None
+                else self.current.objects
+            )
+            for obj in objects.values():
+                obj.update_lods(lod_camera)
+
+            self.game.update(dt)
+
+    def render(self):
+        """Upload this frame's uniforms and lights and draw everything."""
+        profiler = self.profiler
+        light_manager = self.light_manager
+
+        # Clear the screen
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glClearColor(0.2, 0.3, 0.3, 1.0)
+
+        # Without a lightmap the variant that skips sampling it is used
+        shader = self.shaders.get(BAKED_LIGHTING=int(self.use_lightmap))
+        if shader is not self.shader:
+            self._use_shader(shader)
+        shader.use()
+
+        with profiler.scope("light upload"):
+            # Update flashlight position to follow camera
+            light_manager.update_light_position(self.flashlight_index, self.camera_pos)
+
+            # Update rotation for the model
+            model = glm.rotate(glm.mat4(1.0), self.rotation, glm.vec3(0, 1, 0))
+            # Set uniforms
+            glUniformMatrix4fv(self.game.model_loc, 1, GL_FALSE, glm.value_ptr(model))
+            profiler.count("uniform_uploads")
+
+            # Camera and light blocks only upload the bytes that changed
+            self.camera_uniforms.set_view(self.view, self.camera_pos)
+            self.camera_uniforms.upload()
+            if self.use_lightmap and self.baked_version != light_manager.static_version:
+                if self.lightmap is not None:
+                    self.lightmap.release()
+                self.lightmap = bake_lightmap(light_manager, self.current.level)
+                light_manager.set_lightmap(self.lightmap)
+                self.baked_version = light_manager.static_version
+            elif not self.use_lightmap and self.lightmap is not None:
+                light_manager.set_lightmap(None)
+                self.lightmap.release()
+                self.lightmap = None
+                self.baked_version = None
+            light_manager.upload_to_shader(np.array(self.view))
+
+        with profiler.scope("draw entities"):
+            # One instanced draw per mesh/texture group instead of one per entity
+            self.render_batcher.draw([*self.game.entities, self.bench], self.lod_camera)
+
+        with profiler.scope("draw dungeon"):
+            self._draw_dungeon()
+
+        with profiler.scope("draw bullets"):
+            self.bullet_obj.set_instances(self.game.projectiles.active_positions)
+            self.bullet_obj.draw()
+
+    def release(self):
+        for obj in (*self.current.objects.values(), self.bullet_obj):
+            obj.release()
+        self.level_loader.release()
+        if self.streaming_world is not None:
+            self.streaming_world.release()
+        for entity in self.game.entities:
+            entity.obj.release()
+        self.render_batcher.release()
+        if self.baked_dungeon is not None:
+            self.baked_dungeon.release()
+        self.bench.obj.release()
+        self.camera_uniforms.release()
+        self.light_manager.release()
+        if self.lightmap is not None:
+            self.lightmap.release()
+        default_registry.clear()
+        self.shaders.release()
+
+    def _use_shader(self, shader):
+        # Uniform block bindings and sampler units are per-program state
+        self.shader = shader
+        self.camera_uniforms.bind(shader.program)
+        self.light_manager.bind_program(shader)
+        glUniform1i(shader.location("tileTextures"), TEXTURE_ARRAY_UNIT)
+        self.game.set_program(shader)
+
+    def _swap_level(self):
+        # Swap in a finished level; its uploads were spread over earlier frames
+        ready = self.level_loader.update()
+        if ready is None:
+            return
+        self.level_loader.recycle(self.current.objects)
+        self.current = ready
+        self.uploaded_mask = None
+        if self.streaming_world is None:
+            self.game.collision = CollisionGrid(self.grid)
+        self.game.spatial.remove(self.chest_ids)
+        self.chest_ids = self._file_chests()
+        self.set_torches(self.use_torches)
+        self.bench.position = glm.vec3(ready.level.spawn[0] * 1.6, 0.0, ready.level.spawn[1] * 1.6)
+
+        if self.baked_dungeon is not None:
+            self.baked_dungeon.release()
+            self.baked_dungeon = None
+        if self.use_baked_dungeon:
+            self.baked_dungeon = bake_dungeon(self.grid)
+
+        stats = self.level_loader.stats
+        print(
+            f"Generated new dungeon! (seed {ready.level.seed}) "
+            f"worker {stats['generation_ms']:.1f} ms, "
+            f"upload {stats['upload_ms']:.1f} ms over {stats['upload_frames']} frames, "
+            f"latency {stats['latency_ms']:.1f} ms, "
+            f"worst frame {stats['worst_frame_ms']:.1f} ms"
+        )
+
+    def _file_chests(self):
+        chests = np.asarray(self.current.level.instances["chest"])
+        return self.game.spatial.insert(chests[:, :3], CHEST_RADIUS)
+
+    def _draw_dungeon(self):
+        objects = self.current.objects
+        roof_obj, wall_obj, ground_obj, chest_obj = (
+            objects[name] for name in ("roof", "wall", "ground", "chest")
+        )
+        chunks = self.current.chunks
+        if self.streaming_world is not None:
+            self.streaming_world.draw(
+                ("roof", "wall", "ground", "chest")
+                if self.display_roof
+                else ("wall", "ground", "chest")
+            )
+        elif self.use_baked_dungeon:
+            self.baked_dungeon.draw(
+                ("floor", "roof", "wall") if self.display_roof else ("floor", "wall")
+            )
+            if self.uploaded_mask is not None:
+                chest_obj.draw()
+            else:
+                chest_obj.draw_ranges(chunks.visible_ranges("chest"))
+        elif self.uploaded_mask is not None:
+            # Only the visible cells' instances are uploaded
+            if self.display_roof:
+                roof_obj.draw()
+            ground_obj.draw()
+            wall_obj.draw()
+            chest_obj.draw()
+        else:
+            if self.display_roof:
+                roof_obj.draw_ranges(chunks.visible_ranges("roof"))
+
+            ground_obj.draw_ranges(chunks.visible_ranges("ground"))
+            wall_obj.draw_ranges(chunks.visible_ranges("wall"))
+            chest_obj.draw_ranges(chunks.visible_ranges("chest"))
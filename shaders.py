@@ -1,53 +1,126 @@
+import ctypes
+import hashlib
+import json
+import os
+import struct
+from dataclasses import dataclass
+
+from OpenGL.error import GLError
 from OpenGL.GL import *
 
-VERTEX_SHADER = """
+SHADER_CACHE_DIR = "./.shadercache"
+SHADER_CACHE_SUFFIX = ".program"
+SHADER_CACHE_VERSION = 1
+
+# magic, version, binary format
+_SHADER_CACHE_HEADER = struct.Struct("<4sII")
+_SHADER_CACHE_MAGIC = b"P3DS"
+
+# std140 blocks filled from uniforms.CAMERA_DTYPE and lighting.LIGHTS_DTYPE
+CAMERA_BLOCK = """
+layout(std140) uniform Camera {
+    mat4 view;
+    mat4 projection;
+    vec4 viewPos; // xyz
+};
+"""
+
+# Clustered lights, see lighting.LightManager and clustered.ClusterGrid
+LIGHTS_BLOCK = """
+layout(std140) uniform Lights {
+    ivec4 clusterGrid;  // tiles x, tiles y, depth slices
+    vec4 clusterScale;  // tile width and height in pixels, log-depth scale and bias
+    vec4 lightmapTransform; // world x/z to lightmap uv: scale u, scale v, offset u, offset v
+    vec4 lightmapParams;    // strength (0 when static lights are not baked), normal offset
+};
+uniform sampler2D bakedLight; // per-cell irradiance of static lights
+uniform samplerBuffer lightData;      // per light: xyz position + radius, rgb color + intensity
+uniform usamplerBuffer clusterLights; // per cluster: offset and count into lightIndices
+uniform usamplerBuffer lightIndices;
+
+int clusterIndex(vec3 worldPos) {
+    ivec2 tile = min(ivec2(gl_FragCoord.xy / clusterScale.xy), clusterGrid.xy - 1);
+    float depth = max(-(view * vec4(worldPos, 1.0)).z, 1e-6);
+    int slice = int(floor(log(depth) * clusterScale.z - clusterScale.w));
+    slice = clamp(slice, 0, clusterGrid.z - 1);
+    return (slice * clusterGrid.y + tile.y) * clusterGrid.x + tile.x;
+}
+"""
+
+VERTEX_SHADER = (
+    """
 #version 330
 layout(location = 0) in vec3 position;
 layout(location = 1) in vec2 texCoord;
 layout(location = 2) in vec3 normal;
+// Per-instance transform (see objloader.INSTANCE_DTYPE)
 layout(location = 3) in vec3 aOffset;
+layout(location = 4) in vec4 aRotation; // quaternion (x, y, z, w)
+layout(location = 5) in vec3 aScale;
+layout(location = 6) in vec4 aTint;
+// Array texture layer, or -1 for ourTexture (see objloader.TEXTURE_LAYER_LOCATION)
+layout(location = 7) in float aLayer;
 
 out vec2 TexCoord;
 out vec3 Normal;
 out vec3 FragPos;
+out vec4 Tint;
+flat out int Layer;
 
 uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
-// uniform vec3 pos;
+"""
+    + CAMERA_BLOCK
+    + """
+
+vec3 rotateByQuat(vec4 q, vec3 v) {
+    return v + 2.0 * cross(q.xyz, cross(q.xyz, v) + q.w * v);
+}
 
 void main() {
-    vec3 loc = aOffset + position;
+    vec3 loc = aOffset + rotateByQuat(aRotation, position * aScale);
     FragPos = vec3(model * vec4(loc, 1.0));
-    Normal = mat3(transpose(inverse(model))) * normal;
-    
+    // model is rotation + translation only, so mat3(model) is its normal matrix;
+    // dividing by the instance scale gives the inverse-transpose of R * S
+    Normal = mat3(model) * rotateByQuat(aRotation, normal / aScale);
+
     gl_Position = projection * view * model * vec4(loc, 1.0);
     TexCoord = texCoord;
+    Tint = aTint;
+    Layer = int(aLayer);
 }
 """
+)
 
-FRAGMENT_SHADER = """
+FRAGMENT_SHADER = (
+    """
 #version 330
 
+// Variants (see ShaderVariants); 0 skips the lightmap fetch when nothing is baked
+#ifndef BAKED_LIGHTING
+#define BAKED_LIGHTING 1
+#endif
+
 in vec2 TexCoord;
 in vec3 Normal;
 in vec3 FragPos;
+in vec4 Tint;
+flat in int Layer;
 out vec4 FragColor;
 
 uniform sampler2D ourTexture;
-uniform vec3 viewPos;
-
-// Multiple lights support
-#define MAX_LIGHTS 8
-uniform int numLights;
-uniform vec3 lightPositions[MAX_LIGHTS];
-uniform vec3 lightColors[MAX_LIGHTS];
-uniform float lightIntensities[MAX_LIGHTS];
+uniform sampler2DArray tileTextures;
+"""
+    + CAMERA_BLOCK
+    + LIGHTS_BLOCK
+    + """
 
-vec3 calculateLight(vec3 lightPos, vec3 lightColor, float intensity, vec3 norm, vec3 viewDir) {
+vec3 calculateLight(vec3 lightPos, float radius, vec3 lightColor, float intensity, vec3 norm, vec3 viewDir) {
     // Calculate distance for attenuation
     float distance = length(lightPos - FragPos);
     float attenuation = intensity / (1.0 + 0.09 * distance + 0.032 * distance * distance);
+    // Fade to zero at the light's range so clusters can drop it beyond that
+    float window = clamp(1.0 - pow(distance / radius, 4.0), 0.0, 1.0);
+    attenuation *= window * window;
     
     // Diffuse 
     vec3 lightDir = normalize(lightPos - FragPos);
@@ -69,19 +142,31 @@ void main() {
     vec3 ambient = ambientStrength * vec3(1.0, 1.0, 1.0);
     
     vec3 norm = normalize(Normal);
-    vec3 viewDir = normalize(viewPos - FragPos);
+    vec3 viewDir = normalize(viewPos.xyz - FragPos);
     
-    // Calculate lighting from all light sources
+    // Calculate lighting from the lights listed for this fragment's cluster
     vec3 result = ambient;
-    for(int i = 0; i < numLights && i < MAX_LIGHTS; i++) {
-        result += calculateLight(lightPositions[i], lightColors[i], lightIntensities[i], norm, viewDir);
+#if BAKED_LIGHTING
+    vec3 bakedPos = FragPos + norm * lightmapParams.y;
+    vec2 bakedUV = bakedPos.xz * lightmapTransform.xy + lightmapTransform.zw;
+    result += lightmapParams.x * texture(bakedLight, bakedUV).rgb;
+#endif
+    uvec2 range = texelFetch(clusterLights, clusterIndex(FragPos)).xy;
+    for(uint i = 0u; i < range.y; i++) {
+        int light = int(texelFetch(lightIndices, int(range.x + i)).r);
+        vec4 position = texelFetch(lightData, 2 * light);
+        vec4 color = texelFetch(lightData, 2 * light + 1);
+        result += calculateLight(position.xyz, position.w, color.rgb, color.w, norm, viewDir);
     }
     
     // Apply to texture
-    vec4 texColor = texture(ourTexture, TexCoord);
-    FragColor = vec4(result * texColor.rgb, texColor.a);
+    vec4 texColor = Layer < 0
+        ? texture(ourTexture, TexCoord)
+        : texture(tileTextures, vec3(TexCoord, Layer));
+    FragColor = vec4(result * texColor.rgb, texColor.a) * Tint;
 }
 """
+)
 
 
 def compile_shader(source, shader_type):
@@ -98,9 +183,10 @@ def compile_shader(source, shader_type):
     return shader
 
 
-def create_shader_program():
-    vertex_shader = compile_shader(VERTEX_SHADER, GL_VERTEX_SHADER)
-    fragment_shader = compile_shader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER)
+def link_program(vertex_source, fragment_source, retrievable=False):
+    """Compile and link a program; returns its id, or None after printing the log."""
+    vertex_shader = compile_shader(vertex_source, GL_VERTEX_SHADER)
+    fragment_shader = compile_shader(fragment_source, GL_FRAGMENT_SHADER)
 
     if not vertex_shader or not fragment_shader:
         return None
@@ -108,6 +194,8 @@ def create_shader_program():
     program = glCreateProgram()
     glAttachShader(program, vertex_shader)
     glAttachShader(program, fragment_shader)
+    if retrievable:
+        glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
     glLinkProgram(program)
 
     # Check linking status
@@ -122,3 +210,198 @@ def create_shader_program():
     glDeleteShader(fragment_shader)
 
     return program
+
+
+def with_defines(source, defines):
+    """Insert ``#define NAME value`` lines right after the ``#version`` line."""
+    if not defines:
+        return source
+    lines = "".join(f"#define {name} {int(value)}\n" for name, value in sorted(defines.items()))
+    head, version, rest = source.partition("#version")
+    version_line, newline, body = rest.partition("\n")
+    return head + version + version_line + newline + lines + body
+
+
+def shader_cache_path(vertex_source, fragment_source, cache_dir=SHADER_CACHE_DIR):
+    """Cache file of a linked program, keyed on its sources and the GL driver.
+
+    Program binaries only load on the driver that wrote them, so the
+    vendor, renderer and version strings are part of the key.
+    """
+    key = json.dumps(
+        {
+            "version": SHADER_CACHE_VERSION,
+            "vertex": hashlib.sha1(vertex_source.encode()).hexdigest(),
+            "fragment": hashlib.sha1(fragment_source.encode()).hexdigest(),
+            "driver": [
+                glGetString(name).decode() for name in (GL_VENDOR, GL_RENDERER, GL_VERSION)
+            ],
+        },
+        sort_keys=True,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+    return os.path.join(cache_dir, digest + SHADER_CACHE_SUFFIX)
+
+
+def _read_program_cache(path):
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) <= _SHADER_CACHE_HEADER.size:
+        return None
+    magic, version, binary_format = _SHADER_CACHE_HEADER.unpack_from(data)
+    if magic != _SHADER_CACHE_MAGIC or version != SHADER_CACHE_VERSION:
+        return None
+
+    binary = data[_SHADER_CACHE_HEADER.size :]
+    program = glCreateProgram()
+    # A driver update rejects the old binary, either with GL_INVALID_ENUM
+    # for an unknown format or by failing the link; the caller then links
+    # from source and writes a fresh entry
+    try:
+        glProgramBinary(program, binary_format, binary, len(binary))
+        linked = glGetProgramiv(program, GL_LINK_STATUS)
+    except GLError:
+        linked = False
+    if not linked:
+        glDeleteProgram(program)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return program
+
+
+def _write_program_cache(path, program):
+    if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) <= 0:
+        return
+    length = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+    if length <= 0:
+        return
+    binary = (ctypes.c_ubyte * length)()
+    binary_format = GLenum()
+    written = GLsizei()
+    glGetProgramBinary(program, length, written, binary_format, binary)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            file.write(
+                _SHADER_CACHE_HEADER.pack(
+                    _SHADER_CACHE_MAGIC, SHADER_CACHE_VERSION, binary_format.value
+                )
+            )
+            file.write(bytes(binary)[: written.value])
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only working directory just skips the cache
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+@dataclass
+class ShaderInput:
+    """An active uniform or vertex attribute of a linked program."""
+
+    location: int
+    size: int
+    type: int
+
+
+class ShaderProgram:
+    """A linked program whose active uniforms and attributes are reflected once.
+
+    ``uniforms`` and ``attributes`` map names (without a trailing ``[0]``)
+    to :class:`ShaderInput`; uniforms inside blocks are left out. Linked
+    binaries are kept in ``.shadercache/`` and loaded with
+    ``glProgramBinary`` on later runs, falling back to compiling when the
+    driver has none or rejects them (``from_cache`` tells which happened).
+    ``defines`` are inserted into both stages, see :func:`with_defines`.
+    Raises ``RuntimeError`` when the sources do not compile or link.
+    """
+
+    def __init__(
+        self,
+        vertex_source,
+        fragment_source,
+        defines=None,
+        use_cache=True,
+        cache_dir=SHADER_CACHE_DIR,
+    ):
+        self.defines = dict(defines or {})
+        vertex_source = with_defines(vertex_source, self.defines)
+        fragment_source = with_defines(fragment_source, self.defines)
+        use_cache = use_cache and glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+        self.program = None
+        self.from_cache = False
+        if use_cache:
+            path = shader_cache_path(vertex_source, fragment_source, cache_dir)
+            self.program = _read_program_cache(path)
+            self.from_cache = self.program is not None
+        if self.program is None:
+            self.program = link_program(vertex_source, fragment_source, use_cache)
+            if self.program is None:
+                raise RuntimeError("Failed to create shader program")
+            if use_cache:
+                _write_program_cache(path, self.program)
+
+        self.uniforms = {}
+        for index in range(glGetProgramiv(self.program, GL_ACTIVE_UNIFORMS)):
+            name, size, gl_type = glGetActiveUniform(self.program, index)
+            name = name.decode().removesuffix("[0]")
+            location = glGetUniformLocation(self.program, name)
+            if location != -1:
+                self.uniforms[name] = ShaderInput(location, int(size), int(gl_type))
+        self.attributes = {}
+        for index in range(glGetProgramiv(self.program, GL_ACTIVE_ATTRIBUTES)):
+            name, size, gl_type = glGetActiveAttrib(self.program, index)
+            name = name.decode().removesuffix("[0]")
+            location = glGetAttribLocation(self.program, name)
+            self.attributes[name] = ShaderInput(location, int(size), int(gl_type))
+
+    def location(self, name):
+        """Location of uniform ``name``; -1 (ignored by ``glUniform*``) if inactive."""
+        uniform = self.uniforms.get(name)
+        return -1 if uniform is None else uniform.location
+
+    def use(self):
+        glUseProgram(self.program)
+
+    def release(self):
+        if self.program is not None:
+            glDeleteProgram(self.program)
+            self.program = None
+
+
+class ShaderVariants:
+    """``#define`` variants of one program, each linked the first time it is asked for.
+
+    :meth:`get` memoizes on the define values, so switching between
+    variants after the first use costs a dictionary lookup.
+    """
+
+    def __init__(self, vertex_source, fragment_source, use_cache=True):
+        self.vertex_source = vertex_source
+        self.fragment_source = fragment_source
+        self.use_cache = use_cache
+        self.programs = {}
+
+    def get(self, **defines):
+        key = tuple(sorted(defines.items()))
+        program = self.programs.get(key)
+        if program is None:
+            program = self.programs[key] = ShaderProgram(
+                self.vertex_source, self.fragment_source, defines, self.use_cache
+            )
+        return program
+
+    def release(self):
+        for program in self.programs.values():
+            program.release()
+        self.programs.clear()
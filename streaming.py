@@ -0,0 +1,280 @@
+import hashlib
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from culling import aabbs_in_frustum, frustum_planes
+from generator.dungeon_generator import DungeonGenerator
+from generator.level_layout import build_level_instances
+from level_loader import LEVEL_LAYER_NAMES, wall_instances
+from objloader import INSTANCE_DTYPE, make_instances
+
+CHUNK_SIZE = 32
+
+
+def chunk_seed(seed, *key):
+    """Stable 64-bit seed for a world seed plus any key (chunk or edge)."""
+    text = ":".join(str(part) for part in (seed, *key))
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _door(seed, axis, cx, cz, size):
+    # Position along the shared edge, shared by both chunks that border it
+    return 2 + chunk_seed(seed, "door", axis, cx, cz) % (size - 4)
+
+
+def chunk_doors(seed, cx, cz, size=CHUNK_SIZE):
+    """Border cells (x, y) that connect chunk (cx, cz) to its four neighbours."""
+    return [
+        (0, _door(seed, "x", cx - 1, cz, size)),
+        (size - 1, _door(seed, "x", cx, cz, size)),
+        (_door(seed, "z", cx, cz - 1, size), 0),
+        (_door(seed, "z", cx, cz, size), size - 1),
+    ]
+
+
+def generate_chunk(seed, cx, cz, size=CHUNK_SIZE):
+    """Generate the (size, size) grid of chunk (cx, cz) of an endless dungeon.
+
+    Every chunk has one door per edge at a position derived from the world
+    seed and that edge, so corridors line up with the neighbouring chunk
+    without either chunk looking at the other.
+    """
+    generator = DungeonGenerator(
+        size,
+        size,
+        seed=chunk_seed(seed, cx, cz),
+        min_room_size=4,
+        max_room_size=10,
+        max_rooms=6,
+    )
+    generator.generate_dungeon(doors=chunk_doors(seed, cx, cz, size))
+    return generator
+
+
+def layer_capacities(size=CHUNK_SIZE, max_rooms=6):
+    """Most instances one chunk can need per layer."""
+    return {
+        "roof": size * size,
+        "wall": 2 * size * size,
+        "ground": size * size,
+        "chest": max_rooms,
+    }
+
+
+def prepare_chunk(seed, cx, cz, size=CHUNK_SIZE, spacing=1.6):
+    """World-space instance rows for one chunk; safe to run off the GL thread."""
+    generator = generate_chunk(seed, cx, cz, size)
+    offsets = build_level_instances(generator.grid, spacing)
+    origin = np.array([cx * size * spacing, 0.0, cz * size * spacing], dtype=np.float32)
+    for name in offsets:
+        offsets[name] = offsets[name] + origin
+    return {
+        "roof": make_instances(offsets["roof"]),
+        "wall": wall_instances(offsets["wall"], offsets["wall_vert"]),
+        "ground": make_instances(offsets["ground"]),
+        "chest": make_instances(offsets["chest"]),
+        "spawn": (
+            float(origin[0] + generator.spawn[0] * spacing),
+            float(origin[2] + generator.spawn[1] * spacing),
+        ),
+    }
+
+
+class StreamingWorld:
+    """Endless dungeon streamed in chunks around the camera.
+
+    Chunks within ``load_radius`` (in chunks, square) of the camera are
+    generated on a worker thread and uploaded within ``upload_budget_ms``
+    per frame; chunks further than ``keep_radius`` are evicted. Each layer
+    is one Object whose instance buffer is split into fixed slots, one per
+    resident chunk, so GPU memory is allocated once and stays flat no
+    matter how far the camera walks. :meth:`stats` reports resident chunks
+    and bytes.
+
+    A chunk whose generation raises is dropped and not requested again
+    until the camera has left it behind; :meth:`update` returns the
+    failures of that frame so the caller can report them.
+    """
+
+    def __init__(
+        self,
+        seed,
+        create_objects,
+        chunk_size=CHUNK_SIZE,
+        spacing=1.6,
+        load_radius=2,
+        keep_radius=3,
+        upload_budget_ms=2.0,
+        y_range=(-1.0, 2.8),
+        executor=None,
+    ):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.spacing = spacing
+        self.load_radius = load_radius
+        self.keep_radius = max(keep_radius, load_radius)
+        self.upload_budget_ms = upload_budget_ms
+        self.y_range = y_range
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunks")
+        self.executor = executor
+
+        self.slot_count = (2 * self.keep_radius + 1) ** 2
+        self.capacity = layer_capacities(chunk_size)
+        self.objects = create_objects()
+        for name in LEVEL_LAYER_NAMES:
+            self.objects[name].set_instances(
+                np.zeros(self.slot_count * self.capacity[name], dtype=INSTANCE_DTYPE)
+            )
+
+        self.resident = {}  # (cx, cz) -> slot
+        self.counts = {
+            name: np.zeros(self.slot_count, dtype=np.int64) for name in LEVEL_LAYER_NAMES
+        }
+        self.occupied = np.zeros(self.slot_count, dtype=bool)
+        self.mins = np.zeros((self.slot_count, 3))
+        self.maxs = np.zeros((self.slot_count, 3))
+        self.visible = np.zeros(self.slot_count, dtype=bool)
+        self._free = list(range(self.slot_count - 1, -1, -1))
+        self._pending = {}  # (cx, cz) -> future
+        self.failed = {}  # (cx, cz) -> exception raised while generating it
+        self.chunks_loaded = 0
+        self.chunks_evicted = 0
+
+    def chunk_of(self, x, z):
+        """Chunk (cx, cz) containing world position (x, z)."""
+        col = math.floor(x / self.spacing + 0.5)
+        row = math.floor(z / self.spacing + 0.5)
+        return col // self.chunk_size, row // self.chunk_size
+
+    def spawn_position(self, cx=0, cz=0):
+        """World (x, z) of chunk (cx, cz)'s spawn cell, generated synchronously."""
+        return prepare_chunk(self.seed, cx, cz, self.chunk_size, self.spacing)["spawn"]
+
+    def update(self, x, z):
+        """Evict, request and upload chunks around the camera at (x, z).
+
+        Returns ``[(key, exception), ...]`` for chunks that failed to generate.
+        """
+        cx, cz = self.chunk_of(x, z)
+
+        def distance(key):
+            return max(abs(key[0] - cx), abs(key[1] - cz))
+
+        for key in [k for k in self.resident if distance(k) > self.keep_radius]:
+            self._evict(key)
+        for key in [k for k in self._pending if distance(k) > self.keep_radius]:
+            # A running job finishes in the background and is dropped
+            self._pending.pop(key).cancel()
+        for key in [k for k in self.failed if distance(k) > self.keep_radius]:
+            # Out of range again: retried if the camera comes back
+            del self.failed[key]
+
+        wanted = [
+            (cx + dx, cz + dz)
+            for dz in range(-self.load_radius, self.load_radius + 1)
+            for dx in range(-self.load_radius, self.load_radius + 1)
+        ]
+        for key in sorted(wanted, key=distance):
+            if key not in self.resident and key not in self._pending and key not in self.failed:
+                self._pending[key] = self.executor.submit(
+                    prepare_chunk, self.seed, *key, self.chunk_size, self.spacing
+                )
+
+        failures = []
+        deadline = time.perf_counter() + self.upload_budget_ms / 1000
+        for key in sorted(self._pending, key=distance):
+            if time.perf_counter() >= deadline:
+                break
+            future = self._pending[key]
+            if not future.done():
+                continue
+            del self._pending[key]
+            error = future.exception()
+            if error is not None:
+                self.failed[key] = error
+                failures.append((key, error))
+                continue
+            self._upload(key, future.result())
+        return failures
+
+    def cull(self, view_projection):
+        """Mark resident chunks inside the view frustum."""
+        self.visible = self.occupied & aabbs_in_frustum(
+            frustum_planes(view_projection), self.mins, self.maxs
+        )
+        return self.visible
+
+    def ranges(self, name):
+        """``(first, count)`` instance ranges of visible chunks for a layer."""
+        capacity = self.capacity[name]
+        counts = self.counts[name]
+        ranges = []
+        for slot in np.flatnonzero(self.visible & (counts > 0)).tolist():
+            first, count = slot * capacity, int(counts[slot])
+            previous = ranges[-1] if ranges else None
+            if previous and previous[0] + previous[1] == first:
+                ranges[-1] = (previous[0], previous[1] + count)
+            else:
+                ranges.append((first, count))
+        return ranges
+
+    def draw(self, names=LEVEL_LAYER_NAMES):
+        for name in names:
+            self.objects[name].draw_ranges(self.ranges(name))
+
+    def stats(self):
+        stride = INSTANCE_DTYPE.itemsize
+        return {
+            "resident_chunks": len(self.resident),
+            "pending_chunks": len(self._pending),
+            "failed_chunks": len(self.failed),
+            "visible_chunks": int(self.visible.sum()),
+            "chunks_loaded": self.chunks_loaded,
+            "chunks_evicted": self.chunks_evicted,
+            "resident_bytes": sum(
+                obj.instances.capacity * stride for obj in self.objects.values()
+            ),
+            "used_bytes": sum(int(c.sum()) * stride for c in self.counts.values()),
+        }
+
+    def release(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self._pending.clear()
+        for obj in self.objects.values():
+            obj.release()
+
+    def _upload(self, key, rows):
+        slot = self._free.pop()
+        for name in LEVEL_LAYER_NAMES:
+            layer = rows[name]
+            self.objects[name].update_range(slot * self.capacity[name], layer)
+            self.counts[name][slot] = len(layer)
+
+        cx, cz = key
+        s = self.spacing
+        # Tile meshes overhang their cell slightly, hence the padding
+        half = s / 2 + 0.1
+        size = self.chunk_size
+        self.mins[slot] = (cx * size * s - half, self.y_range[0], cz * size * s - half)
+        self.maxs[slot] = (
+            ((cx + 1) * size - 1) * s + half,
+            self.y_range[1],
+            ((cz + 1) * size - 1) * s + half,
+        )
+        self.occupied[slot] = True
+        self.resident[key] = slot
+        self.chunks_loaded += 1
+
+    def _evict(self, key):
+        slot = self.resident.pop(key)
+        self.occupied[slot] = False
+        self.visible[slot] = False
+        for counts in self.counts.values():
+            counts[slot] = 0
+        self._free.append(slot)
+        self.chunks_evicted += 1
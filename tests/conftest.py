@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+# Headless runs draw into an EGL pbuffer, like bench.py; the platform has
+# to be chosen before anything imports OpenGL
+if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+
+
+@pytest.fixture(scope="session")
+def gl_context():
+    """Make an OpenGL 3.3 core context current, or skip tests that need one."""
+    if os.environ.get("PYOPENGL_PLATFORM") != "egl":
+        pytest.skip("GL tests need an EGL context (PYOPENGL_PLATFORM=egl)")
+    from bench import create_egl_context
+
+    try:
+        create_egl_context((64, 64))
+    except Exception as error:
+        pytest.skip(f"No OpenGL 3.3 context: {error}")
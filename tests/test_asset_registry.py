@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from objloader import AssetRegistry, TextureHandle
+
+NAMES = ["a.png", "b.png", "c.png", "d.png"]
+
+
+@pytest.fixture
+def registry():
+    """A registry serving NAMES as layers of a texture array, so nothing touches GL."""
+    registry = AssetRegistry(max_unused=2)
+    registry.texture_array = TextureHandle(("texture_array",), 1, 4, 4, 0, refcount=1)
+    registry._array_layers = {
+        ("texture", os.path.abspath(name), True): layer for layer, name in enumerate(NAMES)
+    }
+    return registry
+
+
+def test_acquire_shares_handles(registry):
+    first = registry.acquire_texture("a.png")
+    second = registry.acquire_texture("./a.png")
+    assert first is second
+    assert first.refcount == 2
+    assert (registry.hits, registry.misses) == (1, 1)
+
+
+def test_release_keeps_handle_until_evicted(registry):
+    handle = registry.acquire_texture("a.png")
+    registry.release(handle)
+    assert handle.refcount == 0
+    assert handle.key in registry
+
+    # Re-acquiring an idle handle is a hit, not a reload
+    assert registry.acquire_texture("a.png") is handle
+    assert registry.hits == 1
+    registry.release(handle)
+    registry.evict()
+    assert handle.key not in registry
+    assert registry.evictions == 1
+
+
+def test_lru_evicts_oldest_unused(registry):
+    handles = [registry.acquire_texture(name) for name in NAMES]
+    for handle in handles[:3]:
+        registry.release(handle)
+    # max_unused=2: releasing the third drops the first released
+    assert [handle.key in registry for handle in handles] == [False, True, True, True]
+
+    # A re-acquired handle leaves the LRU, so it is not evicted
+    registry.acquire_texture("b.png")
+    registry.release(handles[3])
+    registry.evict(keep=0)
+    assert [handle.key in registry for handle in handles] == [False, True, False, False]
+    assert len(registry) == 1
+
+
+def test_release_more_than_acquired_raises(registry):
+    handle = registry.acquire_texture("a.png")
+    registry.release(handle)
+    with pytest.raises(ValueError):
+        registry.release(handle)
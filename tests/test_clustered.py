@@ -0,0 +1,56 @@
+import numpy as np
+
+from clustered import LIGHT_CUTOFF, ClusterGrid, light_radii
+
+
+def lights_of(table, indices, cluster):
+    offset, count = table[cluster]
+    return set(indices[offset : offset + count].tolist())
+
+
+def test_light_radii_reach_the_cutoff():
+    intensities = np.array([1.0, 5.0, 0.001])
+    colors = np.array([(1.0, 0.6, 0.25), (0.2, 0.2, 1.0), (1.0, 1.0, 1.0)])
+    radii = light_radii(intensities, colors)
+    peak = 1.5 * intensities * colors.max(axis=1)
+    attenuated = peak / (1 + 0.09 * radii + 0.032 * radii**2)
+    np.testing.assert_allclose(attenuated[:2], LIGHT_CUTOFF)
+    # Too dim to ever reach the cutoff
+    assert radii[2] == 0.0
+
+
+def test_every_lit_fragment_finds_its_light():
+    grid = ClusterGrid(800, 600, tiles=(16, 12), slices=24)
+    rng = np.random.default_rng(0)
+    positions = np.column_stack(
+        (rng.uniform(-15, 15, 40), rng.uniform(-10, 10, 40), rng.uniform(-60, 5, 40))
+    )
+    radii = rng.uniform(0.5, 6.0, 40)
+    table, indices = grid.assign(np.eye(4), positions, radii)
+    assert table[:, 1].sum() == len(indices) == grid.lights_assigned
+
+    # Points inside each sphere, seen from a camera at the origin looking down -z
+    for light, (center, radius) in enumerate(zip(positions, radii)):
+        direction = rng.normal(size=(200, 3))
+        direction /= np.linalg.norm(direction, axis=1)[:, None]
+        points = center + direction * radius * rng.uniform(0, 1, (200, 1))
+        depth = -points[:, 2]
+        ndc_x = points[:, 0] / (depth * grid.tan_x)
+        ndc_y = points[:, 1] / (depth * grid.tan_y)
+        on_screen = (depth > grid.near) & (np.abs(ndc_x) < 1) & (np.abs(ndc_y) < 1)
+        frag_x = (ndc_x[on_screen] * 0.5 + 0.5) * grid.width
+        frag_y = (ndc_y[on_screen] * 0.5 + 0.5) * grid.height
+        for cluster in np.unique(grid.cluster_of(frag_x, frag_y, depth[on_screen])):
+            assert light in lights_of(table, indices, cluster)
+
+
+def test_lights_out_of_view_are_not_assigned():
+    grid = ClusterGrid()
+    positions = [(0.0, 0.0, 10.0), (200.0, 0.0, -5.0), (0.0, 0.0, -10.0)]
+    table, indices = grid.assign(np.eye(4), positions, [2.0, 2.0, 0.0])
+    assert len(indices) == 0
+    assert not table[:, 1].any()
+
+    table, indices = grid.assign(np.eye(4), [(0.0, 0.0, -10.0)], [1.0])
+    center = grid.cluster_of([400.0], [300.0], [10.0])[0]
+    assert lights_of(table, indices, center) == {0}
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from collision import CollisionGrid
+from generator.dungeon_generator import EMPTY, WALL
+
+SPACING = 1.6
+
+
+@pytest.fixture
+def collision():
+    """A 5x7 open grid with a single wall cell at row 2, column 4."""
+    grid = np.full((5, 7), EMPTY, dtype=np.uint8)
+    grid[2, 4] = WALL
+    return CollisionGrid(grid, SPACING, bottom=-1.0, top=2.5)
+
+
+def test_ray_hits_the_wall_face(collision):
+    # From the centre of cell (2, 1) towards +x: the wall's face is at x = 3.5 cells
+    origin = (1 * SPACING, 0.5, 2 * SPACING)
+    t, hit = collision.raycast([origin], [(5 * SPACING, 0.0, 0.0)])
+    assert hit[0]
+    assert t[0] == pytest.approx(2.5 / 5)
+
+
+def test_rays_that_miss(collision):
+    origins = np.array(
+        [
+            (1 * SPACING, 0.5, 2 * SPACING),  # stops short of the wall
+            (1 * SPACING, 0.5, 1 * SPACING),  # passes the row above
+            (1 * SPACING, 3.0, 2 * SPACING),  # flies over the wall
+        ]
+    )
+    deltas = np.array([(2, 0, 0), (5, 0, 0), (5, 0, 0)]) * SPACING
+    t, hit = collision.raycast(origins, deltas)
+    assert not hit.any()
+    np.testing.assert_array_equal(t, 1.0)
+
+
+def test_ray_dropping_onto_the_wall_top(collision):
+    # Descends through y = 2.5 above the wall cell, halfway along
+    origin = (3.2 * SPACING, 3.5, 2 * SPACING)
+    t, hit = collision.raycast([origin], [(1.6 * SPACING, -2.0, 0.0)])
+    assert hit[0]
+    assert t[0] == pytest.approx(0.5)
+
+
+def test_ray_starting_inside_a_wall_hits_at_zero(collision):
+    t, hit = collision.raycast([(4 * SPACING, 0.0, 2 * SPACING)], [(SPACING, 0.0, 0.0)])
+    assert hit[0] and t[0] == 0.0
+
+
+def test_raycast_matches_dense_sampling():
+    rng = np.random.default_rng(0)
+    grid = (rng.random((20, 20)) < 0.3).astype(np.uint8) * WALL
+    collision = CollisionGrid(grid, SPACING)
+    origins = rng.uniform((0, -2, 0), (19 * SPACING, 3, 19 * SPACING), (300, 3))
+    deltas = rng.normal(size=(300, 3)) * (6.0, 0.5, 6.0)
+    t, hit = collision.raycast(origins, deltas)
+
+    samples = np.linspace(0.0, 1.0, 4001)
+    points = origins[:, None] + samples[None, :, None] * deltas[:, None]
+    solid = collision.is_solid(points.reshape(-1, 3)).reshape(300, -1)
+    np.testing.assert_array_equal(hit, solid.any(axis=1))
+    first = samples[np.argmax(solid, axis=1)]
+    np.testing.assert_allclose(t[hit], first[hit], atol=2.5e-4)
+
+
+def test_slide_stops_flush_against_the_wall(collision):
+    start = (2.5 * SPACING, 0.6, 2 * SPACING)
+    moved = collision.slide([start], [(2 * SPACING, 0.0, 0.0)], radius=0.3)[0]
+    assert moved[0] == pytest.approx(3.5 * SPACING - 0.3, abs=1e-4)
+    assert moved[0] < 3.5 * SPACING - 0.3
+    assert moved[2] == pytest.approx(2 * SPACING)
+
+
+def test_slide_keeps_the_motion_along_the_wall(collision):
+    start = (2.5 * SPACING, 0.6, 2 * SPACING)
+    moved = collision.slide([start], [(SPACING, 0.0, 0.5)], radius=0.3)[0]
+    assert moved[0] == pytest.approx(3.5 * SPACING - 0.3, abs=1e-4)
+    assert moved[2] == pytest.approx(2 * SPACING + 0.5)
+
+
+def test_slide_over_the_walls_and_out_of_them(collision):
+    above = (2.5 * SPACING, 3.0, 2 * SPACING)
+    moved = collision.slide([above], [(2 * SPACING, 0.0, 0.0)], radius=0.3)[0]
+    assert moved[0] == pytest.approx(4.5 * SPACING)
+
+    # A box overlapping the wall can always back out of it
+    inside = (3.5 * SPACING, 0.6, 2 * SPACING)
+    moved = collision.slide([inside], [(-SPACING, 0.0, 0.0)], radius=0.3)[0]
+    assert moved[0] == pytest.approx(2.5 * SPACING)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from pyglm import glm
+
+from culling import ChunkGrid, aabbs_in_frustum, frustum_planes
+
+# With an identity view-projection the frustum is the clip-space cube
+CUBE = frustum_planes(np.eye(4))
+
+
+def test_planes_of_identity_are_the_unit_cube():
+    expected = [
+        (1, 0, 0, 1),
+        (-1, 0, 0, 1),
+        (0, 1, 0, 1),
+        (0, -1, 0, 1),
+        (0, 0, 1, 1),
+        (0, 0, -1, 1),
+    ]
+    np.testing.assert_allclose(CUBE, expected)
+
+
+@pytest.mark.parametrize("plane", range(6))
+def test_box_just_outside_each_plane_is_culled(plane):
+    axis, side = divmod(plane, 2)
+    sign = -1.0 if side == 0 else 1.0
+    center = np.zeros(3)
+    center[axis] = sign * 1.25
+    mins, maxs = (center - 0.2)[None], (center + 0.2)[None]
+    assert not aabbs_in_frustum(CUBE, mins, maxs)[0]
+
+    # Moved to touch the plane it straddles it, which counts as visible
+    center[axis] = sign * 1.15
+    assert aabbs_in_frustum(CUBE, (center - 0.2)[None], (center + 0.2)[None])[0]
+
+
+def test_perspective_camera():
+    projection = glm.perspective(glm.radians(45.0), 4 / 3, 0.1, 100.0)
+    view = glm.lookAt(glm.vec3(0, 0, 0), glm.vec3(0, 0, -1), glm.vec3(0, 1, 0))
+    planes = frustum_planes(np.array(projection * view))
+    centers = np.array(
+        [
+            (0, 0, -10),  # ahead
+            (0, 0, 10),  # behind
+            (30, 0, -10),  # far off to the right
+            (0, 0, -150),  # past the far plane
+            (4.5, 0, -10),  # straddling the right plane
+        ],
+        dtype=np.float64,
+    )
+    visible = aabbs_in_frustum(planes, centers - 0.5, centers + 0.5)
+    np.testing.assert_array_equal(visible, [True, False, False, False, True])
+
+
+def test_visible_ranges_merge_runs():
+    chunks = ChunkGrid((40, 40), spacing=1.0, chunk_size=16)
+    assert (chunks.chunk_rows, chunks.chunk_cols) == (3, 3)
+    # Two instances in chunks 0, 1 and 3, none in 2 and 4, one in 5
+    cells = [(0, 0), (0, 1), (0, 16), (0, 17), (16, 0), (16, 1), (16, 33)]
+    offsets = np.array([(col, 0.0, row) for row, col in cells], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    sorted_offsets = chunks.sort_instances("wall", offsets[rng.permutation(len(offsets))])
+    np.testing.assert_array_equal(chunks.chunk_of(sorted_offsets), [0, 0, 1, 1, 3, 3, 5])
+
+    chunks.visible[:] = False
+    chunks.visible[[0, 1, 5]] = True
+    assert chunks.visible_ranges("wall") == [(0, 4), (6, 1)]
+
+    # Empty chunks 2 and 4 do not break the run from 1 to 5
+    chunks.visible[[0, 1, 3, 5]] = True
+    assert chunks.visible_ranges("wall") == [(0, 7)]
+
+    chunks.visible[:] = False
+    assert chunks.visible_ranges("wall") == []
+
+
+def test_cull_marks_chunks_in_view():
+    chunks = ChunkGrid((48, 48), spacing=1.6, chunk_size=16)
+    projection = glm.perspective(glm.radians(45.0), 4 / 3, 0.1, 100.0)
+    # In the first chunk, looking along +x
+    eye = glm.vec3(4.0, 0.6, 4.0)
+    view = glm.lookAt(eye, eye + glm.vec3(1, 0, 0), glm.vec3(0, 1, 0))
+    visible = chunks.cull(np.array(projection * view))
+    assert visible[[0, 1, 2]].all()
+    assert not visible[[6, 7, 8]].any()
+    assert chunks.stats()["visible_chunks"] == int(visible.sum())
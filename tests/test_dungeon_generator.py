@@ -0,0 +1,131 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from generator.dungeon_generator import CHEST, EMPTY, SPAWN, WALL, DungeonGenerator
+
+# Snapshots of the original list-based generator, seeded with random.seed(seed)
+SEED_1_30X20 = """\
+##############################
+#       #########            #
+#       #       #            #
+#       #       #            #
+#       #       ########     #
+#       #   S          #     #
+#       #       ###### #######
+#########                   ##
+#           ####            ##
+#           #  #            ##
+#           #  #            ##
+#           #  #            ##
+#           ####            ##
+#     C               C     ##
+#           ####            ##
+#           #  #            ##
+#           #  #            ##
+#           #  #            ##
+#           #  #            ##
+##############################
+"""
+
+# seed, (width, height), spawn, SHA-1 of the cells, chests as (x, y)
+SNAPSHOTS = [
+    (
+        7,
+        (80, 60),
+        (56, 45),
+        "f6ae0ed99da285ec205c612318477688e1fb6668",
+        [(21, 17), (58, 30), (43, 39), (15, 40), (28, 49), (15, 51)],
+    ),
+    (
+        2024,
+        (64, 48),
+        (53, 41),
+        "102296e9017f5e40db531cd6e4956d314a5ed664",
+        [(57, 15), (50, 16), (8, 28), (51, 31)],
+    ),
+    (
+        99,
+        (120, 90),
+        (31, 82),
+        "55bcef47feceadadb354388872c3d19129c04323",
+        [(74, 5), (83, 5), (106, 12), (64, 26), (97, 54)],
+    ),
+]
+
+
+def generate(seed, width, height, **kwargs):
+    generator = DungeonGenerator(width, height, seed=seed)
+    generator.generate_dungeon(**kwargs)
+    return generator
+
+
+def chests(cells):
+    return [tuple(cell) for cell in np.argwhere(cells == CHEST)[:, ::-1].tolist()]
+
+
+def test_matches_the_list_based_generator():
+    generator = generate(1, 30, 20)
+    text = "".join("".join(" #SC"[cell] for cell in row) + "\n" for row in generator.cells)
+    assert text == SEED_1_30X20
+    assert generator.spawn == (12, 5)
+    assert generator.cells.dtype == np.uint8
+
+
+@pytest.mark.parametrize("seed, size, spawn, digest, chest_cells", SNAPSHOTS)
+def test_snapshots(seed, size, spawn, digest, chest_cells):
+    generator = generate(seed, *size)
+    assert generator.cells.shape == size[::-1]
+    assert generator.spawn == spawn
+    assert generator.cells[spawn[1], spawn[0]] == SPAWN
+    assert chests(generator.cells) == chest_cells
+    assert hashlib.sha1(generator.cells.tobytes()).hexdigest() == digest
+
+
+def test_grid_indexes_like_nested_lists():
+    generator = generate(7, 80, 60)
+    x, y = generator.spawn
+    assert generator.grid is generator.cells
+    assert generator.grid[y][x] == SPAWN
+
+
+def test_clean_grid_keeps_walls_next_to_empty_cells():
+    generator = DungeonGenerator(6, 5, seed=0)
+    generator.cells[:] = WALL
+    generator.cells[2, 2] = EMPTY
+    generator.clean_grid()
+    expected = np.array(
+        [
+            [1, 1, 1, 1, 1, 1],
+            [1, 1, 1, 1, 0, 1],
+            [1, 1, 0, 1, 0, 1],
+            [1, 1, 1, 1, 0, 1],
+            [1, 1, 1, 1, 1, 1],
+        ],
+        dtype=np.uint8,
+    )
+    # The border is always kept; inner walls with no empty neighbour go
+    np.testing.assert_array_equal(generator.cells, expected)
+
+
+def test_doors_open_the_border_without_changing_the_layout():
+    plain = generate(7, 80, 60)
+    doors = [(0, 20), (79, 41), (33, 0), (12, 59)]
+    doored = generate(7, 80, 60, doors=doors)
+
+    assert doored.rooms == plain.rooms
+    assert doored.spawn == plain.spawn
+    assert chests(doored.cells) == chests(plain.cells)
+    for x, y in doors:
+        assert doored.cells[y, x] == EMPTY
+
+    # Only the doors open on the border
+    border = np.ones(doored.cells.shape, dtype=bool)
+    border[1:-1, 1:-1] = False
+    opened = (doored.cells != WALL) & (plain.cells == WALL)
+    assert sorted(map(tuple, np.argwhere(opened & border)[:, ::-1].tolist())) == sorted(doors)
+    # Room interiors, chests included, are untouched
+    for x, y, w, h in plain.rooms:
+        inside = np.s_[y + 1 : y + h - 1, x + 1 : x + w - 1]
+        np.testing.assert_array_equal(doored.cells[inside], plain.cells[inside])
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from generator.dungeon_generator import EMPTY, WALL
+from generator.dungeon_mesher import DungeonMesher, greedy_rectangles
+
+SPACING = 1.6
+
+
+@pytest.fixture
+def grid():
+    """A 3x4 room with a 1x2 wall in the middle row."""
+    grid = np.full((3, 4), EMPTY, dtype=np.uint8)
+    grid[1, 1:3] = WALL
+    return grid
+
+
+def coverage(rects, shape):
+    counts = np.zeros(shape, dtype=np.int64)
+    for row, col, h, w in rects.tolist():
+        counts[row : row + h, col : col + w] += 1
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rectangles_cover_the_mask_exactly(seed):
+    mask = np.random.default_rng(seed).random((23, 31)) < 0.6
+    rects = greedy_rectangles(mask)
+    assert (rects[:, 2:] > 0).all()
+    # Every masked cell once, nothing else
+    np.testing.assert_array_equal(coverage(rects, mask.shape), mask.astype(np.int64))
+
+
+def test_rectangles_merge_equal_runs():
+    mask = np.array(
+        [
+            [1, 1, 0, 1],
+            [1, 1, 0, 1],
+            [1, 1, 1, 1],
+        ],
+        dtype=bool,
+    )
+    rects = sorted(map(tuple, greedy_rectangles(mask).tolist()))
+    assert rects == [(0, 0, 2, 2), (0, 3, 2, 1), (2, 0, 1, 4)]
+    assert greedy_rectangles(np.zeros((3, 3), dtype=bool)).shape == (0, 4)
+
+
+def test_triangle_counts(grid):
+    mesh = DungeonMesher(grid, SPACING).build()
+    # Per cell: floor, roof and roof top for 12 cells, 2 wall tops, 6 wall sides
+    assert mesh.triangles_before == 2 * (3 * 12 + 2 + 6)
+    # One quad each for floor, roof, roof top and wall top, one per wall side
+    assert mesh.triangles_after == 2 * (1 + 2 + 1 + 4)
+    assert len(mesh.indices) == 3 * mesh.triangles_after
+    assert mesh.indices.max() < len(mesh.vertices)
+
+
+def test_parts_are_contiguous(grid):
+    mesh = DungeonMesher(grid, SPACING).build()
+    assert list(mesh.parts) == ["floor", "roof", "wall"]
+    assert mesh.parts == {"floor": (0, 6), "roof": (6, 12), "wall": (18, 30)}
+    first, count = mesh.parts["wall"]
+    assert first + count == len(mesh.indices)
+
+
+def quads(mesh, part):
+    first, count = mesh.parts[part]
+    corners = mesh.indices[first : first + count].reshape(-1, 6)[:, [0, 1, 2, 5]]
+    return mesh.vertices[corners]
+
+
+def test_uvs_tile_once_per_cell(grid):
+    mesher = DungeonMesher(grid, SPACING, floor_height=-0.7, roof_height=2.5)
+    mesh = mesher.build()
+    floor = quads(mesh, "floor")[0]
+    u, v = floor[:, 3], floor[:, 4]
+    assert (u.min(), u.max()) == pytest.approx((-0.5, 3.5))
+    assert (v.min(), v.max()) == pytest.approx((-0.5, 2.5))
+
+    for side in quads(mesh, "wall")[1:]:
+        u, v = side[:, 3], side[:, 4]
+        length = np.ptp(side[:, [0, 2]], axis=0).max() / SPACING
+        assert np.ptp(u) == pytest.approx(length)
+        assert (v.min(), v.max()) == pytest.approx((0.0, 3.2 / SPACING))
+
+
+def test_uv_styles_remap(grid):
+    mesh = DungeonMesher(grid, SPACING, uv_styles={"roof": ((0.25, 0.75), (0.0, 0.0))}).build()
+    # A zero scale samples the one palette texel at the origin
+    uvs = quads(mesh, "roof")[..., 3:5].reshape(-1, 2)
+    np.testing.assert_allclose(uvs, np.tile((0.25, 0.75), (len(uvs), 1)))
+
+
+def test_faces_wind_counter_clockwise_towards_their_normal(grid):
+    mesh = DungeonMesher(grid, SPACING).build()
+    for part in mesh.parts:
+        faces = quads(mesh, part)
+        positions, normals = faces[..., :3], faces[:, 0, 5:]
+        winding = np.cross(positions[:, 1] - positions[:, 0], positions[:, 2] - positions[:, 0])
+        assert (np.einsum("ij,ij->i", winding, normals) > 0).all()
+
+
+def test_wall_sides_face_open_cells(grid):
+    mesh = DungeonMesher(grid, SPACING).build()
+    sides = quads(mesh, "wall")[1:]
+    assert len(sides) == 4
+    centers = sides[..., :3].mean(axis=1)
+    outside = centers + sides[:, 0, 5:] * 0.1 * SPACING
+    cols = np.rint(outside[:, 0] / SPACING).astype(int)
+    rows = np.rint(outside[:, 2] / SPACING).astype(int)
+    assert (grid[rows, cols] != WALL).all()
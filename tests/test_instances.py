@@ -0,0 +1,156 @@
+from pyglm import glm
+import numpy as np
+import pytest
+from OpenGL.GL import GL_ARRAY_BUFFER, glBindBuffer, glGetBufferSubData
+
+from objloader import INSTANCE_DTYPE, InstanceBuffer, make_instances, yaw_quaternion
+
+
+def gpu_rows(buffer, count=None):
+    """The first ``count`` rows of the buffer's GPU storage (default: every active row)."""
+    count = buffer.count if count is None else count
+    glBindBuffer(GL_ARRAY_BUFFER, buffer.vbo)
+    data = glGetBufferSubData(GL_ARRAY_BUFFER, 0, count * buffer.stride)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    return np.frombuffer(bytes(data), dtype=INSTANCE_DTYPE)
+
+
+def rows(count, start=0):
+    offsets = np.arange(start, start + count, dtype=np.float32)[:, None] * (1.0, 2.0, 3.0)
+    return make_instances(offsets, scale=np.arange(start, start + count)[:, None] + 1.0)
+
+
+@pytest.fixture
+def buffer(gl_context):
+    buffer = InstanceBuffer()
+    yield buffer
+    buffer.release()
+
+
+def test_set_instances(buffer):
+    data = rows(5)
+    buffer.set_instances(data)
+    assert buffer.count == 5 and buffer.capacity == InstanceBuffer.MIN_CAPACITY
+    np.testing.assert_array_equal(gpu_rows(buffer), data)
+    np.testing.assert_array_equal(buffer.data, data)
+    assert not buffer.data.flags.writeable
+
+    # Plain offsets get identity rotation, scale and tint
+    buffer.set_instances([(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)])
+    uploaded = gpu_rows(buffer)
+    np.testing.assert_array_equal(uploaded["offset"], [(1, 2, 3), (4, 5, 6)])
+    np.testing.assert_array_equal(uploaded["rotation"], [(0, 0, 0, 1)] * 2)
+    np.testing.assert_array_equal(uploaded["scale"], 1.0)
+    np.testing.assert_array_equal(uploaded["tint"], 1.0)
+
+
+def test_update_range(buffer):
+    data = rows(6)
+    buffer.set_instances(data)
+    uploaded = buffer.bytes_uploaded
+    buffer.update_range(2, rows(3, start=10))
+    assert buffer.bytes_uploaded - uploaded == 3 * INSTANCE_DTYPE.itemsize
+
+    expected = data.copy()
+    expected[2:5] = rows(3, start=10)
+    np.testing.assert_array_equal(gpu_rows(buffer), expected)
+    np.testing.assert_array_equal(buffer.data, expected)
+    # The caller's array was uploaded without a copy and must stay untouched
+    np.testing.assert_array_equal(data, rows(6))
+
+    with pytest.raises(IndexError):
+        buffer.update_range(4, rows(3))
+    with pytest.raises(IndexError):
+        buffer.update_range(-1, rows(1))
+
+
+def test_append_grows_capacity(buffer):
+    buffer.append(rows(10))
+    assert buffer.capacity == 16
+    buffer.append(rows(10, start=10))
+    # Growth doubles and re-sends the rows already there
+    assert buffer.count == 20 and buffer.capacity == 32
+    np.testing.assert_array_equal(gpu_rows(buffer), rows(20))
+
+    buffer.reserve(100)
+    assert buffer.capacity == 128
+    buffer.append(rows(1, start=20))
+    np.testing.assert_array_equal(gpu_rows(buffer), rows(21))
+    np.testing.assert_array_equal(buffer.data, rows(21))
+
+
+def test_remove_swaps_in_the_last_instance(buffer):
+    buffer.set_instances(rows(5))
+    buffer.remove(1)
+    buffer.remove(3)  # the last one: nothing moves
+    expected = rows(5)[[0, 4, 2]]
+    assert buffer.count == 3
+    np.testing.assert_array_equal(gpu_rows(buffer), expected)
+    np.testing.assert_array_equal(buffer.data, expected)
+    with pytest.raises(IndexError):
+        buffer.remove(3)
+
+
+def test_set_instances_after_growth_shrinks_count(buffer):
+    buffer.append(rows(40))
+    capacity = buffer.capacity
+    buffer.set_instances(rows(3, start=7))
+    assert buffer.count == 3 and buffer.capacity == capacity
+    np.testing.assert_array_equal(gpu_rows(buffer), rows(3, start=7))
+    buffer.set_instances(np.zeros(0, dtype=INSTANCE_DTYPE))
+    assert buffer.count == 0 and len(buffer.data) == 0
+
+
+def rotate(quat, vector):
+    # The vertex shader's rotateByQuat
+    q, w = quat[:3], quat[3]
+    return vector + 2.0 * np.cross(q, np.cross(q, vector) + w * vector)
+
+
+@pytest.mark.parametrize(
+    "degrees, expected", [(0, (1, 0, 0)), (90, (0, 0, -1)), (180, (-1, 0, 0)), (-90, (0, 0, 1))]
+)
+def test_yaw_quaternion_rotates_x(degrees, expected):
+    quat = yaw_quaternion(degrees)
+    assert quat.shape == (4,) and quat.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(quat), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(rotate(quat, np.array([1.0, 0.0, 0.0])), expected, atol=1e-6)
+
+
+def test_yaw_quaternion_matches_glm_rotate():
+    degrees = np.array([0.0, 30.0, 90.0, 135.0, 180.0, 270.0, -45.0])
+    quats = yaw_quaternion(degrees)
+    assert quats.shape == (len(degrees), 4)
+    vector = np.array([0.3, -0.5, 0.8])
+    for angle, quat in zip(degrees, quats):
+        matrix = glm.rotate(glm.mat4(1.0), glm.radians(float(angle)), glm.vec3(0, 1, 0))
+        expected = matrix * glm.vec4(*vector, 0.0)
+        np.testing.assert_allclose(rotate(quat, vector), tuple(expected)[:3], atol=1e-6)
+
+
+def test_make_instances_defaults():
+    instances = make_instances([(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)])
+    assert instances.dtype == INSTANCE_DTYPE
+    np.testing.assert_array_equal(instances["offset"], [(1, 2, 3), (4, 5, 6)])
+    np.testing.assert_array_equal(instances["rotation"], [(0, 0, 0, 1)] * 2)
+    np.testing.assert_array_equal(instances["scale"], np.ones((2, 3)))
+    np.testing.assert_array_equal(instances["tint"], np.ones((2, 4)))
+    # A flat list is one offset per three values
+    assert len(make_instances([0.0, 1.0, 2.0, 3.0, 4.0, 5.0])) == 2
+    assert len(make_instances(np.zeros((0, 3)))) == 0
+
+
+def test_make_instances_shared_and_per_instance_values():
+    offsets = np.zeros((3, 3))
+    instances = make_instances(
+        offsets,
+        rotation=yaw_quaternion([0.0, 90.0, 180.0]),
+        scale=2.0,
+        tint=(1.0, 0.5, 0.25, 1.0),
+    )
+    np.testing.assert_allclose(instances["rotation"], yaw_quaternion([0.0, 90.0, 180.0]))
+    np.testing.assert_array_equal(instances["scale"], np.full((3, 3), 2.0))
+    np.testing.assert_array_equal(instances["tint"], [(1.0, 0.5, 0.25, 1.0)] * 3)
+
+    scales = np.array([(1.0, 2.0, 3.0), (4.0, 5.0, 6.0), (7.0, 8.0, 9.0)])
+    np.testing.assert_array_equal(make_instances(offsets, scale=scales)["scale"], scales)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from generator.level_cache import load_level
+from generator.level_layout import LEVEL_LAYERS
+
+
+@pytest.mark.parametrize("seed", [7, -5, 2**64 + 3])
+def test_cache_round_trip(tmp_path, seed):
+    generated = load_level(40, 30, seed, cache_dir=tmp_path)
+    assert not generated.from_cache
+
+    cached = load_level(40, 30, seed, cache_dir=tmp_path)
+    assert cached.from_cache
+    assert cached.seed == seed
+    assert cached.spawn == tuple(generated.spawn)
+    np.testing.assert_array_equal(cached.grid, generated.grid)
+    for name in LEVEL_LAYERS:
+        np.testing.assert_array_equal(cached.instances[name], generated.instances[name])
+
+
+def test_seeds_equal_modulo_header_do_not_share_a_cache(tmp_path):
+    load_level(40, 30, 3, cache_dir=tmp_path)
+    assert not load_level(40, 30, 2**64 + 3, cache_dir=tmp_path).from_cache
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from generator.dungeon_generator import CHEST, EMPTY, WALL, DungeonGenerator
+from generator.level_layout import LAYER_HEIGHTS, LEVEL_LAYERS, build_level_instances, layer_masks
+
+
+def build_level_instances_loop(grid, spacing=1.6):
+    # The per-cell loop main.py used to run, kept as a reference
+    layers = {name: [] for name in LEVEL_LAYERS}
+    height, width = len(grid), len(grid[0])
+    for i, row in enumerate(grid):
+        for j, cell in enumerate(row):
+            x, z = j * spacing, i * spacing
+            if cell == WALL:
+                if (
+                    (j > 0 and row[j - 1] == WALL)
+                    or (j < width - 1 and row[j + 1] == WALL)
+                    or i == 0
+                    or i == height - 1
+                ):
+                    layers["wall"].append((x, 0.0, z))
+                if (
+                    (i > 0 and grid[i - 1][j] == WALL)
+                    or (i < height - 1 and grid[i + 1][j] == WALL)
+                    or j == 0
+                    or j == width - 1
+                ):
+                    layers["wall_vert"].append((x, 0.0, z))
+            if cell == CHEST:
+                layers["chest"].append((x, -0.6, z))
+            layers["roof"].append((x, 2.5, z))
+            layers["ground"].append((x, -1.0, z))
+    return {
+        name: np.array(offsets, dtype=np.float32).reshape(-1, 3)
+        for name, offsets in layers.items()
+    }
+
+
+@pytest.mark.parametrize(
+    "seed, width, height, spacing",
+    [(0, 80, 60, 1.6), (5, 33, 47, 1.6), (11, 128, 96, 2.0), (42, 20, 20, 1.0)],
+)
+def test_matches_the_per_cell_loop(seed, width, height, spacing):
+    generator = DungeonGenerator(width, height, seed=seed)
+    generator.generate_dungeon()
+    fast = build_level_instances(generator.grid, spacing)
+    slow = build_level_instances_loop(generator.grid.tolist(), spacing)
+    assert set(fast) == set(LEVEL_LAYERS)
+    for name in LEVEL_LAYERS:
+        assert fast[name].dtype == np.float32
+        np.testing.assert_array_equal(fast[name], slow[name], err_msg=name)
+    assert len(fast["chest"]) and len(fast["wall_vert"])
+
+
+def test_random_grids_match_the_per_cell_loop():
+    # Noise exercises wall neighbourhoods rooms and corridors never produce
+    rng = np.random.default_rng(9)
+    for shape in ((1, 1), (1, 6), (6, 1), (2, 2), (13, 9)):
+        grid = rng.choice(np.array([EMPTY, WALL, CHEST], dtype=np.uint8), shape)
+        fast = build_level_instances(grid)
+        slow = build_level_instances_loop(grid.tolist())
+        for name in LEVEL_LAYERS:
+            np.testing.assert_array_equal(fast[name], slow[name], err_msg=f"{shape} {name}")
+
+
+def test_layer_masks():
+    grid = np.array(
+        [
+            [WALL, WALL, WALL, WALL],
+            [WALL, EMPTY, CHEST, WALL],
+            [WALL, WALL, EMPTY, WALL],
+            [WALL, EMPTY, WALL, WALL],
+        ],
+        dtype=np.uint8,
+    )
+    masks = layer_masks(grid)
+    # (1, 0) has walls above and below; (2, 1) only beside; (3, 2) only beside
+    assert masks["wall"][2, 1] and not masks["wall_vert"][2, 1]
+    assert masks["wall_vert"][1, 0] and masks["wall"][0, 1]
+    assert masks["wall"][3, 2] and not masks["wall_vert"][3, 2]
+    assert masks["chest"].sum() == 1 and masks["chest"][1, 2]
+    assert masks["ground"].all() and masks["roof"].all()
+    offsets = build_level_instances(grid)
+    for name in LEVEL_LAYERS:
+        assert (offsets[name][:, 1] == LAYER_HEIGHTS[name]).all()
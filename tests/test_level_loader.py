@@ -0,0 +1,212 @@
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from OpenGL.GL import GL_ARRAY_BUFFER, glBindBuffer, glGetBufferSubData
+
+from level_loader import LEVEL_LAYER_NAMES, LevelLoader, prepare_level
+from objloader import INSTANCE_DTYPE, AssetRegistry, Object
+
+ASSETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+ASSET_NAMES = {"roof": "roof_flat", "wall": "wall", "ground": "ground", "chest": "chest"}
+
+
+@pytest.fixture(autouse=True)
+def level_cache_dir(tmp_path, monkeypatch):
+    # prepare_level caches under ./.levelcache
+    monkeypatch.chdir(tmp_path)
+
+
+class Layer:
+    """Stands in for an Object; collects the rows the loader appends."""
+
+    def __init__(self):
+        self.rows = np.zeros(0, dtype=INSTANCE_DTYPE)
+        self.appends = 0
+        self.released = False
+
+    def set_instances(self, rows):
+        self.rows = rows.copy()
+
+    def reserve(self, count):
+        pass
+
+    def append(self, rows):
+        self.rows = np.concatenate((self.rows, rows))
+        self.appends += 1
+
+    def release(self):
+        self.released = True
+
+
+def create_layers():
+    return {name: Layer() for name in LEVEL_LAYER_NAMES}
+
+
+class ManualExecutor:
+    """Hands out futures the test completes itself."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append((future, fn, args))
+        return future
+
+    def finish(self):
+        future, fn, args = self.futures.pop(0)
+        future.set_result(fn(*args))
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_prepare_level_off_the_main_thread():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        worker = executor.submit(prepare_level, 40, 30, 5).result()
+        thread = executor.submit(threading.current_thread).result()
+    assert thread is not threading.main_thread()
+
+    here = prepare_level(40, 30, 5)
+    assert here.level.seed == worker.level.seed == 5
+    np.testing.assert_array_equal(worker.level.grid, here.level.grid)
+    assert set(worker.instances) == set(LEVEL_LAYER_NAMES)
+    for name in LEVEL_LAYER_NAMES:
+        assert worker.instances[name].dtype == INSTANCE_DTYPE
+        np.testing.assert_array_equal(worker.instances[name], here.instances[name])
+        assert worker.cells[name].shape == (len(worker.instances[name]),)
+    assert len(worker.instances["ground"]) == 40 * 30
+    assert worker.objects == {} and worker.generation_ms > 0
+
+
+def test_request_is_refused_while_loading():
+    executor = ManualExecutor()
+    loader = LevelLoader(create_layers, executor=executor)
+    assert not loader.busy
+    assert loader.request(30, 20, seed=1)
+    assert loader.busy
+    assert not loader.request(30, 20, seed=2)
+    assert len(executor.futures) == 1
+    assert loader.update() is None and loader.busy
+
+    executor.finish()
+    ready = loader.update()
+    assert ready is not None and not loader.busy
+    assert ready.level.seed == 1
+    for name in LEVEL_LAYER_NAMES:
+        np.testing.assert_array_equal(ready.objects[name].rows, ready.instances[name])
+    # Free again once the level is handed over
+    assert loader.request(30, 20, seed=2)
+    loader.release()
+
+
+def test_generation_errors_surface_on_update():
+    executor = ManualExecutor()
+    loader = LevelLoader(create_layers, executor=executor)
+    loader.request(30, 20, seed=1)
+    future, _, _ = executor.futures.pop()
+    future.set_exception(ValueError("broken"))
+    with pytest.raises(ValueError):
+        loader.update()
+
+
+def test_back_objects_are_recycled():
+    created = []
+
+    def create():
+        created.append(create_layers())
+        return created[-1]
+
+    executor = ManualExecutor()
+    loader = LevelLoader(create, executor=executor)
+    first = loader.load_now(30, 20, seed=1)
+    assert first.objects is created[0]
+
+    loader.request(30, 20, seed=2)
+    executor.finish()
+    second = loader.update()
+    assert second.objects is created[1]
+    loader.recycle(first.objects)
+
+    loader.request(30, 20, seed=3)
+    executor.finish()
+    third = loader.update()
+    # The swapped-out set is filled again instead of making a third
+    assert third.objects is created[0] and len(created) == 2
+    np.testing.assert_array_equal(third.objects["ground"].rows, third.instances["ground"])
+
+    loader.recycle(second.objects)
+    loader.release()
+    assert all(layer.released for layer in created[1].values())
+
+
+def gpu_rows(obj):
+    buffer = obj.instances
+    glBindBuffer(GL_ARRAY_BUFFER, buffer.vbo)
+    data = glGetBufferSubData(GL_ARRAY_BUFFER, 0, buffer.count * buffer.stride)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    return np.frombuffer(bytes(data), dtype=INSTANCE_DTYPE)
+
+
+def test_budgeted_upload_spans_several_updates(gl_context):
+    registry = AssetRegistry()
+
+    def create_objects():
+        return {
+            name: Object(f"{ASSETS}/{asset}.obj", f"{ASSETS}/{asset}.png", registry=registry)
+            for name, asset in ASSET_NAMES.items()
+        }
+
+    executor = ManualExecutor()
+    # A zero budget uploads one slice of rows per update
+    loader = LevelLoader(
+        create_objects, upload_budget_ms=0.0, rows_per_step=256, executor=executor
+    )
+    assert loader.request(48, 36, seed=11)
+    executor.finish()
+
+    frames = 0
+    ready = None
+    while ready is None:
+        ready = loader.update()
+        frames += 1
+        assert frames < 1000
+    steps = sum(math.ceil(len(ready.instances[name]) / 256) for name in LEVEL_LAYER_NAMES)
+    assert steps > 4
+    # One update per slice, plus the one that finds the steps exhausted
+    assert frames == steps + 1
+    assert loader.stats["upload_frames"] == frames
+    assert loader.stats["latency_ms"] >= loader.stats["upload_ms"] > 0
+
+    for name in LEVEL_LAYER_NAMES:
+        obj = ready.objects[name]
+        assert len(obj.instances) == len(ready.instances[name])
+        np.testing.assert_array_equal(gpu_rows(obj), ready.instances[name])
+    for obj in ready.objects.values():
+        obj.release()
+    loader.release()
+
+
+def test_release_mid_upload_frees_the_half_built_level(gl_context):
+    created = []
+
+    def create_objects():
+        created.append(
+            {
+                name: Object(f"{ASSETS}/{asset}.obj", f"{ASSETS}/{asset}.png")
+                for name, asset in ASSET_NAMES.items()
+            }
+        )
+        return created[-1]
+
+    executor = ManualExecutor()
+    loader = LevelLoader(create_objects, upload_budget_ms=0.0, rows_per_step=64, executor=executor)
+    loader.request(48, 36, seed=11)
+    executor.finish()
+    assert loader.update() is None and loader.busy
+    loader.release()
+    assert all(obj.instances is None for obj in created[0].values())
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from generator.dungeon_generator import EMPTY, WALL
+from lighting import Light
+from lightmap import bake_irradiance, load_irradiance, visible_cells
+
+SPACING = 1.6
+
+
+@pytest.fixture
+def split_room():
+    """A 7x9 open room split by a wall along column 4, open at row 0."""
+    grid = np.full((7, 9), EMPTY, dtype=np.uint8)
+    grid[1:, 4] = WALL
+    return grid
+
+
+def world(row, col, y=0.0):
+    return (col * SPACING, y, row * SPACING)
+
+
+def test_visible_cells_stop_at_walls(split_room):
+    origin = (2 * SPACING, 3 * SPACING)  # (x, z) of cell (3, 2)
+    cells = [(3, 0), (6, 3), (3, 6), (6, 8), (0, 2), (3, 4)]
+    seen = visible_cells(split_room, origin, cells, SPACING)
+    # Same side, same side, behind the wall, behind the wall, through the
+    # gap row, and the wall cell itself
+    np.testing.assert_array_equal(seen, [True, True, False, False, True, True])
+    assert visible_cells(split_room, origin, np.zeros((0, 2)), SPACING).shape == (0,)
+
+
+def test_bake_matches_shader_attenuation(split_room):
+    light = Light(world(3, 2, 1.0), color=(1.0, 0.5, 0.25), intensity=2.0, radius=6.0)
+    irradiance = bake_irradiance(split_room, [light], SPACING)
+    assert irradiance.shape == (7, 9, 3)
+
+    distance = np.linalg.norm(np.subtract(world(3, 0), tuple(light.position)))
+    attenuation = 2.0 / (1 + 0.09 * distance + 0.032 * distance**2)
+    window = (1 - (distance / 6.0) ** 4) ** 2
+    expected = attenuation * window * np.array((1.0, 0.5, 0.25))
+    np.testing.assert_allclose(irradiance[3, 0], expected, rtol=1e-5)
+
+    # Occluded behind the wall, and out of range
+    assert not irradiance[3, 6].any()
+    assert not irradiance[6, 8].any()
+
+    # Wall cells take the mean of their open neighbours
+    np.testing.assert_allclose(irradiance[3, 4], (irradiance[3, 3] + irradiance[3, 5]) / 2)
+
+
+def test_lights_above_the_roof_shine_over_walls(split_room):
+    light = Light(world(3, 4, 5.0), intensity=4.0, radius=8.0)
+    irradiance = bake_irradiance(split_room, [light], SPACING)
+    np.testing.assert_allclose(irradiance[3, 3], irradiance[3, 5])
+    assert irradiance[3, 3].all()
+
+
+def test_cache_round_trip(tmp_path, split_room):
+    lights = [Light(world(1, 1, 1.0), radius=5.0), Light(world(5, 7, 1.0), radius=5.0)]
+    baked = load_irradiance(3, split_room, lights, SPACING, cache_dir=tmp_path)
+    cached = load_irradiance(3, split_room, lights, SPACING, cache_dir=tmp_path)
+    assert isinstance(cached, np.memmap)
+    np.testing.assert_array_equal(cached, baked)
+    # A moved light is a different cache entry
+    lights[0] = Light(world(1, 2, 1.0), radius=5.0)
+    moved = load_irradiance(3, split_room, lights, SPACING, cache_dir=tmp_path)
+    assert not isinstance(moved, np.memmap)
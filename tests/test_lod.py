@@ -0,0 +1,41 @@
+import os
+import shutil
+
+import numpy as np
+from OpenGL.GL import GL_TRIANGLES
+
+from objloader import _read_mesh_cache, load_lod_meshes, load_mesh, select_lods
+
+ASSETS = os.path.join(os.path.dirname(__file__), os.pardir, "assets")
+
+
+def test_levels_are_cached_as_triangles(tmp_path):
+    filename = str(tmp_path / "chest.obj")
+    shutil.copy(os.path.join(ASSETS, "chest.obj"), filename)
+    source_triangles = len(load_mesh(filename)[1]) // 3
+
+    levels = load_lod_meshes(filename)
+    triangles = [len(indices) // 3 for _, indices, _ in levels]
+    assert [shape for _, _, shape in levels] == [GL_TRIANGLES] * len(levels)
+    assert source_triangles > triangles[0] > triangles[1] > 0
+    for vertices, indices, _ in levels:
+        assert indices.max() < len(vertices)
+
+    stat = os.stat(filename)
+    cached = _read_mesh_cache(filename, stat, ".lod0.1")
+    assert cached[2] == GL_TRIANGLES
+    np.testing.assert_array_equal(cached[1], levels[0][1])
+    assert [len(i) // 3 for _, i, _ in load_lod_meshes(filename)] == triangles
+
+
+def test_select_lods_hysteresis():
+    switch = (10.0, 20.0)
+    distances = np.array([5.0, 10.2, 10.8, 19.7, 25.0])
+    fresh = select_lods(distances, np.full(5, -1), switch, hysteresis=1.0)
+    np.testing.assert_array_equal(fresh, [0, 1, 1, 1, 2])
+
+    # Inside the band around a switch distance the previous level is kept
+    np.testing.assert_array_equal(
+        select_lods(distances, [0, 0, 0, 2, 0], switch, 1.0), [0, 0, 1, 2, 2]
+    )
+    np.testing.assert_array_equal(select_lods([9.7, 9.4], [1, 1], switch, 1.0), [1, 0])
@@ -0,0 +1,56 @@
+import numpy as np
+
+from objloader import AssetRegistry, Object, live_handle_count, live_handles
+
+ASSETS = "./assets"
+LAYERS = {"roof": "roof_flat", "wall": "wall", "ground": "ground", "chest": "chest"}
+
+
+def build_level(registry, rng):
+    """Objects like scene.create_level_objects, with random instances."""
+    objects = {}
+    for name, asset in LAYERS.items():
+        objects[name] = Object(
+            f"{ASSETS}/{asset}.obj",
+            f"{ASSETS}/{asset}.png",
+            offsets=rng.uniform(-20, 20, (int(rng.integers(1, 50)), 3)),
+            registry=registry,
+        )
+    return objects
+
+
+def test_regeneration_returns_to_baseline(gl_context):
+    baseline = live_handle_count()
+    registry = AssetRegistry()
+    rng = np.random.default_rng(0)
+
+    objects = build_level(registry, rng)
+    for obj in objects.values():
+        obj.release()
+    # Only the registry's idle meshes and textures are left
+    resident = live_handle_count()
+    assert resident > baseline
+    uploads = registry.misses
+
+    for _ in range(10):
+        for obj in build_level(registry, rng).values():
+            obj.release()
+        assert live_handle_count() == resident
+    # Regenerating re-acquires the idle handles instead of uploading again
+    assert registry.misses == uploads
+
+    registry.clear()
+    assert live_handle_count() == baseline
+
+
+def test_context_manager_and_second_release(gl_context):
+    registry = AssetRegistry()
+    baseline = live_handles()
+    with Object(
+        f"{ASSETS}/wall.obj", f"{ASSETS}/wall.png", offsets=[(0, 0, 0)], registry=registry
+    ) as obj:
+        pass
+    obj.release()
+    assert obj.mesh is None and obj.texture is None
+    registry.clear()
+    assert live_handles() == baseline
@@ -0,0 +1,67 @@
+import numpy as np
+from OpenGL.GL import GL_QUADS, GL_TRIANGLES
+
+from objloader import load_mesh, parse_obj
+
+QUAD = b"""\
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+vn 0 0 1
+f 1/1/1 2/2/1 3/3/1 4/4/1
+"""
+
+# Optional components: a v with w, a vt with w and a vt with only u. The
+# vt rows have 12 tokens in total, which splits evenly into 4 rows of 3.
+MIXED_ARITY = b"""\
+v 0 0 0
+v 1 0 0 1.0
+v 1 1 0
+v 0 1 0
+vt 0.25 0.5 0.0
+vt 0.75
+vt 1 1
+vt 0 1
+vn 0 0 1
+f 1/1/1 2/2/1 3/3/1
+f 1/1/1 3/3/1 4/4/1
+"""
+
+
+def write(tmp_path, data):
+    path = tmp_path / "mesh.obj"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_quad_is_split_into_triangles(tmp_path):
+    vertices, indices, face_shape = parse_obj(write(tmp_path, QUAD))
+    assert face_shape == GL_QUADS
+    np.testing.assert_array_equal(indices, [0, 1, 2, 0, 2, 3])
+    np.testing.assert_array_equal(vertices[:, :3], [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)])
+    np.testing.assert_array_equal(vertices[:, 3:5], [(0, 0), (1, 0), (1, 1), (0, 1)])
+    np.testing.assert_array_equal(vertices[:, 5:], np.tile((0, 0, 1), (4, 1)))
+
+
+def test_mixed_arity_rows_keep_their_columns(tmp_path):
+    vertices, indices, face_shape = parse_obj(write(tmp_path, MIXED_ARITY))
+    assert face_shape == GL_TRIANGLES
+    np.testing.assert_array_equal(indices, [0, 1, 2, 0, 2, 3])
+    np.testing.assert_array_equal(vertices[:, :3], [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)])
+    # A missing v defaults to 0, extra w components are dropped
+    np.testing.assert_array_equal(vertices[:, 3:5], [(0.25, 0.5), (0.75, 0), (1, 1), (0, 1)])
+
+
+def test_mesh_cache_round_trip(tmp_path):
+    filename = write(tmp_path, MIXED_ARITY)
+    parsed = load_mesh(filename)
+    cached = load_mesh(filename)
+    assert isinstance(cached[0], np.memmap)
+    for a, b in zip(parsed[:2], cached[:2]):
+        np.testing.assert_array_equal(a, b)
+    assert cached[2] == parsed[2]
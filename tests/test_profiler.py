@@ -0,0 +1,170 @@
+import csv
+import json
+import time
+
+import pytest
+
+from profiler import FRAME_COUNTERS, Profiler
+
+
+def busy(ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def record_frames(profiler, count):
+    for i in range(count):
+        profiler.begin_frame()
+        with profiler.scope("update"):
+            busy(0.2)
+        with profiler.scope("render"):
+            with profiler.scope("shadows"):
+                busy(0.2)
+            with profiler.scope("world"):
+                with profiler.scope("walls"):
+                    busy(0.1)
+                profiler.count_draw(36, instances=i + 1)
+            profiler.count("uniform_uploads", 2)
+        profiler.end_frame()
+
+
+@pytest.fixture
+def profiler():
+    return Profiler(enabled=True, capacity=4, gpu=False)
+
+
+def test_scopes_nest(profiler):
+    record_frames(profiler, 1)
+    (frame,) = profiler.frames
+    scopes = {record["name"]: record for record in frame["scopes"]}
+    # Records are kept in the order the scopes opened
+    assert [r["name"] for r in frame["scopes"]] == [
+        "update",
+        "render",
+        "shadows",
+        "world",
+        "walls",
+    ]
+    assert [r["depth"] for r in frame["scopes"]] == [0, 0, 1, 1, 2]
+
+    def end(record):
+        return record["start_us"] + record["cpu_us"]
+
+    for parent, child in (("render", "shadows"), ("render", "world"), ("world", "walls")):
+        assert scopes[parent]["start_us"] <= scopes[child]["start_us"]
+        assert end(scopes[child]) <= end(scopes[parent])
+    assert end(scopes["update"]) <= scopes["render"]["start_us"]
+    assert scopes["update"]["cpu_us"] >= 200
+    assert end(scopes["render"]) <= frame["cpu_ms"] * 1000
+    assert all(record["gpu_us"] is None and "query" not in record for record in frame["scopes"])
+
+
+def test_counters(profiler):
+    record_frames(profiler, 2)
+    first, second = profiler.frames
+    assert list(first["counters"]) == list(FRAME_COUNTERS)
+    assert first["counters"]["draw_calls"] == 1
+    assert first["counters"]["triangles"] == 12
+    assert second["counters"]["triangles"] == 24
+    assert first["counters"]["uniform_uploads"] == 2
+    assert first["counters"]["buffer_bytes"] == 0
+
+
+def test_ring_buffer_keeps_the_last_frames(profiler):
+    record_frames(profiler, 10)
+    assert len(profiler.frames) == 4
+    assert [frame["frame"] for frame in profiler.frames] == [6, 7, 8, 9]
+    assert profiler.frame_index == 10
+    starts = [frame["start_us"] for frame in profiler.frames]
+    assert starts == sorted(starts)
+
+    profiler.reset(capacity=2)
+    assert len(profiler.frames) == 0
+    record_frames(profiler, 3)
+    assert [frame["frame"] for frame in profiler.frames] == [11, 12]
+    profiler.reset()
+    assert profiler.frames.maxlen == 2
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False, gpu=False)
+    record_frames(profiler, 3)
+    assert len(profiler.frames) == 0
+    # Every disabled scope is the same shared no-op
+    assert profiler.scope("a") is profiler.scope("b")
+
+    profiler.set_enabled(True)
+    # Outside begin_frame/end_frame nothing is recorded either
+    assert profiler.scope("a") is profiler.scope("b")
+    profiler.count("draw_calls")
+    profiler.begin_frame()
+    profiler.set_enabled(False)
+    profiler.end_frame()
+    assert len(profiler.frames) == 0
+
+
+def test_summary(profiler):
+    record_frames(profiler, 3)
+    summary = profiler.summary(frames=2)
+    assert summary["frames"] == 2
+    assert set(summary["scopes"]) == {"update", "render", "shadows", "world", "walls"}
+    assert summary["scopes"]["walls"]["gpu_ms"] == 0.0
+    assert summary["scopes"]["render"]["cpu_ms"] >= summary["scopes"]["shadows"]["cpu_ms"]
+    # Frames 1 and 2 drew 2 and 3 instances of 12 triangles
+    assert summary["counters"]["triangles"] == 30
+    assert Profiler(gpu=False).summary()["frames"] == 0
+
+
+def test_dump_json(profiler, tmp_path):
+    record_frames(profiler, 3)
+    path = tmp_path / "profile.json"
+    profiler.dump_json(path)
+    frames = json.loads(path.read_text())["frames"]
+    assert frames == json.loads(json.dumps(list(profiler.frames)))
+    assert [frame["frame"] for frame in frames] == [0, 1, 2]
+
+
+def test_dump_csv(profiler, tmp_path):
+    record_frames(profiler, 3)
+    path = tmp_path / "profile.csv"
+    profiler.dump_csv(path)
+    with open(path, newline="") as file:
+        header, *rows = list(csv.reader(file))
+    names = ["update", "render", "shadows", "world", "walls"]
+    assert header == (
+        ["frame", "cpu_ms"]
+        + [f"{name} {kind}" for name in names for kind in ("cpu_ms", "gpu_ms")]
+        + list(FRAME_COUNTERS)
+    )
+    assert [row[0] for row in rows] == ["0", "1", "2"]
+    for row, frame in zip(rows, profiler.frames):
+        values = dict(zip(header, row))
+        assert float(values["walls cpu_ms"]) > 0
+        # GPU columns stay empty without queries
+        assert values["walls gpu_ms"] == ""
+        assert int(values["triangles"]) == frame["counters"]["triangles"]
+
+
+def test_dump_chrome_trace(profiler, tmp_path):
+    record_frames(profiler, 2)
+    path = tmp_path / "trace.json"
+    profiler.dump_chrome_trace(path)
+    trace = json.loads(path.read_text())
+    assert trace["otherData"]["tids"] == {"1": "CPU", "2": "GPU"}
+    events = trace["traceEvents"]
+    frames = [e for e in events if e["name"] == "frame"]
+    counters = [e for e in events if e["ph"] == "C"]
+    spans = [e for e in events if e["ph"] == "X" and e["name"] != "frame"]
+    assert len(frames) == len(counters) == 2
+    assert len(spans) == 2 * 5
+    # No GPU track without queries
+    assert all(e["tid"] == 1 for e in frames + spans)
+    assert counters[1]["args"]["triangles"] == 24
+
+    # Every scope lies inside its frame
+    for frame in frames:
+        inside = [e for e in spans if frame["ts"] <= e["ts"] <= frame["ts"] + frame["dur"]]
+        assert len(inside) == 5
+        for span in inside:
+            assert span["ts"] + span["dur"] <= frame["ts"] + frame["dur"] + 1e-3
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from collision import CollisionGrid
+from game import ProjectileStore
+from generator.dungeon_generator import EMPTY, WALL
+
+
+def positions_by_id(store):
+    return {int(i): tuple(p) for i, p in zip(store.ids[: store.count], store.active_positions)}
+
+
+def spawn_row(store, count):
+    # Projectile k starts at (k, 0, 0) flying along +z, so its x names it
+    positions = np.column_stack((np.arange(count), np.zeros(count), np.zeros(count)))
+    return store.spawn(positions, np.tile((0.0, 0.0, 1.0), (count, 1)))
+
+
+def test_spawn_assigns_sequential_ids_and_grows():
+    store = ProjectileStore(capacity=4)
+    first = spawn_row(store, 3)
+    second = store.spawn([(9.0, 1.0, 2.0)], [(1.0, 0.0, 0.0)], speeds=4.0, max_distances=8.0)
+    more = spawn_row(store, 10)
+    assert first.tolist() == [0, 1, 2]
+    assert second.tolist() == [3]
+    assert more.tolist() == list(range(4, 14))
+    assert len(store) == 14 and len(store.ids) >= 14
+    # Growing keeps what was already there
+    assert store.slot_of(3) == 3
+    np.testing.assert_array_equal(store.positions[3], (9.0, 1.0, 2.0))
+    assert store.speeds[3] == 4.0 and store.max_distances[3] == 8.0
+    assert store.speeds[0] == 10.0 and store.distances[: store.count].max() == 0.0
+
+
+def test_update_moves_every_projectile():
+    store = ProjectileStore()
+    directions = np.array([(1.0, 0.0, 0.0), (0.0, 0.0, -1.0), (0.6, 0.8, 0.0)])
+    store.spawn(np.zeros((3, 3)), directions, speeds=[2.0, 4.0, 5.0])
+    assert store.update(0.5).tolist() == []
+    np.testing.assert_allclose(
+        store.active_positions, [(1.0, 0.0, 0.0), (0.0, 0.0, -2.0), (1.5, 2.0, 0.0)], atol=1e-6
+    )
+    np.testing.assert_allclose(store.distances[:3], (1.0, 2.0, 2.5))
+
+
+def test_update_expires_projectiles_past_their_range():
+    store = ProjectileStore()
+    ids = store.spawn(
+        np.zeros((4, 3)), np.tile((1.0, 0.0, 0.0), (4, 1)), max_distances=[1.0, 5.0, 2.5, 3.0]
+    )
+    # Two units per step at the default speed of 10
+    assert store.update(0.2).tolist() == [ids[0]]
+    assert sorted(store.ids[: store.count].tolist()) == [ids[1], ids[2], ids[3]]
+    assert sorted(store.update(0.2).tolist()) == [ids[2], ids[3]]
+    assert store.ids[: store.count].tolist() == [ids[1]]
+    np.testing.assert_allclose(store.active_positions, [(4.0, 0.0, 0.0)])
+
+
+def test_remove_slots_from_the_middle_and_the_tail():
+    store = ProjectileStore()
+    ids = spawn_row(store, 8)
+    before = positions_by_id(store)
+    # Slots 2 and 4 are holes below the new end; slots 6 and 7 are the tail
+    removed = store.remove_slots([2, 4, 7, 6])
+    assert removed.tolist() == [2, 4, 7, 6]
+    assert len(store) == 4
+    # The only live tail entry left, id 5, fills the first hole; slot order
+    # changes but every surviving id keeps its own data
+    assert store.ids[:4].tolist() == [0, 1, 5, 3]
+    survivors = positions_by_id(store)
+    assert survivors == {i: before[i] for i in (0, 1, 3, 5)}
+    assert store.slot_of(5) == 2 and store.slot_of(7) is None
+
+    # Fresh ids never reuse removed ones
+    assert spawn_row(store, 2).tolist() == [8, 9]
+    assert sorted(store.ids[: store.count].tolist()) == [0, 1, 3, 5, 8, 9]
+    assert set(ids.tolist()) - set(store.ids[: store.count].tolist()) == {2, 4, 6, 7}
+
+
+def test_remove_by_id_ignores_unknown_ids():
+    store = ProjectileStore()
+    spawn_row(store, 5)
+    assert sorted(store.remove([1, 3, 42]).tolist()) == [1, 3]
+    assert store.remove([1, 3]).tolist() == []
+    assert store.remove_slots([]).tolist() == []
+    assert sorted(positions_by_id(store)) == [0, 2, 4]
+    assert all(positions_by_id(store)[i][0] == i for i in (0, 2, 4))
+
+
+def test_ids_stay_stable_through_random_churn():
+    rng = np.random.default_rng(3)
+    store = ProjectileStore(capacity=2)
+    expected = {}
+    for _ in range(50):
+        count = int(rng.integers(0, 20))
+        positions = rng.normal(size=(count, 3)).astype(np.float32)
+        ids = store.spawn(positions, np.tile((0.0, 1.0, 0.0), (count, 1)))
+        expected.update(zip(ids.tolist(), map(tuple, positions)))
+        if len(store):
+            slots = rng.choice(len(store), int(rng.integers(0, len(store) + 1)), replace=False)
+            for removed in store.remove_slots(slots).tolist():
+                del expected[removed]
+        assert positions_by_id(store) == expected
+
+
+def test_update_stops_projectiles_at_walls():
+    spacing = 1.6
+    grid = np.full((3, 6), EMPTY, dtype=np.uint8)
+    grid[1, 4] = WALL
+    collision = CollisionGrid(grid, spacing, bottom=-1.0, top=2.5)
+    store = ProjectileStore()
+    ids = store.spawn(
+        [(1 * spacing, 0.5, 1 * spacing), (1 * spacing, 0.5, 0.0)],
+        [(1.0, 0.0, 0.0), (1.0, 0.0, 0.0)],
+        speeds=10.0,
+    )
+    # The first flies into the wall's face at x = 3.5 cells and is removed
+    assert store.update(0.5, collision).tolist() == [ids[0]]
+    assert store.ids[: store.count].tolist() == [ids[1]]
+    assert store.active_positions[0, 0] == pytest.approx(1 * spacing + 5.0)
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pytest
+
+from game import Entity, GameContext, RenderBatcher
+from objloader import AssetRegistry, Object, yaw_quaternion
+from shaders import ShaderProgram
+
+# The game's attribute layout without its lighting, whose samplers need
+# the units LightManager assigns
+VERTEX = """#version 330 core
+layout(location = 0) in vec3 position;
+layout(location = 3) in vec3 aOffset;
+layout(location = 4) in vec4 aRotation;
+layout(location = 5) in vec3 aScale;
+uniform mat4 model;
+void main() {
+    vec3 p = position * aScale;
+    p += 2.0 * cross(aRotation.xyz, cross(aRotation.xyz, p) + aRotation.w * p);
+    gl_Position = model * vec4(p + aOffset, 1.0);
+}
+"""
+
+FRAGMENT = """#version 330 core
+out vec4 color;
+void main() {
+    color = vec4(1.0);
+}
+"""
+
+ASSETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+
+
+def asset(name, extension):
+    return os.path.join(ASSETS, f"{name}.{extension}")
+
+
+@pytest.fixture
+def scene(gl_context):
+    shader = ShaderProgram(VERTEX, FRAGMENT, use_cache=False)
+    shader.use()
+    registry = AssetRegistry()
+    game = GameContext(shader)
+    batcher = RenderBatcher(game)
+    objects = []
+
+    def make(name, mesh, texture=None, **kwargs):
+        obj = Object(
+            asset(mesh, "obj"), asset(texture or mesh, "png"), registry=registry, **kwargs
+        )
+        objects.append(obj)
+        return Entity(game, name, obj)
+
+    yield game, batcher, make
+    batcher.release()
+    for obj in objects:
+        obj.release()
+    shader.release()
+
+
+def place(entity, x, rotation=0.0):
+    entity.position = (x, 0.0, -2.0 * x)
+    entity.rotation = rotation
+    return entity
+
+
+def test_shared_mesh_and_texture_draw_as_one_batch(scene):
+    game, batcher, make = scene
+    benches = [place(make(f"bench{i}", "bench"), i, rotation=30.0 * i) for i in range(5)]
+    batcher.draw(benches)
+    assert batcher.draw_calls == 1
+    assert batcher.instances_drawn == 5
+    # One identity model matrix for the whole batch
+    assert batcher.uniform_uploads == 1
+
+    (batch,) = batcher.batches.values()
+    rows = batch.instances.data
+    # Rows follow the order the entities were passed in
+    np.testing.assert_allclose(rows["offset"], [(i, 0.0, -2.0 * i) for i in range(5)])
+    np.testing.assert_allclose(
+        rows["rotation"], yaw_quaternion([30.0 * i for i in range(5)]), atol=1e-6
+    )
+    np.testing.assert_array_equal(rows["scale"], 1.0)
+
+
+def test_groups_by_mesh_and_texture(scene):
+    game, batcher, make = scene
+    entities = [
+        place(make("bench", "bench"), 0),
+        place(make("chest", "chest"), 1),
+        place(make("red bench", "bench", texture="chest"), 2),
+        place(make("bench again", "bench"), 3),
+        place(make("chest again", "chest"), 4),
+    ]
+    batcher.draw(entities)
+    assert batcher.draw_calls == 3
+    assert batcher.instances_drawn == 5
+    assert batcher.uniform_uploads == 1
+
+    # Batches are made in the order their first entity appears
+    bench, chest, red_bench = batcher.batches.values()
+    assert bench.mesh.key == red_bench.mesh.key != chest.mesh.key
+    assert bench.texture.key != red_bench.texture.key
+    assert [len(batch.instances) for batch in (bench, chest, red_bench)] == [2, 2, 1]
+    np.testing.assert_allclose(bench.instances.data["offset"][:, 0], (0, 3))
+    np.testing.assert_allclose(chest.instances.data["offset"][:, 0], (1, 4))
+    np.testing.assert_allclose(red_bench.instances.data["offset"][:, 0], (2,))
+
+
+def test_batches_are_reused_between_frames(scene):
+    game, batcher, make = scene
+    benches = [place(make(f"bench{i}", "bench"), i) for i in range(3)]
+    batcher.draw(benches)
+    (batch,) = batcher.batches.values()
+
+    place(benches[1], 10.0, rotation=90.0)
+    batcher.draw(benches[:2])
+    assert list(batcher.batches.values()) == [batch]
+    assert batcher.instances_drawn == 2
+    np.testing.assert_allclose(batch.instances.data["offset"][:, 0], (0, 10))
+    np.testing.assert_allclose(batch.instances.data["rotation"][1], yaw_quaternion(90.0))
+
+
+def test_instanced_objects_fall_back_to_entity_draw(scene):
+    game, batcher, make = scene
+    field = make("field", "ground")
+    field.obj.set_instances(np.zeros((7, 3), dtype=np.float32))
+    benches = [place(make(f"bench{i}", "bench"), i) for i in range(2)]
+
+    batcher.draw([benches[0], field, benches[1]])
+    # The fallback draws with its own model matrix, then the batch resets it
+    assert batcher.draw_calls == 2
+    assert batcher.uniform_uploads == 2
+    assert batcher.instances_drawn == 2 + 7
+    assert len(batcher.batches) == 1
+
+    batcher.draw([field])
+    assert (batcher.draw_calls, batcher.uniform_uploads) == (1, 2)
+
+
+def test_nothing_to_draw(scene):
+    game, batcher, make = scene
+    batcher.draw([])
+    assert (batcher.draw_calls, batcher.uniform_uploads, batcher.instances_drawn) == (0, 0, 0)
+    assert batcher.batches == {}
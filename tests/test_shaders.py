@@ -0,0 +1,197 @@
+import os
+
+import pytest
+from OpenGL.GL import (
+    GL_FLOAT_MAT4,
+    GL_FLOAT_VEC3,
+    GL_FLOAT_VEC4,
+    GL_INVALID_INDEX,
+    GL_SAMPLER_2D,
+    glGetUniformBlockIndex,
+)
+
+from shaders import (
+    _SHADER_CACHE_HEADER,
+    _SHADER_CACHE_MAGIC,
+    CAMERA_BLOCK,
+    FRAGMENT_SHADER,
+    SHADER_CACHE_SUFFIX,
+    SHADER_CACHE_VERSION,
+    VERTEX_SHADER,
+    ShaderProgram,
+    ShaderVariants,
+    with_defines,
+)
+
+VERTEX = (
+    """#version 330 core
+layout(location = 0) in vec3 pos;
+layout(location = 3) in vec4 instanceTint;
+uniform mat4 model;
+"""
+    + CAMERA_BLOCK
+    + """
+out vec4 tint;
+void main() {
+    tint = instanceTint;
+    gl_Position = projection * view * model * vec4(pos, 1.0);
+}
+"""
+)
+
+FRAGMENT = """#version 330 core
+in vec4 tint;
+out vec4 color;
+uniform sampler2D image;
+uniform vec3 weights[3];
+#if USE_FOG
+uniform vec4 fogColor;
+#endif
+void main() {
+    vec3 sum = weights[0] + weights[1] + weights[2];
+    color = tint * texture(image, sum.xy);
+#if USE_FOG
+    color = mix(color, fogColor, 0.5);
+#endif
+}
+"""
+
+
+def cache_files(cache_dir):
+    return sorted(cache_dir.glob("*" + SHADER_CACHE_SUFFIX))
+
+
+def test_reflection(gl_context, tmp_path):
+    shader = ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path)
+    assert shader.uniforms["model"].type == GL_FLOAT_MAT4
+    assert shader.uniforms["image"].type == GL_SAMPLER_2D
+    # Arrays are reflected under their bare name with their length
+    weights = shader.uniforms["weights"]
+    assert (weights.size, weights.type) == (3, GL_FLOAT_VEC3)
+    # Uniforms inside blocks are set through the block, not by location
+    assert "view" not in shader.uniforms and "projection" not in shader.uniforms
+    assert glGetUniformBlockIndex(shader.program, "Camera") != GL_INVALID_INDEX
+    assert "fogColor" not in shader.uniforms
+
+    assert shader.attributes["pos"].location == 0
+    assert shader.attributes["pos"].type == GL_FLOAT_VEC3
+    assert shader.attributes["instanceTint"].location == 3
+    assert shader.attributes["instanceTint"].type == GL_FLOAT_VEC4
+
+    assert shader.location("model") == shader.uniforms["model"].location
+    assert shader.location("missing") == -1
+    shader.release()
+    assert shader.program is None
+    shader.release()
+
+
+def test_game_shader_links(gl_context, tmp_path):
+    shader = ShaderProgram(VERTEX_SHADER, FRAGMENT_SHADER, cache_dir=tmp_path)
+    assert shader.location("model") != -1
+    for block in ("Camera", "Lights"):
+        assert glGetUniformBlockIndex(shader.program, block) != GL_INVALID_INDEX
+    shader.release()
+
+
+def test_cache_miss_then_hit(gl_context, tmp_path):
+    first = ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path)
+    assert not first.from_cache
+    (path,) = cache_files(tmp_path)
+    magic, version, _ = _SHADER_CACHE_HEADER.unpack_from(path.read_bytes())
+    assert (magic, version) == (_SHADER_CACHE_MAGIC, SHADER_CACHE_VERSION)
+
+    second = ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path)
+    assert second.from_cache
+    assert second.uniforms == first.uniforms
+    assert second.attributes == first.attributes
+    # Other sources or defines get their own entry
+    third = ShaderProgram(VERTEX, FRAGMENT, defines={"USE_FOG": 1}, cache_dir=tmp_path)
+    assert not third.from_cache and "fogColor" in third.uniforms
+    assert len(cache_files(tmp_path)) == 2
+    for shader in (first, second, third):
+        shader.release()
+
+
+def test_use_cache_false_writes_nothing(gl_context, tmp_path):
+    shader = ShaderProgram(VERTEX, FRAGMENT, use_cache=False, cache_dir=tmp_path)
+    assert not shader.from_cache
+    assert cache_files(tmp_path) == []
+    shader.release()
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        # Payload a driver cannot load: the link check fails
+        lambda magic, version, fmt, binary: (magic, version, fmt, b"\xde\xad" * 64),
+        # Unknown binary format: glProgramBinary raises GL_INVALID_ENUM
+        lambda magic, version, fmt, binary: (magic, version, 0xBAD, binary),
+        # Written by another cache version or not a cache file at all
+        lambda magic, version, fmt, binary: (magic, version + 1, fmt, binary),
+        lambda magic, version, fmt, binary: (b"JUNK", version, fmt, binary),
+    ],
+    ids=["corrupt", "rejected-format", "old-version", "bad-magic"],
+)
+def test_bad_cache_entries_fall_back_to_linking(gl_context, tmp_path, damage):
+    ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path).release()
+    (path,) = cache_files(tmp_path)
+    data = path.read_bytes()
+    header = _SHADER_CACHE_HEADER.unpack_from(data)
+    magic, version, fmt, binary = damage(*header, data[_SHADER_CACHE_HEADER.size :])
+    path.write_bytes(_SHADER_CACHE_HEADER.pack(magic, version, fmt) + binary)
+
+    shader = ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path)
+    assert not shader.from_cache
+    assert shader.location("model") != -1
+    shader.release()
+    # The entry is rewritten, so the next run loads it again
+    again = ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path)
+    assert again.from_cache
+    again.release()
+
+
+def test_truncated_cache_entry(gl_context, tmp_path):
+    ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path).release()
+    (path,) = cache_files(tmp_path)
+    path.write_bytes(path.read_bytes()[: _SHADER_CACHE_HEADER.size - 2])
+    shader = ShaderProgram(VERTEX, FRAGMENT, cache_dir=tmp_path)
+    assert not shader.from_cache
+    shader.release()
+
+
+def test_compile_errors_raise(gl_context, tmp_path):
+    broken = FRAGMENT.replace("color = tint", "color = undefinedThing")
+    with pytest.raises(RuntimeError):
+        ShaderProgram(VERTEX, broken, cache_dir=tmp_path)
+    assert cache_files(tmp_path) == []
+
+
+def test_with_defines():
+    source = "#version 330 core\nvoid main() {}\n"
+    assert with_defines(source, {}) is source
+    assert with_defines(source, {"B": True, "A": 2}) == (
+        "#version 330 core\n#define A 2\n#define B 1\nvoid main() {}\n"
+    )
+
+
+def test_variants_are_memoized_per_define_set(gl_context, tmp_path, monkeypatch):
+    # ShaderVariants caches under the default ./.shadercache
+    monkeypatch.chdir(tmp_path)
+    variants = ShaderVariants(VERTEX, FRAGMENT)
+    plain = variants.get(USE_FOG=0)
+    fog = variants.get(USE_FOG=1)
+    assert plain is not fog
+    assert "fogColor" in fog.uniforms and "fogColor" not in plain.uniforms
+    assert variants.get(USE_FOG=0) is plain
+    assert variants.get(USE_FOG=True) is fog
+    both = variants.get(USE_FOG=1, EXTRA=0)
+    assert variants.get(EXTRA=0, USE_FOG=1) is both
+    assert len(variants.programs) == 3
+    assert len(os.listdir(tmp_path / ".shadercache")) == 3
+
+    variants.release()
+    assert variants.programs == {} and fog.program is None
+    # A new set of variants loads every program from the cache
+    again = ShaderVariants(VERTEX, FRAGMENT)
+    assert again.get(USE_FOG=1).from_cache
+    again.release()
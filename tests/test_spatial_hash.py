@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+
+from game import Entity, GameContext, SpatialHash
+
+
+def random_positions(rng, count, side=20.0):
+    return rng.uniform((-side, -2.0, -side), (side, 2.0, side), (count, 3))
+
+
+def brute_pairs(positions, radii, queries, query_radius):
+    # Every query against every live entry: {(query index, id)}
+    ids = np.array(list(positions))
+    centres = np.array([positions[i] for i in ids]).reshape(-1, 3)
+    reach = np.array([radii[i] for i in ids]) + query_radius
+    distance = np.linalg.norm(queries[:, None, :] - centres[None, :, :], axis=2)
+    rows, cols = np.nonzero(distance <= reach[None, :])
+    return set(zip(rows.tolist(), ids[cols].tolist()))
+
+
+def pairs(result):
+    return set(zip(*(column.tolist() for column in result)))
+
+
+@pytest.fixture
+def populated():
+    """A hash with 300 random spheres and a dict mirror of what it should hold."""
+    rng = np.random.default_rng(7)
+    spatial = SpatialHash(cell_size=2.0, capacity=8)
+    points = random_positions(rng, 300)
+    sizes = rng.uniform(0.2, 1.5, 300)
+    ids = spatial.insert(points, sizes)
+    positions = {int(i): p for i, p in zip(ids, points)}
+    radii = {int(i): r for i, r in zip(ids, sizes)}
+    return rng, spatial, positions, radii
+
+
+def check_queries(rng, spatial, positions, radii):
+    assert len(spatial) == len(positions)
+    queries = random_positions(rng, 50)
+    assert pairs(spatial.query_pairs(queries, 0.7)) == brute_pairs(positions, radii, queries, 0.7)
+    for centre in queries[:10]:
+        expected = {i for _, i in brute_pairs(positions, radii, centre[None, :], 2.5)}
+        assert set(spatial.query_radius(centre, 2.5).tolist()) == expected
+
+
+def test_insert_matches_brute_force(populated):
+    rng, spatial, positions, radii = populated
+    assert len(set(positions)) == 300
+    check_queries(rng, spatial, positions, radii)
+    ids = np.array(list(positions))
+    np.testing.assert_allclose(spatial.positions_of(ids), np.array(list(positions.values())))
+
+
+def test_update_within_and_across_cells(populated):
+    rng, spatial, positions, radii = populated
+    ids = np.array(list(positions))
+    # Tiny moves mostly stay in their cell; big ones cross into others
+    for scale in (0.01, 5.0, 0.01, 30.0):
+        movers = rng.choice(ids, 60, replace=False)
+        moved = np.array([positions[i] for i in movers]) + rng.normal(0, scale, (60, 3))
+        spatial.update(movers, moved)
+        positions.update(zip(movers.tolist(), moved))
+        check_queries(rng, spatial, positions, radii)
+
+
+def test_update_crossing_a_cell_boundary():
+    spatial = SpatialHash(cell_size=2.0)
+    (entry,) = spatial.insert([(1.9, 0.0, 0.0)], 0.1)
+    assert spatial.query_radius((1.9, 0.0, 0.0), 0.0).tolist() == [entry]
+    spatial.update([entry], [(2.1, 0.0, 0.0)])
+    assert spatial.query_radius((1.9, 0.0, 0.0), 0.0).tolist() == []
+    assert spatial.query_radius((2.1, 0.0, 0.0), 0.0).tolist() == [entry]
+    spatial.update([entry], [(-10.5, 0.0, 0.0)])
+    assert spatial.query_radius((-10.5, 0.0, 0.0), 0.0).tolist() == [entry]
+    assert spatial.query_aabb((0.0, -1.0, -1.0), (4.0, 1.0, 1.0)).tolist() == []
+
+
+def test_remove_and_reinsert(populated):
+    rng, spatial, positions, radii = populated
+    ids = np.array(list(positions))
+    gone = rng.choice(ids, 120, replace=False)
+    spatial.remove(gone)
+    for i in gone.tolist():
+        del positions[i]
+    check_queries(rng, spatial, positions, radii)
+
+    # Ids that are already gone, never existed or are negative are ignored
+    spatial.remove(np.concatenate((gone[:10], [10_000, -1])))
+    assert len(spatial) == len(positions)
+    with pytest.raises(KeyError):
+        spatial.positions_of(gone[:1])
+
+    # Freed slots are reused, but ids never are
+    points = random_positions(rng, 150)
+    fresh = spatial.insert(points, 0.5)
+    assert not set(fresh.tolist()) & set(ids.tolist())
+    positions.update(zip(fresh.tolist(), points))
+    radii.update((i, 0.5) for i in fresh.tolist())
+    check_queries(rng, spatial, positions, radii)
+
+
+def test_query_aabb(populated):
+    rng, spatial, positions, radii = populated
+    movers = list(positions)[:50]
+    moved = random_positions(rng, 50)
+    spatial.update(movers, moved)
+    positions.update(zip(movers, moved))
+    for _ in range(20):
+        low = rng.uniform(-20, 10, 3)
+        high = low + rng.uniform(0, 15, 3)
+        expected = {
+            i
+            for i, p in positions.items()
+            if np.all(p + radii[i] >= low) and np.all(p - radii[i] <= high)
+        }
+        assert set(spatial.query_aabb(low, high).tolist()) == expected
+    # A box bigger than the population falls back to testing every entry
+    assert set(spatial.query_aabb((-99, -99, -99), (99, 99, 99)).tolist()) == set(positions)
+
+
+def test_self_pairs(populated):
+    rng, spatial, positions, radii = populated
+    spatial.remove(list(positions)[::3])
+    for i in list(positions)[::3]:
+        del positions[i]
+    a, b = spatial.self_pairs()
+    assert np.all(a < b)
+    ids = list(positions)
+    expected = {
+        (i, j)
+        for i in ids
+        for j in ids
+        if i < j and np.linalg.norm(positions[i] - positions[j]) <= radii[i] + radii[j]
+    }
+    assert set(zip(a.tolist(), b.tolist())) == expected
+
+
+def test_empty_hash():
+    spatial = SpatialHash()
+    assert spatial.query_radius((0, 0, 0), 5.0).tolist() == []
+    assert spatial.query_aabb((-1, -1, -1), (1, 1, 1)).tolist() == []
+    assert [len(column) for column in spatial.self_pairs()] == [0, 0]
+
+
+class Program:
+    # Stands in for shaders.ShaderProgram; entities only need locations
+    def location(self, name):
+        return -1
+
+
+def test_entities_register_only_when_colliding():
+    game = GameContext(Program())
+    prop = Entity(game, "prop", obj=None)
+    target = Entity(game, "target", obj=None, radius=0.5, collides=True)
+    assert prop.spatial_id is None
+    assert len(game.spatial) == 1 and game.spatial_owners[target.spatial_id] is target
+
+    prop.position = (3.0, 0.0, 0.0)
+    target.position = (5.0, 0.0, 0.0)
+    assert game.spatial.query_radius((5.0, 0.0, 0.0), 0.1).tolist() == [target.spatial_id]
+
+    game.entities += [prop, target]
+    game.remove_entity(prop)
+    game.remove_entity(target)
+    assert len(game.spatial) == 0 and not game.spatial_owners
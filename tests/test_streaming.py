@@ -0,0 +1,220 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from generator.dungeon_generator import EMPTY
+from level_loader import LEVEL_LAYER_NAMES
+from objloader import INSTANCE_DTYPE
+from streaming import (
+    CHUNK_SIZE,
+    StreamingWorld,
+    chunk_doors,
+    generate_chunk,
+    layer_capacities,
+    prepare_chunk,
+)
+
+SEED = 1234
+
+
+class Layer:
+    """Stands in for a level Object: its instance buffer is a plain array."""
+
+    def __init__(self):
+        self.rows = None
+        self.released = False
+
+    @property
+    def instances(self):
+        return self
+
+    @property
+    def capacity(self):
+        return len(self.rows)
+
+    def set_instances(self, rows):
+        self.rows = rows.copy()
+
+    def update_range(self, first, rows):
+        assert first + len(rows) <= len(self.rows)
+        self.rows[first : first + len(rows)] = rows
+
+    def draw_ranges(self, ranges):
+        pass
+
+    def release(self):
+        self.released = True
+
+
+class ImmediateExecutor:
+    """Runs jobs on submit so tests see every chunk the same frame."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[1:3])
+        future = Future()
+        try:
+            if args[1:3] in self.fail:
+                raise RuntimeError(f"chunk {args[1:3]} failed")
+            future.set_result(fn(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def make_world(executor=None, **kwargs):
+    kwargs.setdefault("chunk_size", 16)
+    return StreamingWorld(
+        SEED,
+        lambda: {name: Layer() for name in LEVEL_LAYER_NAMES},
+        executor=executor or ImmediateExecutor(),
+        upload_budget_ms=1000.0,
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("cx, cz", [(0, 0), (-3, 5), (7, -2)])
+def test_neighbouring_chunks_share_doors(cx, cz):
+    size = 24
+    west, east, north, south = chunk_doors(SEED, cx, cz, size)
+    assert chunk_doors(SEED, cx + 1, cz, size)[0] == (0, east[1])
+    assert chunk_doors(SEED, cx - 1, cz, size)[1] == (size - 1, west[1])
+    assert chunk_doors(SEED, cx, cz + 1, size)[2] == (south[0], 0)
+    assert chunk_doors(SEED, cx, cz - 1, size)[3] == (north[0], size - 1)
+    # Doors keep clear of the corners
+    assert all(2 <= along < size - 2 for along in (west[1], east[1], north[0], south[0]))
+
+    # Both sides of each shared edge are open at the door
+    here = generate_chunk(SEED, cx, cz, size).cells
+    there = generate_chunk(SEED, cx + 1, cz, size).cells
+    assert here[east[1], size - 1] == EMPTY and there[east[1], 0] == EMPTY
+    below = generate_chunk(SEED, cx, cz + 1, size).cells
+    assert here[size - 1, south[0]] == EMPTY and below[0, south[0]] == EMPTY
+
+
+def test_generate_chunk_is_deterministic():
+    first = generate_chunk(SEED, 4, -1)
+    again = generate_chunk(SEED, 4, -1)
+    np.testing.assert_array_equal(first.cells, again.cells)
+    assert first.spawn == again.spawn
+    assert first.cells.shape == (CHUNK_SIZE, CHUNK_SIZE)
+    assert not np.array_equal(first.cells, generate_chunk(SEED, -1, 4).cells)
+    assert not np.array_equal(first.cells, generate_chunk(SEED + 1, 4, -1).cells)
+
+
+def test_prepare_chunk_offsets_rows_into_the_chunk():
+    size, spacing = 16, 1.6
+    rows = prepare_chunk(SEED, 2, -1, size, spacing)
+    for name, capacity in layer_capacities(size).items():
+        assert rows[name].dtype == INSTANCE_DTYPE
+        assert len(rows[name]) <= capacity
+    ground = rows["ground"]["offset"]
+    assert ground[:, 0].min() >= 2 * size * spacing - 1e-4
+    assert ground[:, 0].max() <= (3 * size - 1) * spacing + 1e-4
+    assert ground[:, 2].min() >= -size * spacing - 1e-4
+    assert ground[:, 2].max() <= -spacing + 1e-4
+
+
+def test_chunk_of():
+    world = make_world(chunk_size=32)
+    s = world.spacing
+    assert world.chunk_of(0.0, 0.0) == (0, 0)
+    # Cells are centred on multiples of the spacing
+    assert world.chunk_of(31 * s, 31 * s) == (0, 0)
+    assert world.chunk_of(31.49 * s, 0.0) == (0, 0)
+    assert world.chunk_of(31.51 * s, 0.0) == (1, 0)
+    assert world.chunk_of(-0.49 * s, 0.0) == (0, 0)
+    assert world.chunk_of(-0.51 * s, 0.0) == (-1, 0)
+    assert world.chunk_of(0.0, -32.51 * s) == (0, -2)
+    assert world.chunk_of(100 * s, -100 * s) == (3, -4)
+
+
+def test_ranges_merge_adjacent_slots():
+    world = make_world()
+    capacity = world.capacity["chest"]
+    world.visible[:] = False
+    world.visible[[0, 1, 2, 3, 5]] = True
+    counts = world.counts["chest"]
+    counts[:] = 0
+    counts[[0, 1, 3, 4, 5]] = (capacity, 2, capacity, capacity, 1)
+    # Slot 0 is full, so slot 1 continues it; slot 2 is empty, slot 4 hidden
+    assert world.ranges("chest") == [
+        (0, capacity + 2),
+        (3 * capacity, capacity),
+        (5 * capacity, 1),
+    ]
+    world.visible[:] = False
+    assert world.ranges("chest") == []
+
+
+def test_evicted_slots_are_reused():
+    world = make_world(load_radius=0, keep_radius=0)
+    assert world.slot_count == 1
+    world.update(0.0, 0.0)
+    assert world.resident == {(0, 0): 0}
+    first = world.objects["ground"].rows[: world.counts["ground"][0]].copy()
+
+    far = 10 * world.chunk_size * world.spacing
+    world.update(far, 0.0)
+    assert world.resident == {(10, 0): 0}
+    assert world.chunks_loaded == 2 and world.chunks_evicted == 1
+    rows = world.objects["ground"].rows[: world.counts["ground"][0]]
+    assert not np.array_equal(rows, first)
+    assert rows["offset"][:, 0].min() >= 10 * world.chunk_size * world.spacing - 1e-4
+
+
+def test_long_walk_stays_within_the_slots():
+    world = make_world()
+    byte_counts = set()
+    step = world.spacing * 3
+    # A winding walk through about 20 chunks in each direction
+    for i in range(400):
+        x = step * i * np.cos(i / 60)
+        z = step * i * np.sin(i / 45)
+        world.update(x, z)
+        stats = world.stats()
+        assert stats["resident_chunks"] <= world.slot_count
+        assert len(world._free) + len(world.resident) == world.slot_count
+        assert sorted(world.resident.values()) == sorted(np.flatnonzero(world.occupied).tolist())
+        byte_counts.add(stats["resident_bytes"])
+        cx, cz = world.chunk_of(x, z)
+        for dx in range(-world.load_radius, world.load_radius + 1):
+            for dz in range(-world.load_radius, world.load_radius + 1):
+                assert (cx + dx, cz + dz) in world.resident
+    assert len(byte_counts) == 1
+    assert world.chunks_evicted > 50
+    for name in LEVEL_LAYER_NAMES:
+        assert world.objects[name].capacity == world.slot_count * world.capacity[name]
+    world.release()
+    assert all(layer.released for layer in world.objects.values())
+
+
+def test_failed_chunks_are_reported_and_not_retried_while_in_range():
+    executor = ImmediateExecutor(fail={(1, 0)})
+    world = make_world(executor, load_radius=1, keep_radius=1)
+
+    failures = world.update(0.0, 0.0)
+    assert [key for key, _ in failures] == [(1, 0)]
+    assert isinstance(failures[0][1], RuntimeError)
+    assert (1, 0) not in world.resident and len(world.resident) == 8
+    assert world.stats()["failed_chunks"] == 1
+
+    # Staying nearby neither raises nor requests the chunk again
+    assert world.update(1.0, 1.0) == []
+    assert executor.submitted.count((1, 0)) == 1
+
+    # Once left behind, coming back retries it
+    far = 10 * world.chunk_size * world.spacing
+    world.update(far, 0.0)
+    assert world.failed == {}
+    executor.fail.clear()
+    assert world.update(0.0, 0.0) == []
+    assert executor.submitted.count((1, 0)) == 2
+    assert (1, 0) in world.resident
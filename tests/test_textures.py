@@ -0,0 +1,199 @@
+import numpy as np
+import pygame
+import pytest
+
+from textures import (
+    BC1,
+    BC3,
+    RGBA8,
+    TEXTURE_CACHE_SUFFIX,
+    TEXTURE_FORMATS,
+    compress_blocks,
+    decode_image,
+    decompress_blocks,
+    load_texture_pixels,
+    mip_chain,
+    resize_nearest,
+)
+
+
+def gradient(width, height):
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack((x * 5, y * 7, (x + y) * 3, y * 8), axis=-1).clip(0, 255).astype(np.uint8)
+
+
+def round_trip(pixels, fmt):
+    height, width = pixels.shape[:2]
+    data = compress_blocks(pixels, fmt)
+    assert data.dtype == np.uint8
+    assert len(data) == -(-width // 4) * -(-height // 4) * {BC1: 8, BC3: 16}[fmt]
+    decoded = decompress_blocks(data, (width, height), fmt)
+    assert decoded.shape == pixels.shape
+    return decoded.astype(np.int32)
+
+
+@pytest.mark.parametrize("fmt", [BC1, BC3])
+@pytest.mark.parametrize("size", [(48, 32), (13, 7)])
+def test_gradient_round_trip(fmt, size):
+    pixels = gradient(*size)
+    error = np.abs(round_trip(pixels, fmt) - pixels)
+    # Range-fit endpoints and a 4-entry palette per 4x4 block
+    assert error[..., :3].max() <= 16
+    assert error[..., :3].mean() <= 4
+    if fmt == BC3:
+        # Eight alpha values span each block's alpha range
+        assert error[..., 3].max() <= 2
+    else:
+        assert (round_trip(pixels, fmt)[..., 3] == 255).all()
+
+
+@pytest.mark.parametrize("fmt", [BC1, BC3])
+def test_grey_ramp_round_trip(fmt):
+    # Colours on one line are what the palette interpolates exactly
+    ramp = np.repeat((np.arange(64) * 4)[None, :, None], 8, axis=0)
+    pixels = np.concatenate((np.repeat(ramp, 3, axis=2), np.full_like(ramp, 255)), axis=2)
+    error = np.abs(round_trip(pixels.astype(np.uint8), fmt) - pixels)
+    assert error.max() <= 5
+
+
+@pytest.mark.parametrize("fmt", [BC1, BC3])
+def test_solid_blocks_round_trip(fmt):
+    rng = np.random.default_rng(1)
+    for colour in rng.integers(0, 256, (200, 4), dtype=np.uint8):
+        pixels = np.broadcast_to(colour, (4, 4, 4))
+        decoded = round_trip(pixels, fmt)
+        assert (decoded == decoded[0, 0]).all()
+        # Only RGB565 quantization is lost
+        assert np.abs(decoded[0, 0, :3] - colour[:3]).max() <= 4
+        assert decoded[0, 0, 3] == (colour[3] if fmt == BC3 else 255)
+    # Colours RGB565 can represent survive exactly
+    for colour in ((255, 255, 255, 255), (0, 0, 0, 0), (255, 0, 255, 128)):
+        pixels = np.broadcast_to(np.array(colour, dtype=np.uint8), (8, 8, 4))
+        expected = colour if fmt == BC3 else colour[:3] + (255,)
+        assert (round_trip(pixels, fmt) == expected).all()
+
+
+def test_unknown_block_format():
+    with pytest.raises(ValueError):
+        compress_blocks(gradient(4, 4), "bc7")
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [
+        ((48, 32), [(48, 32), (24, 16), (12, 8), (6, 4), (3, 2), (1, 1)]),
+        ((40, 10), [(40, 10), (20, 5), (10, 2), (5, 1), (2, 1), (1, 1)]),
+        ((1, 6), [(1, 6), (1, 3), (1, 1)]),
+        ((1, 1), [(1, 1)]),
+    ],
+)
+def test_mip_chain_reaches_1x1(size, expected):
+    levels = mip_chain(gradient(*size))
+    assert [(level.shape[1], level.shape[0]) for level in levels] == expected
+    assert all(level.dtype == np.uint8 and level.shape[2] == 4 for level in levels)
+
+
+def test_mip_chain_box_filter():
+    pixels = np.zeros((2, 4, 4), dtype=np.uint8)
+    pixels[0, :2] = 100
+    pixels[1, :2] = 50
+    pixels[:, 2:] = 255
+    levels = mip_chain(pixels)
+    # Averages round to nearest
+    np.testing.assert_array_equal(levels[1][0, :, 0], (75, 255))
+    np.testing.assert_array_equal(levels[2][0, 0], (165,) * 4)
+
+
+def test_resize_nearest():
+    pixels = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+    doubled = resize_nearest(pixels, (6, 4))
+    assert doubled.shape == (4, 6, 4) and doubled.flags.c_contiguous
+    # Integer factors repeat every texel exactly
+    np.testing.assert_array_equal(doubled, pixels.repeat(2, axis=0).repeat(2, axis=1))
+    np.testing.assert_array_equal(resize_nearest(doubled, (3, 2)), pixels)
+    np.testing.assert_array_equal(resize_nearest(pixels, (3, 2)), pixels)
+    # Non-integer factors pick the texel each target pixel falls in
+    stretched = resize_nearest(pixels, (4, 1))
+    np.testing.assert_array_equal(stretched[0], pixels[0, [0, 0, 1, 2]])
+
+
+@pytest.fixture
+def image_file(tmp_path):
+    pixels = gradient(20, 12)
+    pixels[..., 3] = 255
+    surface = pygame.image.frombuffer(pixels.tobytes(), (20, 12), "RGBA")
+    path = tmp_path / "gradient.png"
+    pygame.image.save(surface, str(path))
+    return path, pixels
+
+
+def test_decode_image_flip(image_file):
+    path, pixels = image_file
+    np.testing.assert_array_equal(decode_image(str(path)), pixels)
+    np.testing.assert_array_equal(decode_image(str(path), flip=False), pixels[::-1])
+
+
+@pytest.mark.parametrize("fmt", TEXTURE_FORMATS)
+@pytest.mark.parametrize("size", [None, (32, 16)])
+def test_texture_cache_write_then_read(image_file, tmp_path, fmt, size):
+    path, _ = image_file
+    cache_dir = tmp_path / "cache"
+    decoded = load_texture_pixels(str(path), size=size, fmt=fmt, cache_dir=str(cache_dir))
+    assert not decoded.from_cache
+    assert len(list(cache_dir.glob("*" + TEXTURE_CACHE_SUFFIX))) == 1
+
+    cached = load_texture_pixels(str(path), size=size, fmt=fmt, cache_dir=str(cache_dir))
+    assert cached.from_cache
+    assert (cached.width, cached.height) == (decoded.width, decoded.height)
+    assert (cached.width, cached.height) == (size or (20, 12))
+    assert cached.format == fmt and cached.nbytes == decoded.nbytes
+    assert len(cached.levels) == len(decoded.levels)
+    for level, (mapped, original) in enumerate(zip(cached.levels, decoded.levels)):
+        assert mapped.shape == original.shape and mapped.dtype == original.dtype
+        np.testing.assert_array_equal(mapped, original)
+        if fmt == RGBA8:
+            width, height = cached.level_size(level)
+            assert mapped.shape == (height, width, 4)
+        assert not mapped.flags.writeable
+
+
+def test_texture_cache_keys(image_file, tmp_path):
+    path, pixels = image_file
+    cache_dir = str(tmp_path / "cache")
+    load_texture_pixels(str(path), cache_dir=cache_dir)
+    # Other options are separate entries
+    assert not load_texture_pixels(str(path), flip=False, cache_dir=cache_dir).from_cache
+    assert not load_texture_pixels(str(path), fmt=BC1, cache_dir=cache_dir).from_cache
+
+    # An edited image is decoded again
+    pixels = pixels.copy()
+    pixels[0, 0] = (1, 2, 3, 255)
+    surface = pygame.image.frombuffer(pixels.tobytes(), (20, 12), "RGBA")
+    pygame.image.save(surface, str(path))
+    edited = load_texture_pixels(str(path), cache_dir=cache_dir)
+    assert not edited.from_cache
+    np.testing.assert_array_equal(edited.levels[0][0, 0], (1, 2, 3, 255))
+
+
+def test_damaged_cache_entries_are_decoded_again(image_file, tmp_path):
+    path, pixels = image_file
+    cache_dir = tmp_path / "cache"
+    load_texture_pixels(str(path), cache_dir=str(cache_dir))
+    (entry,) = cache_dir.glob("*" + TEXTURE_CACHE_SUFFIX)
+    entry.write_bytes(entry.read_bytes()[:-1])
+    reloaded = load_texture_pixels(str(path), cache_dir=str(cache_dir))
+    assert not reloaded.from_cache
+    np.testing.assert_array_equal(reloaded.levels[0], pixels)
+    assert load_texture_pixels(str(path), cache_dir=str(cache_dir)).from_cache
+
+    entry.write_bytes(b"P3DT")
+    assert not load_texture_pixels(str(path), cache_dir=str(cache_dir)).from_cache
+
+
+def test_uncached_load_writes_nothing(image_file, tmp_path):
+    path, _ = image_file
+    cache_dir = tmp_path / "cache"
+    pixels = load_texture_pixels(str(path), use_cache=False, cache_dir=str(cache_dir))
+    assert not pixels.from_cache and not cache_dir.exists()
+    with pytest.raises(ValueError):
+        load_texture_pixels(str(path), fmt="png")
@@ -0,0 +1,63 @@
+import numpy as np
+from OpenGL.GL import GL_UNIFORM_BUFFER, glBindBuffer, glGetBufferSubData
+
+from uniforms import UniformBuffer
+
+DTYPE = np.dtype(
+    [
+        ("a", "<f4", (4,)),
+        ("b", "<f4", (4,)),
+        ("lights", "<f4", (4, 4)),
+        ("c", "<f4", (4,)),
+    ]
+)
+
+
+def buffer_contents(uniforms):
+    glBindBuffer(GL_UNIFORM_BUFFER, uniforms.buffer_id)
+    data = glGetBufferSubData(GL_UNIFORM_BUFFER, 0, DTYPE.itemsize)
+    glBindBuffer(GL_UNIFORM_BUFFER, 0)
+    return np.frombuffer(bytes(data), dtype=DTYPE)[0]
+
+
+def test_unchanged_values_are_not_uploaded(gl_context):
+    uniforms = UniformBuffer(DTYPE)
+    assert not uniforms.set("a", (0, 0, 0, 0))
+    assert not uniforms.dirty
+    assert uniforms.upload() == 0
+    assert uniforms.upload_calls == 0
+    uniforms.release()
+
+
+def test_adjacent_ranges_are_merged(gl_context):
+    uniforms = UniformBuffer(DTYPE)
+    assert uniforms.set("b", (5, 6, 7, 8))
+    assert uniforms.set("a", (1, 2, 3, 4))
+    assert uniforms.set("lights", (9, 9, 9, 9), index=2)
+    assert uniforms.set("c", (1, 1, 1, 1))
+    # a and b touch; lights[2] and c are separate
+    assert uniforms._merged_ranges() == [[0, 32], [64, 80], [96, 112]]
+    assert uniforms.upload() == 64
+    assert uniforms.upload_calls == 3
+    assert not uniforms.dirty
+
+    contents = buffer_contents(uniforms)
+    np.testing.assert_array_equal(contents["a"], (1, 2, 3, 4))
+    np.testing.assert_array_equal(contents["b"], (5, 6, 7, 8))
+    np.testing.assert_array_equal(contents["lights"][2], (9, 9, 9, 9))
+    np.testing.assert_array_equal(contents["lights"][1], (0, 0, 0, 0))
+    np.testing.assert_array_equal(contents["c"], (1, 1, 1, 1))
+    assert uniforms.total_bytes == 64
+    uniforms.release()
+
+
+def test_overlapping_ranges_are_merged(gl_context):
+    uniforms = UniformBuffer(DTYPE)
+    uniforms.set("lights", np.ones((4, 4)))
+    uniforms.set("lights", (2, 2, 2, 2), index=1)
+    uniforms.set("lights", (3, 3, 3, 3), index=3)
+    assert uniforms._merged_ranges() == [[32, 96]]
+    assert uniforms.upload() == 64
+    assert uniforms.upload_calls == 1
+    np.testing.assert_array_equal(buffer_contents(uniforms)["lights"][:, 0], (1, 2, 1, 3))
+    uniforms.release()
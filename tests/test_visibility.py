@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from generator.dungeon_generator import EMPTY, WALL
+from visibility import PortalVisibility
+
+SPACING = 1.6
+
+
+@pytest.fixture
+def two_rooms():
+    """Rooms at columns 1-4 and 10-13 joined by a corridor along row 2."""
+    grid = np.full((6, 15), WALL, dtype=np.uint8)
+    grid[1:5, 1:5] = EMPTY
+    grid[1:5, 10:14] = EMPTY
+    grid[2, 5:10] = EMPTY
+    return PortalVisibility(grid, SPACING)
+
+
+def camera_at(row, col):
+    return (col * SPACING, 0.6, row * SPACING)
+
+
+def test_regions_and_portals(two_rooms):
+    visibility = two_rooms
+    assert visibility.room_count == 2
+    assert visibility.total_regions == 3
+    left, right = visibility.regions[2, 2], visibility.regions[2, 12]
+    corridor = visibility.regions[2, 7]
+    assert left < 2 and right < 2 and corridor == 2
+    assert (visibility.regions[1:5, 1:5] == left).all()
+    assert (visibility.regions[2, 5:10] == corridor).all()
+    assert (visibility.regions[visibility.grid == WALL] == -1).all()
+
+    pairs = {tuple(sorted(pair)) for pair in visibility.portal_regions.tolist()}
+    assert pairs == {tuple(sorted((left, corridor))), tuple(sorted((right, corridor)))}
+    # The portal into the left room is the single edge at x = 4.5 cells
+    index = next(i for i, pair in enumerate(visibility.portal_regions.tolist()) if left in pair)
+    np.testing.assert_allclose(visibility.portal_p1[index], (4.5 * SPACING, 1.5 * SPACING))
+    np.testing.assert_allclose(visibility.portal_p2[index], (4.5 * SPACING, 2.5 * SPACING))
+
+
+def test_flood_through_corridor(two_rooms):
+    mask = two_rooms.visible_cell_mask(camera_at(2, 2), yaw=0.0, pitch=0.0)
+    assert two_rooms.visible_regions == 3
+    assert mask[2, 2] and mask[2, 7] and mask[2, 12]
+
+
+def test_portal_outside_cone_is_culled(two_rooms):
+    mask = two_rooms.visible_cell_mask(camera_at(2, 2), yaw=180.0, pitch=0.0)
+    assert two_rooms.visible_regions == 1
+    assert mask[2, 2]
+    # The walls around the room are kept, the corridor beyond is not
+    assert mask[2, 5] and not mask[2, 6] and not mask[2, 12]
+
+
+def test_camera_inside_corridor(two_rooms):
+    mask = two_rooms.visible_cell_mask(camera_at(2, 7), yaw=0.0, pitch=0.0)
+    assert two_rooms.visible_regions == 2
+    assert mask[2, 7] and mask[2, 12]
+    assert not mask[2, 2]
+
+    mask = two_rooms.visible_cell_mask(camera_at(2, 7), yaw=90.0, pitch=0.0)
+    # Looking at the corridor wall neither portal is in the cone
+    assert two_rooms.visible_regions == 1
+    assert not mask[2, 2] and not mask[2, 12]
+
+
+def test_everything_visible_outside_the_graph(two_rooms):
+    assert two_rooms.visible_cell_mask(camera_at(0, 0), 0.0, 0.0) is None
+    assert two_rooms.visible_cell_mask(camera_at(20, 2), 0.0, 0.0) is None
+    above = (2 * SPACING, 5.0, 2 * SPACING)
+    assert two_rooms.visible_cell_mask(above, 0.0, 0.0) is None
+    assert two_rooms.visible_regions == two_rooms.total_regions
+    assert two_rooms.view_cone(pitch=-89.0, fov_y=45.0, aspect=4 / 3) is None
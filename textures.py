@@ -0,0 +1,341 @@
+import hashlib
+import json
+import os
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+import pygame
+
+TEXTURE_CACHE_DIR = "./.texturecache"
+TEXTURE_CACHE_SUFFIX = ".mips"
+TEXTURE_CACHE_VERSION = 1
+
+# magic, version, width, height, mip levels, format
+_TEXTURE_CACHE_HEADER = struct.Struct("<4sIIIII")
+_TEXTURE_CACHE_MAGIC = b"P3DT"
+
+# Pixel formats of a mip chain: plain RGBA8 or S3TC blocks
+RGBA8 = "rgba8"
+BC1 = "bc1"  # DXT1, 8 bytes per 4x4 block, opaque
+BC3 = "bc3"  # DXT5, 16 bytes per 4x4 block, with alpha
+TEXTURE_FORMATS = (RGBA8, BC1, BC3)
+_BLOCK_BYTES = {BC1: 8, BC3: 16}
+
+
+@dataclass
+class TexturePixels:
+    """A decoded mip chain; ``levels[0]`` is the full-size image.
+
+    RGBA8 levels are (height, width, 4) uint8 arrays with rows in upload
+    order; block-compressed levels are flat uint8 arrays of S3TC blocks.
+    Chains loaded from the cache are read-only memory maps.
+    """
+
+    width: int
+    height: int
+    format: str
+    levels: list
+    from_cache: bool = False
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def level_size(self, level):
+        return max(1, self.width >> level), max(1, self.height >> level)
+
+
+def decode_image(filename, flip=True):
+    """Decode an image into an (height, width, 4) uint8 RGBA array.
+
+    Rows come out in the order ``glTexImage2D`` expects them: the first
+    row is sampled at ``t = 0``. ``flip`` puts the image's top row there,
+    which suits OBJ texcoords exported with a flipped V.
+    """
+    image = pygame.image.load(filename)
+    width, height = image.get_size()
+    data = pygame.image.tostring(image, "RGBA", not flip)
+    return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+
+
+def resize_nearest(pixels, size):
+    """Nearest-neighbour resample of an RGBA array to ``size`` (width, height).
+
+    Integer scale factors repeat texels exactly, so a ``GL_NEAREST``
+    sampler sees the same image at any texcoord.
+    """
+    width, height = size
+    rows = np.arange(height) * pixels.shape[0] // height
+    cols = np.arange(width) * pixels.shape[1] // width
+    return np.ascontiguousarray(pixels[rows[:, None], cols[None, :]])
+
+
+def mip_chain(pixels):
+    """Box-filtered mip levels of an RGBA array, down to 1x1."""
+    levels = [np.ascontiguousarray(pixels, dtype=np.uint8)]
+    while levels[-1].shape[:2] != (1, 1):
+        level = levels[-1].astype(np.uint16)
+        height, width = level.shape[:2]
+        # Odd sizes drop their last row/column, like a 2x2 box filter
+        if height > 1:
+            level = level[: height // 2 * 2]
+            level = level[0::2] + level[1::2]
+        else:
+            level = level * 2
+        if width > 1:
+            level = level[:, : width // 2 * 2]
+            level = level[:, 0::2] + level[:, 1::2]
+        else:
+            level = level * 2
+        levels.append(((level + 2) >> 2).astype(np.uint8))
+    return levels
+
+
+def _blocks(pixels):
+    """Split an RGBA array into (n, 16, 4) 4x4 blocks, padding by edge repeat."""
+    height, width = pixels.shape[:2]
+    padding = ((0, -height % 4), (0, -width % 4), (0, 0))
+    padded = np.pad(pixels, padding, mode="edge").astype(np.int32)
+    rows, cols = padded.shape[0] // 4, padded.shape[1] // 4
+    return padded.reshape(rows, 4, cols, 4, 4).transpose(0, 2, 1, 3, 4).reshape(-1, 16, 4)
+
+
+def _to_565(rgb):
+    rgb = rgb.astype(np.int32)
+    return (
+        ((rgb[..., 0] * 31 + 127) // 255) << 11
+        | ((rgb[..., 1] * 63 + 127) // 255) << 5
+        | ((rgb[..., 2] * 31 + 127) // 255)
+    )
+
+
+def _from_565(color):
+    r, g, b = color >> 11 & 31, color >> 5 & 63, color & 31
+    return np.stack(((r * 255 + 15) // 31, (g * 255 + 31) // 63, (b * 255 + 15) // 31), -1)
+
+
+def _encode_color(blocks):
+    """BC1 colour halves (n, 8) of (n, 16, 4) blocks, always in 4-colour mode."""
+    rgb = blocks[..., :3]
+    # Range fit: endpoints at the ends of the block's bounding box
+    c0, c1 = _to_565(rgb.max(axis=1)), _to_565(rgb.min(axis=1))
+    swap = c0 < c1
+    c0[swap], c1[swap] = c1[swap], c0[swap]
+    e0, e1 = _from_565(c0), _from_565(c1)
+    palette = np.stack((e0, e1, (2 * e0 + e1) // 3, (e0 + 2 * e1) // 3), axis=1)
+    distance = ((rgb[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=-1)
+    indices = distance.argmin(axis=2).astype(np.uint32)
+    # Equal endpoints would select 3-colour mode; any index decodes the same
+    indices[c0 == c1] = 0
+    bits = (indices << (2 * np.arange(16, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+
+    out = np.empty((len(blocks), 8), dtype=np.uint8)
+    out[:, 0:2] = c0.astype("<u2")[:, None].view(np.uint8)
+    out[:, 2:4] = c1.astype("<u2")[:, None].view(np.uint8)
+    out[:, 4:8] = bits.astype("<u4")[:, None].view(np.uint8)
+    return out
+
+
+def _encode_alpha(blocks):
+    """BC3 alpha halves (n, 8) of (n, 16, 4) blocks, in 8-value mode."""
+    alpha = blocks[..., 3]
+    a0, a1 = alpha.max(axis=1), alpha.min(axis=1)
+    # Index 0 is a0, 1 is a1, 2..7 interpolate from a0 towards a1
+    weights = np.array([7, 0, 6, 5, 4, 3, 2, 1])
+    palette = (weights * a0[:, None] + (7 - weights) * a1[:, None] + 3) // 7
+    indices = np.abs(alpha[:, :, None] - palette[:, None, :]).argmin(axis=2)
+    indices[a0 == a1] = 0
+    bits = (indices.astype(np.uint64) << (3 * np.arange(16, dtype=np.uint64))).sum(
+        axis=1, dtype=np.uint64
+    )
+
+    out = np.empty((len(blocks), 8), dtype=np.uint8)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    out[:, 2:8] = bits.astype("<u8")[:, None].view(np.uint8)[:, :6]
+    return out
+
+
+def compress_blocks(pixels, fmt):
+    """S3TC-compress an RGBA array into a flat uint8 array of blocks."""
+    blocks = _blocks(pixels)
+    if fmt == BC1:
+        return _encode_color(blocks).reshape(-1)
+    if fmt == BC3:
+        return np.hstack((_encode_alpha(blocks), _encode_color(blocks))).reshape(-1)
+    raise ValueError(f"Unknown block format {fmt!r}")
+
+
+def decompress_blocks(data, size, fmt):
+    """Decode :func:`compress_blocks` output back to an RGBA array."""
+    width, height = size
+    cols, rows = -(-width // 4), -(-height // 4)
+    blocks = np.asarray(data, dtype=np.uint8).reshape(rows * cols, _BLOCK_BYTES[fmt])
+    color = blocks[:, -8:]
+    c0 = color[:, 0:2].copy().view("<u2")[:, 0].astype(np.int32)
+    c1 = color[:, 2:4].copy().view("<u2")[:, 0].astype(np.int32)
+    e0, e1 = _from_565(c0), _from_565(c1)
+    palette = np.stack((e0, e1, (2 * e0 + e1) // 3, (e0 + 2 * e1) // 3), axis=1)
+    bits = color[:, 4:8].copy().view("<u4")[:, 0]
+    indices = (bits[:, None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+    rgba = np.empty((len(blocks), 16, 4), dtype=np.uint8)
+    rgba[..., :3] = np.take_along_axis(palette, indices[..., None].astype(np.int64), axis=1)
+    if fmt == BC3:
+        a0, a1 = blocks[:, 0].astype(np.int64), blocks[:, 1].astype(np.int64)
+        weights = np.array([7, 0, 6, 5, 4, 3, 2, 1])
+        alphas = (weights * a0[:, None] + (7 - weights) * a1[:, None] + 3) // 7
+        packed = np.zeros((len(blocks), 8), dtype=np.uint8)
+        packed[:, :6] = blocks[:, 2:8]
+        bits = packed.view("<u8")[:, 0]
+        indices = (bits[:, None] >> (3 * np.arange(16, dtype=np.uint64))) & 7
+        rgba[..., 3] = np.take_along_axis(alphas, indices.astype(np.int64), axis=1)
+    else:
+        rgba[..., 3] = 255
+    image = rgba.reshape(rows, cols, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+    return image.reshape(rows * 4, cols * 4, 4)[:height, :width]
+
+
+def texture_cache_path(source, flip, size, fmt, cache_dir=TEXTURE_CACHE_DIR):
+    """Cache file of a source image's mip chain, keyed on its bytes and options."""
+    key = json.dumps(
+        {
+            "version": TEXTURE_CACHE_VERSION,
+            "source": hashlib.sha1(source).hexdigest(),
+            "flip": bool(flip),
+            "size": size,
+            "format": fmt,
+        },
+        sort_keys=True,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+    return os.path.join(cache_dir, digest + TEXTURE_CACHE_SUFFIX)
+
+
+def _level_shape(width, height, fmt):
+    if fmt == RGBA8:
+        return (height, width, 4)
+    return (-(-width // 4) * -(-height // 4) * _BLOCK_BYTES[fmt],)
+
+
+def _read_texture_cache(path, fmt):
+    try:
+        with open(path, "rb") as file:
+            header = file.read(_TEXTURE_CACHE_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != _TEXTURE_CACHE_HEADER.size:
+        return None
+    magic, version, width, height, level_count, format_index = _TEXTURE_CACHE_HEADER.unpack(header)
+    if (
+        magic != _TEXTURE_CACHE_MAGIC
+        or version != TEXTURE_CACHE_VERSION
+        or format_index >= len(TEXTURE_FORMATS)
+        or TEXTURE_FORMATS[format_index] != fmt
+    ):
+        return None
+
+    pixels = TexturePixels(width, height, fmt, [], from_cache=True)
+    shapes = [_level_shape(*pixels.level_size(level), fmt) for level in range(level_count)]
+    offset = _TEXTURE_CACHE_HEADER.size
+    if os.path.getsize(path) != offset + sum(int(np.prod(shape)) for shape in shapes):
+        return None
+    for shape in shapes:
+        pixels.levels.append(np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=shape))
+        offset += int(np.prod(shape))
+    return pixels
+
+
+def _write_texture_cache(path, pixels):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            file.write(
+                _TEXTURE_CACHE_HEADER.pack(
+                    _TEXTURE_CACHE_MAGIC,
+                    TEXTURE_CACHE_VERSION,
+                    pixels.width,
+                    pixels.height,
+                    len(pixels.levels),
+                    TEXTURE_FORMATS.index(pixels.format),
+                )
+            )
+            for level in pixels.levels:
+                file.write(np.ascontiguousarray(level).tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only working directory just skips the cache
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_texture_pixels(
+    filename, flip=True, size=None, fmt=RGBA8, use_cache=True, cache_dir=TEXTURE_CACHE_DIR
+):
+    """Decode (or memory-map from the cache) an image's full mip chain.
+
+    ``size`` (width, height) resamples the image first, see
+    :func:`resize_nearest`; ``fmt`` is one of ``TEXTURE_FORMATS``. The
+    cache is keyed on a hash of the image file's bytes and these options,
+    so edited images are decoded again.
+    """
+    if fmt not in TEXTURE_FORMATS:
+        raise ValueError(f"Unknown texture format {fmt!r}")
+    size = None if size is None else tuple(size)
+    if use_cache:
+        with open(filename, "rb") as file:
+            path = texture_cache_path(file.read(), flip, size, fmt, cache_dir)
+        pixels = _read_texture_cache(path, fmt)
+        if pixels is not None:
+            return pixels
+
+    image = decode_image(filename, flip)
+    if size is not None and size != (image.shape[1], image.shape[0]):
+        image = resize_nearest(image, size)
+    levels = mip_chain(image)
+    height, width = image.shape[:2]
+    if fmt != RGBA8:
+        levels = [compress_blocks(level, fmt) for level in levels]
+    pixels = TexturePixels(width, height, fmt, levels)
+    if use_cache:
+        _write_texture_cache(path, pixels)
+    return pixels
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    files = [f"./assets/{name}.png" for name in ("wall", "ground", "roof_flat", "chest", "bench")]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for fmt in TEXTURE_FORMATS:
+            start = time.perf_counter()
+            for filename in files:
+                load_texture_pixels(filename, size=(256, 32), fmt=fmt, cache_dir=cache_dir)
+            cold_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            for filename in files:
+                cached = load_texture_pixels(
+                    filename, size=(256, 32), fmt=fmt, cache_dir=cache_dir
+                )
+                assert cached.from_cache
+            warm_ms = (time.perf_counter() - start) * 1000
+            print(
+                f"{fmt}: {len(files)} textures decoded in {cold_ms:.1f} ms, "
+                f"mapped from the cache in {warm_ms:.1f} ms, {cached.nbytes} bytes each"
+            )
+
+    # Compression error on a smooth gradient and on the 256x1 tile palettes
+    ramp = np.linspace(0, 255, 64)
+    gradient = np.stack(np.broadcast_arrays(ramp[None, :], ramp[:, None], 128, 255), -1)
+    for name, image in [("gradient", gradient.astype(np.uint8))] + [
+        (os.path.basename(f), decode_image(f)) for f in files
+    ]:
+        size = (image.shape[1], image.shape[0])
+        for fmt in (BC1, BC3):
+            decoded = decompress_blocks(compress_blocks(image, fmt), size, fmt)
+            error = np.abs(decoded.astype(np.int32) - image).max(axis=(0, 1))
+            print(f"{name:14s} {fmt}: max error per channel {error.tolist()}")
@@ -0,0 +1,135 @@
+import numpy as np
+from OpenGL.GL import *
+
+from profiler import default_profiler
+
+# Uniform block binding points shared by every program
+CAMERA_BINDING = 0
+LIGHTS_BINDING = 1
+
+# std140 layout of the Camera block in shaders.py
+CAMERA_DTYPE = np.dtype(
+    [
+        ("view", "<f4", (4, 4)),
+        ("projection", "<f4", (4, 4)),
+        ("view_pos", "<f4", (4,)),
+    ]
+)
+
+
+class UniformBuffer:
+    """A std140 uniform block backed by one record of a NumPy structured array.
+
+    With ``target=GL_TEXTURE_BUFFER`` the same dirty tracking backs a
+    buffer texture instead of a uniform block binding.
+
+    :meth:`set` writes a field (or one element of an array field) and
+    records its byte range only if the value actually changed.
+    :meth:`upload` sends the merged dirty ranges with ``glBufferSubData``
+    and does nothing when nothing changed. ``bytes_uploaded`` and
+    ``upload_calls`` hold the counts of the last upload, ``total_bytes``
+    the running total.
+    """
+
+    def __init__(self, dtype, binding=None, target=GL_UNIFORM_BUFFER):
+        self.dtype = np.dtype(dtype)
+        self.binding = binding
+        self.target = target
+        self.data = np.zeros((), dtype=self.dtype)
+        self._bytes = self.data.reshape(1).view(np.uint8)
+        self._dirty = []
+        self.bytes_uploaded = 0
+        self.upload_calls = 0
+        self.total_bytes = 0
+
+        self.buffer_id = glGenBuffers(1)
+        glBindBuffer(target, self.buffer_id)
+        glBufferData(target, self.dtype.itemsize, self._bytes, GL_DYNAMIC_DRAW)
+        glBindBuffer(target, 0)
+        if binding is not None:
+            glBindBufferBase(target, binding, self.buffer_id)
+
+    def bind(self, program, block_name):
+        """Point ``program``'s uniform block at this buffer's binding."""
+        index = glGetUniformBlockIndex(program, block_name)
+        if index == GL_INVALID_INDEX:
+            return False
+        glUniformBlockBinding(program, index, self.binding)
+        return True
+
+    def set(self, name, value, index=None):
+        """Write ``value`` into field ``name`` (element ``index`` of an array field)."""
+        target = self.data[name] if index is None else self.data[name][index]
+        value = np.asarray(value, dtype=target.dtype).reshape(target.shape)
+        if np.array_equal(target, value):
+            return False
+        target[...] = value
+
+        field_dtype, start = self.dtype.fields[name][:2]
+        size = field_dtype.itemsize
+        if index is not None:
+            size //= field_dtype.shape[0]
+            start += index * size
+        self._dirty.append((start, start + size))
+        return True
+
+    @property
+    def dirty(self):
+        return bool(self._dirty)
+
+    def upload(self):
+        """Upload changed byte ranges; returns the number of bytes sent."""
+        self.bytes_uploaded = 0
+        self.upload_calls = 0
+        if not self._dirty:
+            return 0
+
+        glBindBuffer(self.target, self.buffer_id)
+        for start, end in self._merged_ranges():
+            glBufferSubData(self.target, start, end - start, self._bytes[start:end])
+            self.bytes_uploaded += end - start
+            self.upload_calls += 1
+        glBindBuffer(self.target, 0)
+
+        self._dirty.clear()
+        self.total_bytes += self.bytes_uploaded
+        default_profiler.count("uniform_uploads", self.upload_calls)
+        default_profiler.count("buffer_bytes", self.bytes_uploaded)
+        return self.bytes_uploaded
+
+    def release(self):
+        if self.buffer_id is not None:
+            glDeleteBuffers(1, [self.buffer_id])
+            self.buffer_id = None
+
+    def _merged_ranges(self):
+        ranges = []
+        for start, end in sorted(self._dirty):
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([start, end])
+        return ranges
+
+
+class CameraUniforms(UniformBuffer):
+    """View, projection and eye position shared by every program's Camera block."""
+
+    def __init__(self, binding=CAMERA_BINDING):
+        super().__init__(CAMERA_DTYPE, binding)
+
+    def bind(self, program, block_name="Camera"):
+        return super().bind(program, block_name)
+
+    def set_projection(self, projection):
+        return self.set("projection", _column_major(projection))
+
+    def set_view(self, view, position):
+        changed = self.set("view", _column_major(view))
+        position = (position[0], position[1], position[2], 1.0)
+        return self.set("view_pos", position) or changed
+
+
+def _column_major(matrix):
+    # np.array(glm.mat4) is row-major; std140 stores one column per vec4
+    return np.array(matrix, dtype=np.float32).T
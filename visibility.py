@@ -0,0 +1,218 @@
+import math
+
+import numpy as np
+
+from generator.dungeon_generator import WALL
+from generator.dungeon_mesher import greedy_rectangles
+
+
+class PortalVisibility:
+    """Room/corridor portal visibility over a dungeon grid.
+
+    Open cells are split into room cells (any open cell inside a fully
+    open 2x2 block) and 1-wide corridor cells, and each kind is covered
+    with rectangles that become the regions. Every cell edge between two
+    regions is a portal. At runtime the camera's region is flooded through portals
+    whose top-down angular extent overlaps the view cone, narrowing the
+    cone at each portal, so only cells of reachable regions (plus the walls
+    around them) are reported visible.
+    """
+
+    def __init__(self, grid, spacing=1.6, roof_height=2.5):
+        self.grid = np.asarray(grid)
+        self.spacing = spacing
+        self.roof_height = roof_height
+        self.rows, self.cols = self.grid.shape
+
+        open_cells = self.grid != WALL
+        block = (
+            open_cells[:-1, :-1] & open_cells[1:, :-1] & open_cells[:-1, 1:] & open_cells[1:, 1:]
+        )
+        rooms = np.zeros_like(open_cells)
+        rooms[:-1, :-1] |= block
+        rooms[1:, :-1] |= block
+        rooms[:-1, 1:] |= block
+        rooms[1:, 1:] |= block
+        corridors = open_cells & ~rooms
+
+        # Split both into rectangles so every region is convex: anything in
+        # a region is visible from anywhere else in it
+        self.regions = np.full(self.grid.shape, -1, dtype=np.int64)
+        self.room_count = 0
+        count = 0
+        for kind, mask in (("room", rooms), ("corridor", corridors)):
+            for row, col, h, w in greedy_rectangles(mask).tolist():
+                self.regions[row : row + h, col : col + w] = count
+                count += 1
+            if kind == "room":
+                self.room_count = count
+        self.total_regions = count
+
+        self._build_portals()
+        self.visible_regions = self.total_regions
+        self.visible_cells = self.rows * self.cols
+
+    def _build_portals(self):
+        s = self.spacing
+        regions = self.regions
+        a_list, b_list, p1_list, p2_list = [], [], [], []
+
+        # Edges between horizontally adjacent cells lie on x = (j + 0.5) * s
+        left, right = regions[:, :-1], regions[:, 1:]
+        i, j = np.nonzero((left >= 0) & (right >= 0) & (left != right))
+        a_list.append(left[i, j])
+        b_list.append(right[i, j])
+        p1_list.append(np.column_stack(((j + 0.5) * s, (i - 0.5) * s)))
+        p2_list.append(np.column_stack(((j + 0.5) * s, (i + 0.5) * s)))
+
+        # Edges between vertically adjacent cells lie on z = (i + 0.5) * s
+        top, bottom = regions[:-1, :], regions[1:, :]
+        i, j = np.nonzero((top >= 0) & (bottom >= 0) & (top != bottom))
+        a_list.append(top[i, j])
+        b_list.append(bottom[i, j])
+        p1_list.append(np.column_stack(((j - 0.5) * s, (i + 0.5) * s)))
+        p2_list.append(np.column_stack(((j + 0.5) * s, (i + 0.5) * s)))
+
+        # Two rectangles share at most one straight run of edges, so merge
+        # each pair's edges into a single portal segment
+        pairs = np.column_stack((np.concatenate(a_list), np.concatenate(b_list)))
+        p1 = np.concatenate(p1_list).reshape(-1, 2)
+        p2 = np.concatenate(p2_list).reshape(-1, 2)
+        pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        self.portal_regions = pairs.astype(np.int64).reshape(-1, 2)
+        self.portal_p1 = np.full((len(pairs), 2), np.inf)
+        self.portal_p2 = np.full((len(pairs), 2), -np.inf)
+        np.minimum.at(self.portal_p1, inverse, p1)
+        np.maximum.at(self.portal_p2, inverse, p2)
+
+        # Portals per region, as (portal index, region on the other side)
+        self.region_portals = [[] for _ in range(self.total_regions)]
+        for index, (a, b) in enumerate(self.portal_regions.tolist()):
+            self.region_portals[a].append((index, b))
+            self.region_portals[b].append((index, a))
+
+    def cell_of(self, x, z):
+        """Grid (row, col) containing world position (x, z), or None outside."""
+        row = int(round(z / self.spacing))
+        col = int(round(x / self.spacing))
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def cell_index(self, instances):
+        """Flattened cell index for each instance (or (n, 3) world-space offset)."""
+        instances = np.asarray(instances)
+        if instances.dtype.names:
+            instances = instances["offset"]
+        offsets = instances.astype(np.float64).reshape(-1, 3)
+        col = np.clip(np.rint(offsets[:, 0] / self.spacing), 0, self.cols - 1)
+        row = np.clip(np.rint(offsets[:, 2] / self.spacing), 0, self.rows - 1)
+        return row.astype(np.int64) * self.cols + col.astype(np.int64)
+
+    def view_cone(self, pitch, fov_y, aspect):
+        """Conservative top-down half-angle (radians) of the view frustum.
+
+        Returns None when the camera looks steeply enough that every
+        direction can be on screen.
+        """
+        half_v = math.radians(fov_y) / 2
+        tan_h = math.tan(half_v) * aspect
+        tilt = abs(math.radians(pitch)) + half_v
+        if tilt >= math.pi / 2:
+            return None
+        return math.atan2(tan_h * math.cos(half_v), math.cos(tilt))
+
+    def _portal_intervals(self, x, z, yaw):
+        """Angular interval of every portal relative to the view direction."""
+        fx, fz = math.cos(math.radians(yaw)), math.sin(math.radians(yaw))
+
+        def angles(points):
+            dx, dz = points[:, 0] - x, points[:, 1] - z
+            return np.arctan2(fx * dz - fz * dx, fx * dx + fz * dz)
+
+        a1, a2 = angles(self.portal_p1), angles(self.portal_p2)
+        # A portal spans less than half a turn, so take the short way round;
+        # portals behind the camera then end past pi
+        delta = (a2 - a1 + math.pi) % (2 * math.pi) - math.pi
+        lo = np.where(delta >= 0, a1, a2)
+        hi = lo + np.abs(delta)
+
+        # Portals the camera stands on can be seen anywhere
+        p1 = self.portal_p1 - (x, z)
+        edge = self.portal_p2 - self.portal_p1
+        along = np.clip(-(p1 * edge).sum(axis=1) / (edge * edge).sum(axis=1), 0.0, 1.0)
+        touching = np.hypot(*(p1 + along[:, None] * edge).T) < 1e-9
+        touching |= np.abs(delta) >= math.pi - 1e-9
+        lo[touching], hi[touching] = -math.pi, math.pi
+        return lo, hi
+
+    def visible_cell_mask(self, position, yaw, pitch, fov_y=45.0, aspect=800.0 / 600.0):
+        """Boolean (rows, cols) mask of cells to draw, or None to draw everything.
+
+        Everything is drawn when the camera is outside the map, inside a wall
+        or above the roof, since the portal graph says nothing there.
+        """
+        x, y, z = position
+        cell = self.cell_of(x, z)
+        if cell is None or y > self.roof_height or self.regions[cell] < 0:
+            self.visible_regions = self.total_regions
+            self.visible_cells = self.rows * self.cols
+            return None
+
+        half = self.view_cone(pitch, fov_y, aspect)
+        start_lo, start_hi = (-math.pi, math.pi) if half is None else (-half, half)
+        portal_lo, portal_hi = self._portal_intervals(x, z, yaw)
+        portal_lo, portal_hi = portal_lo.tolist(), portal_hi.tolist()
+
+        start = int(self.regions[cell])
+        cones = {start: [(start_lo, start_hi)]}
+        stack = [(start, start_lo, start_hi)]
+        while stack:
+            region, lo, hi = stack.pop()
+            for portal, other in self.region_portals[region]:
+                a, b = portal_lo[portal], portal_hi[portal]
+                # Past pi the interval continues from -pi
+                pieces = ((a, b), (a - 2 * math.pi, b - 2 * math.pi)) if b > math.pi else ((a, b),)
+                for a, b in pieces:
+                    new_lo, new_hi = max(lo, a), min(hi, b)
+                    if new_lo > new_hi:
+                        continue
+                    seen = cones.setdefault(other, [])
+                    if any(c <= new_lo and new_hi <= d for c, d in seen):
+                        continue
+                    seen.append((new_lo, new_hi))
+                    stack.append((other, new_lo, new_hi))
+
+        visible_regions = np.zeros(self.total_regions + 1, dtype=bool)
+        visible_regions[list(cones)] = True
+        # Index -1 (walls) maps to the spare last slot, which stays False
+        open_mask = visible_regions[self.regions]
+
+        # Grow by one cell in all 8 directions to pick up the bounding walls
+        padded = np.pad(open_mask, 1)
+        mask = np.zeros_like(open_mask)
+        for di in (0, 1, 2):
+            for dj in (0, 1, 2):
+                mask |= padded[di : di + self.rows, dj : dj + self.cols]
+
+        self.visible_regions = len(cones)
+        self.visible_cells = int(mask.sum())
+        return mask
+
+    def room_centers(self):
+        """World (x, z) centre of every room region, as a (room_count, 2) array."""
+        rows, cols = np.nonzero((self.regions >= 0) & (self.regions < self.room_count))
+        ids = self.regions[rows, cols]
+        counts = np.bincount(ids, minlength=self.room_count)
+        x = np.bincount(ids, cols, minlength=self.room_count) / counts
+        z = np.bincount(ids, rows, minlength=self.room_count) / counts
+        return np.column_stack((x, z)) * self.spacing
+
+    def stats(self):
+        return {
+            "visible_regions": self.visible_regions,
+            "total_regions": self.total_regions,
+            "visible_cells": self.visible_cells,
+            "total_cells": self.rows * self.cols,
+        }